@@ -0,0 +1,166 @@
+import asyncio
+import json
+import math
+import time
+from collections import deque
+
+from metrics import ADMISSION_QUEUE_SECONDS, ADMISSION_REJECTED, RouteTemplates
+
+# ميزانية الطلب بالمللي ثانية يرسلها العميل: بعدها لا فائدة من الاستجابة
+DEADLINE_HEADER = b"x-request-timeout-ms"
+
+
+class Rejected(Exception):
+    """رفض الطلب قبل تشغيله، مع الزمن المقترح لإعادة المحاولة بالثواني"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class RouteLimiter:
+    """حد تزامن لمسار واحد مع طابور انتظار محدود بترتيب الوصول
+
+    يحتفظ بمتوسط متحرك لزمن تنفيذ الطلب ليقدر زمن انتظار القادم الجديد، فيرفضه فوراً
+    إذا كان لن ينتهي قبل مهلته بدلاً من أن يشغل مكاناً في الطابور.
+    """
+
+    def __init__(self, concurrency, queue_size, smoothing=0.2):
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.smoothing = smoothing
+        self.active = 0
+        self.service_seconds = None
+        self._waiters = deque()
+
+    @property
+    def queued(self):
+        return sum(1 for waiter in self._waiters if not waiter.done())
+
+    def predicted_wait(self):
+        """الزمن المتوقع حتى يتحرر مكان لطلب يصل الآن"""
+        if self.active < self.concurrency and not self.queued:
+            return 0.0
+        return (self.queued + 1) * (self.service_seconds or 0.0) / self.concurrency
+
+    def _retry_after(self, wait):
+        return max(1, math.ceil(wait))
+
+    async def acquire(self, timeout=None):
+        """حجز مكان تنفيذ، وإلا رفع Rejected عند امتلاء الطابور أو تعذر الانتهاء قبل المهلة"""
+        if self.active < self.concurrency and not self.queued:
+            self.active += 1
+            return
+        wait = self.predicted_wait()
+        if self.queued >= self.queue_size:
+            raise Rejected("queue_full", self._retry_after(wait))
+        if timeout is not None and wait + (self.service_seconds or 0.0) > timeout:
+            raise Rejected("deadline", self._retry_after(wait))
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            raise Rejected("timeout", self._retry_after(self.predicted_wait()))
+        except asyncio.CancelledError:
+            # انقطع العميل بعد أن سُلّم المكان إليه
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+
+    def release(self, service_seconds=None):
+        """تحرير المكان وتسليمه مباشرة لأقدم طلب منتظر"""
+        if service_seconds is not None:
+            if self.service_seconds is None:
+                self.service_seconds = service_seconds
+            else:
+                self.service_seconds += self.smoothing * (service_seconds - self.service_seconds)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self):
+        return {"active": self.active, "queued": self.queued, "service_seconds": self.service_seconds}
+
+
+def parse_limits(spec):
+    """حدود المسارات من نص بالصيغة "/route/=concurrency:queue,..." """
+    limits = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        route, _, values = item.strip().rpartition("=")
+        concurrency, _, queue_size = values.partition(":")
+        limits[route] = RouteLimiter(int(concurrency), int(queue_size or 0))
+    return limits
+
+
+def request_timeout(scope, default=None):
+    """مهلة الطلب بالثواني من ترويسة العميل، أو المهلة الافتراضية"""
+    for name, value in scope["headers"]:
+        if name == DEADLINE_HEADER:
+            try:
+                milliseconds = float(value)
+            except ValueError:
+                break
+            return max(milliseconds, 0.0) / 1000
+    return default
+
+
+async def _send_rejection(send, rejected):
+    body = json.dumps(
+        {"detail": "الخدمة مشغولة حالياً، حاول لاحقاً", "reason": rejected.reason},
+        ensure_ascii=False
+    ).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": 503,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(rejected.retry_after).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionMiddleware:
+    """حدود تزامن وطوابير مستقلة لكل مسار، فلا تنتظر الطلبات الخفيفة خلف المسارات الثقيلة
+
+    المسارات غير المذكورة في limits تمر دون قيود. الطلب المرفوض يعاد له 503 مع Retry-After.
+    """
+
+    def __init__(self, app, routes, limits, default_timeout=None):
+        self.app = app
+        self.limits = limits
+        self.default_timeout = default_timeout
+        self._route = RouteTemplates(routes)
+
+    async def __call__(self, scope, receive, send):
+        limiter = None
+        if scope["type"] == "http":
+            route = self._route(scope)
+            limiter = self.limits.get(route)
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        queued_at = time.perf_counter()
+        try:
+            await limiter.acquire(request_timeout(scope, self.default_timeout))
+        except Rejected as rejected:
+            ADMISSION_REJECTED.labels(route, rejected.reason).inc()
+            await _send_rejection(send, rejected)
+            return
+
+        started = time.perf_counter()
+        ADMISSION_QUEUE_SECONDS.labels(route).observe(started - queued_at)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(time.perf_counter() - started)
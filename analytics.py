@@ -0,0 +1,187 @@
+import time
+from datetime import datetime, timedelta
+
+import sqlalchemy
+from sqlalchemy.dialects import postgresql, sqlite
+
+from db import UserInput, analytics_rollups, create_sync_db_engine
+from nutrients import NUTRIENT_CODES, deficiency_mask, merge_deficiency_masks, parse_nutrient_labels
+
+# أبعاد التقسيم المخزنة في جدول التجميعات، إضافة إلى الأسبوع
+ROLLUP_DIMENSIONS = ("diet_type", "gender", "bmi_category")
+# مفتاح جدول التجميعات، وهو نفسه حقول التقسيم المسموحة في /stats/
+GROUP_BY_FIELDS = ("week",) + ROLLUP_DIMENSIONS
+COUNT_COLUMNS = ("submissions", "analyzed") + tuple(f"{code}_deficient" for code in NUTRIENT_CODES)
+
+UPSERT_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def week_start(day):
+    """بداية الأسبوع (الإثنين) الذي يقع فيه اليوم أو وقت الإرسال"""
+    if isinstance(day, datetime):
+        day = day.date()
+    return day - timedelta(days=day.weekday())
+
+
+def aggregate_rows(rows, totals=None):
+    """جمع الصفوف حسب مفتاح التجميع: عدد الإرسالات والمحللة والنقص لكل عنصر
+
+    الصفوف بلا created_at لا تنتمي إلى أسبوع فتُتجاهل. يعيد القاموس وعدد الصفوف المتجاهلة.
+    """
+    totals = {} if totals is None else totals
+    skipped = 0
+    for row in rows:
+        if row["created_at"] is None:
+            skipped += 1
+            continue
+        key = (week_start(row["created_at"]),) + tuple(row[name] or "" for name in ROLLUP_DIMENSIONS)
+        counts = totals.get(key)
+        if counts is None:
+            counts = totals[key] = [0] * len(COUNT_COLUMNS)
+        counts[0] += 1
+        mask = row["deficiency_mask"]
+        if mask is not None:
+            counts[1] += 1
+            for index in range(len(NUTRIENT_CODES)):
+                if mask >> index & 1:
+                    counts[2 + index] += 1
+    return totals, skipped
+
+
+def rollup_params(totals):
+    return [
+        dict(zip(GROUP_BY_FIELDS, key), **dict(zip(COUNT_COLUMNS, counts)))
+        for key, counts in totals.items()
+    ]
+
+
+def rollup_upsert(dialect_name):
+    """جملة إدراج تضيف العدادات إلى صف التجميع القائم بدلاً من استبداله"""
+    insert = UPSERT_INSERTS.get(dialect_name)
+    if insert is None:
+        raise ValueError(f"Analytics rollups are not supported for {dialect_name}")
+    statement = insert(analytics_rollups)
+    return statement.on_conflict_do_update(
+        index_elements=list(GROUP_BY_FIELDS),
+        set_={name: analytics_rollups.c[name] + statement.excluded[name] for name in COUNT_COLUMNS},
+    )
+
+
+async def apply_rollups(conn, rows):
+    """تحديث التجميعات بدفعة صفوف جديدة داخل معاملة إدراجها نفسها"""
+    totals, _ = aggregate_rows(rows)
+    if totals:
+        await conn.execute(rollup_upsert(conn.dialect.name), rollup_params(totals))
+
+
+def stats_query(group_by=(), since=None, until=None, **filters):
+    """استعلام التجميعات فقط دون المرور على الصفوف الخام، فزمنه لا يتعلق بحجم السجل
+
+    group_by من GROUP_BY_FIELDS، وfilters قيم لأبعاد ROLLUP_DIMENSIONS.
+    """
+    table = analytics_rollups
+    groups = [table.c[name] for name in group_by]
+    sums = [sqlalchemy.func.sum(table.c[name]).label(name) for name in COUNT_COLUMNS]
+    query = sqlalchemy.select(groups + sums)
+    if since is not None:
+        query = query.where(table.c.week >= week_start(since))
+    if until is not None:
+        query = query.where(table.c.week <= until)
+    for name, value in filters.items():
+        if value is not None:
+            query = query.where(table.c[name] == value)
+    if groups:
+        query = query.group_by(*groups).order_by(*groups)
+    return query
+
+
+def stats_group(row, group_by):
+    """صف نتيجة واحد: قيم التقسيم والعدادات ونسبة انتشار النقص لكل عنصر"""
+    analyzed = row["analyzed"] or 0
+    deficient = {code: row[f"{code}_deficient"] or 0 for code in NUTRIENT_CODES}
+    group = {name: (row[name].isoformat() if name == "week" else row[name]) for name in group_by}
+    group.update(
+        submissions=row["submissions"] or 0,
+        analyzed=analyzed,
+        deficient=deficient,
+        prevalence={code: round(count / analyzed, 4) if analyzed else None for code, count in deficient.items()},
+    )
+    return group
+
+
+def backfill_rollups(job_id, database_url, chunk_size=5000, progress=None):
+    """إعادة بناء التجميعات من الصفوف المخزنة في عملية منفصلة
+
+    يعاد استخراج حالات النقص من نص التحليل المخزن لكل صف وإضافتها إلى deficiency_mask،
+    ثم يُستبدل جدول التجميعات في معاملة واحدة. الصفوف المدرجة أثناء المهمة تضاف
+    إليه في المعاملة نفسها فلا تضيع زياداتها الحية.
+    """
+    started = time.perf_counter()
+    engine = create_sync_db_engine(database_url)
+    table = UserInput.__table__
+    columns = [table.c.id, table.c.created_at, table.c.deficiency_mask] + [table.c[name] for name in ROLLUP_DIMENSIONS]
+
+    def report(fraction):
+        if progress is not None:
+            progress[job_id] = {"phase": "backfill", "progress": fraction}
+
+    try:
+        with engine.connect() as conn:
+            last_row_id = conn.scalar(sqlalchemy.select([sqlalchemy.func.max(table.c.id)])) or 0
+            total = conn.scalar(sqlalchemy.select([sqlalchemy.func.count()]).where(table.c.id <= last_row_id))
+
+        totals, skipped, processed, updated, last_id = {}, 0, 0, 0, -1
+        update = table.update().where(table.c.id == sqlalchemy.bindparam("row_id")).values(
+            deficiency_mask=sqlalchemy.bindparam("mask_value")
+        )
+        while True:
+            with engine.begin() as conn:
+                rows = conn.execute(
+                    sqlalchemy.select(columns + [table.c.gemini_output])
+                    .where(table.c.id > last_id, table.c.id <= last_row_id)
+                    .order_by(table.c.id).limit(chunk_size)
+                ).mappings().all()
+                if not rows:
+                    break
+                rows = [dict(row) for row in rows]
+                changes = []
+                for row in rows:
+                    mask = merge_deficiency_masks(
+                        row["deficiency_mask"], deficiency_mask(parse_nutrient_labels(row["gemini_output"] or ""))
+                    )
+                    if mask != row["deficiency_mask"]:
+                        changes.append({"row_id": row["id"], "mask_value": mask})
+                        row["deficiency_mask"] = mask
+                if changes:
+                    conn.execute(update, changes)
+            totals, chunk_skipped = aggregate_rows(rows, totals)
+            skipped += chunk_skipped
+            updated += len(changes)
+            processed += len(rows)
+            last_id = rows[-1]["id"]
+            report(0.95 * processed / max(total, 1))
+
+        with engine.begin() as conn:
+            conn.execute(analytics_rollups.delete())
+            if totals:
+                conn.execute(analytics_rollups.insert(), rollup_params(totals))
+            # صفوف أُدرجت بعد بداية المهمة: زياداتها حذفت مع الجدول فتضاف من أعمدتها المخزنة
+            late_rows = conn.execute(
+                sqlalchemy.select(columns).where(table.c.id > last_row_id)
+            ).mappings().all()
+            late_totals, _ = aggregate_rows(late_rows)
+            if late_totals:
+                conn.execute(rollup_upsert(conn.dialect.name), rollup_params(late_totals))
+        report(1.0)
+
+        return {
+            "status": "success",
+            "rows": processed,
+            "late_rows": len(late_rows),
+            "undated_rows": skipped,
+            "masks_updated": updated,
+            "rollup_rows": len(totals),
+            "duration_seconds": round(time.perf_counter() - started, 3),
+        }
+    finally:
+        engine.dispose()
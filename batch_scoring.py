@@ -0,0 +1,231 @@
+"""تقييم ملفات استبيانات JSONL أو CSV كبيرة بنموذج مدرب على عدة أنوية دون المرور بـ HTTP
+
+    python batch_scoring.py questionnaires.jsonl --output predictions.jsonl --workers 8
+
+يُقرأ الملف على دفعات توزع على مجمع عمليات، وتُكتب التوقعات بترتيب الإدخال بعد كل دفعة
+مع ملف تقدم بجانب المخرجات، فإعادة تشغيل الأمر نفسه بعد انقطاعه تكمل من آخر دفعة مكتوبة.
+"""
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from db import build_user_prompt
+from model_registry import ModelRegistry, load_artifacts
+from prediction import predict_batch
+
+CHECKPOINT_SUFFIX = ".progress"
+# حقول الاستبيان اللازمة لبناء نص user_input عندما لا يحتويه الملف
+QUESTIONNAIRE_FIELDS = (
+    "age", "gender", "weight", "height", "sun_exposure", "activity_level", "diet_type", "symptoms",
+    "chronic_diseases", "medications", "vegetables_fruits", "dairy_meat", "supplements",
+)
+
+# النموذج المحمل داخل كل عملية عاملة، مرة واحدة عند بدئها
+_serving = None
+
+
+class ScoringError(Exception):
+    """ملف إدخال أو ملف تقدم لا يمكن المتابعة به"""
+
+
+def _load_model(model_dir, version):
+    global _serving
+    # المصفوفات مربوطة بملف الحزمة فتتشاركها جميع العمليات في ذاكرة الصفحات
+    _serving = load_artifacts(model_dir, version, mmap_mode="r", verify=False)
+
+
+def input_format(path):
+    if path.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    if path.endswith(".csv"):
+        return "csv"
+    raise ScoringError(f"unsupported input type for {path}, expected .jsonl or .csv")
+
+
+def read_chunks(path, chunk_size):
+    """دفعات السجلات الخام بترتيب الملف، مع عناوين الأعمدة لملفات CSV
+
+    فك ترميز السجلات يتم في العمليات العاملة، فلا تبقى القراءة عنق زجاجة.
+    """
+    with open(path, encoding="utf-8", newline="") as f:
+        if input_format(path) == "jsonl":
+            header, rows = None, (line for line in f if line.strip())
+        else:
+            reader = csv.reader(f)
+            header, rows = next(reader, []), reader
+        while True:
+            chunk = list(itertools.islice(rows, chunk_size))
+            if not chunk:
+                return
+            yield header, chunk
+
+
+def record_text(record, text_column):
+    """النص المقدم للنموذج: عمود النص إن وجد، وإلا نص الاستبيان المبني من حقوله"""
+    text = record.get(text_column)
+    if text is not None:
+        return str(text)
+    if all(name in record for name in QUESTIONNAIRE_FIELDS):
+        return build_user_prompt(record)
+    return None
+
+
+def score_chunk(start, header, rows, text_column, id_column):
+    """توقع دفعة واحدة وإرجاع سطور JSON الناتجة كنص واحد"""
+    if header is None:
+        records = [json.loads(row) for row in rows]
+    else:
+        records = [dict(zip(header, row)) for row in rows]
+    texts = []
+    for offset, record in enumerate(records):
+        text = record_text(record, text_column)
+        if text is None:
+            raise ScoringError(f"row {start + offset} has no '{text_column}' or questionnaire fields")
+        texts.append(text)
+    results = predict_batch(_serving, texts)
+    lines = [
+        json.dumps(dict(id=record.get(id_column, start + offset), **result), ensure_ascii=False)
+        for offset, (record, result) in enumerate(zip(records, results))
+    ]
+    return "\n".join(lines) + "\n", len(lines)
+
+
+def _read_checkpoint(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_checkpoint(path, checkpoint):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def score_file(input_path, output_path, model_dir=".", version=None, chunk_size=5000, workers=None,
+               text_column="user_input", id_column="id", restart=False, log=None):
+    """تقييم ملف كامل وإرجاع ملخص التشغيل
+
+    المخرجات وملف التقدم يحدثان بعد كل دفعة، والمخرجات تقتطع عند الاستئناف إلى آخر
+    دفعة سُجلت فلا تتكرر السطور. الاستئناف يتطلب نفس الإدخال والنموذج وحجم الدفعة.
+    """
+    if version is None:
+        versions = ModelRegistry(model_dir).list_versions()
+        if not versions:
+            raise ScoringError(f"no trained model found in {model_dir}")
+        version = versions[-1]
+    workers = workers or os.cpu_count() or 1
+    input_stat = os.stat(input_path)
+    run = {
+        "input": os.path.abspath(input_path),
+        "input_bytes": input_stat.st_size,
+        "input_mtime": input_stat.st_mtime,
+        "model_version": version,
+        "chunk_size": chunk_size,
+        "text_column": text_column,
+        "id_column": id_column,
+    }
+
+    checkpoint_path = output_path + CHECKPOINT_SUFFIX
+    checkpoint = None if restart else _read_checkpoint(checkpoint_path)
+    if checkpoint is not None and any(checkpoint.get(key) != value for key, value in run.items()):
+        raise ScoringError(
+            f"{checkpoint_path} belongs to a different input, model or chunk size; use --restart"
+        )
+    if checkpoint is None:
+        checkpoint = dict(run, chunks=0, rows=0, output_bytes=0)
+    resumed_rows = checkpoint["rows"]
+
+    chunks = itertools.islice(read_chunks(input_path, chunk_size), checkpoint["chunks"], None)
+    started = time.perf_counter()
+    last_log = started
+    mode = "r+b" if checkpoint["output_bytes"] and os.path.exists(output_path) else "wb"
+    with open(output_path, mode) as out:
+        # سطور كتبت بعد آخر نقطة تقدم تحذف وتعاد
+        out.truncate(checkpoint["output_bytes"])
+        out.seek(checkpoint["output_bytes"])
+
+        def write(text, count):
+            nonlocal last_log
+            out.write(text.encode("utf-8"))
+            out.flush()
+            os.fsync(out.fileno())
+            checkpoint["chunks"] += 1
+            checkpoint["rows"] += count
+            checkpoint["output_bytes"] = out.tell()
+            _write_checkpoint(checkpoint_path, checkpoint)
+            now = time.perf_counter()
+            if log is not None and now - last_log >= 2:
+                last_log = now
+                rate = (checkpoint["rows"] - resumed_rows) / (now - started)
+                log(f"{checkpoint['rows']} rows scored, {rate:.0f} rows/s")
+
+        start = checkpoint["rows"]
+        if workers <= 1:
+            _load_model(model_dir, version)
+            for header, rows in chunks:
+                write(*score_chunk(start, header, rows, text_column, id_column))
+                start += len(rows)
+        else:
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_load_model,
+                                     initargs=(model_dir, version)) as executor:
+                # نافذة محدودة من الدفعات الجارية، وتكتب النتائج بترتيب إرسالها
+                pending = deque()
+                for header, rows in chunks:
+                    pending.append(executor.submit(score_chunk, start, header, rows, text_column, id_column))
+                    start += len(rows)
+                    if len(pending) >= 2 * workers:
+                        write(*pending.popleft().result())
+                while pending:
+                    write(*pending.popleft().result())
+
+    seconds = time.perf_counter() - started
+    scored = checkpoint["rows"] - resumed_rows
+    return {
+        "status": "success",
+        "model_version": version,
+        "rows": checkpoint["rows"],
+        "resumed_from": resumed_rows,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(scored / seconds, 1) if seconds else None,
+        "workers": workers,
+        "output": output_path,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="ملف .jsonl أو .csv")
+    parser.add_argument("--output", required=True, help="ملف JSONL للتوقعات")
+    parser.add_argument("--model-dir", default=os.environ.get("MODEL_DIR", "."))
+    parser.add_argument("--version", help="إصدار النموذج، والافتراضي أحدث إصدار")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=0, help="عدد العمليات، 0 يعني جميع الأنوية")
+    parser.add_argument("--text-column", default="user_input")
+    parser.add_argument("--id-column", default="id")
+    parser.add_argument("--restart", action="store_true", help="تجاهل ملف التقدم والبدء من جديد")
+    args = parser.parse_args()
+
+    try:
+        summary = score_file(
+            args.input, args.output, args.model_dir, args.version, args.chunk_size, args.workers or None,
+            args.text_column, args.id_column, args.restart, log=lambda line: print(line, file=sys.stderr)
+        )
+    except ScoringError as e:
+        parser.exit(1, f"error: {e}\n")
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
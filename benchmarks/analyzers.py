@@ -0,0 +1,109 @@
+"""قياسات دقيقة لكل محلل ودالة توصيات، ولمسار /submit-symptoms/ كاملاً داخل العملية
+
+    python benchmarks/analyzers.py --number 2000 --output analyzers.json
+"""
+import argparse
+import asyncio
+import itertools
+
+from common import report, time_calls
+from synthetic import symptom_inputs
+
+import main
+import responses
+import rules
+
+
+def analyzer_cases():
+    """(الاسم، الدالة، المعاملات الإضافية) لكل محلل بكل نوع يعرّفه جدول القواعد"""
+    cases = [
+        ("analyze_vitamin_d_status", rules.analyze_vitamin_d_status, ()),
+        ("analyze_vitamin_a_status", rules.analyze_vitamin_a_status, ()),
+        ("analyze_b12_status", rules.analyze_b12_status, ()),
+        ("analyze_iron_status", rules.analyze_iron_status, ()),
+        ("analyze_calcium_status", rules.analyze_calcium_status, ()),
+        ("get_b12_recommendations", rules.get_b12_recommendations, ()),
+        ("get_iron_recommendations", rules.get_iron_recommendations, ()),
+        ("get_calcium_recommendations", rules.get_calcium_recommendations, ()),
+    ]
+    wrappers = {
+        "nutrient": ("analyze_nutrient_status", rules.analyze_nutrient_status),
+        "b_vitamin": ("analyze_b_vitamins_status", rules.analyze_b_vitamins_status),
+        "mineral": ("analyze_mineral_status", rules.analyze_mineral_status),
+    }
+    for _, _, (analyzer, kind), _ in rules.VITAMIN_REPORT:
+        if analyzer in wrappers:
+            name, fn = wrappers[analyzer]
+            cases.append((f"{name}[{kind}]", fn, (kind,)))
+    return cases
+
+
+def cycling(inputs):
+    """استدعاء يمر على مجموعة المدخلات بالتناوب حتى لا تقاس حالة واحدة فقط"""
+    return itertools.cycle(inputs).__next__
+
+
+def run_benchmarks(number, repeat, samples):
+    validated = [main.SymptomInput(**data) for data in samples]
+    raw = [model.dict() for model in validated]
+    analyzed = [main.analyze_submission(data) for data in raw]
+
+    results = []
+
+    def add(name, fn):
+        results.append(dict(name=name, **time_calls(fn, number, repeat)))
+
+    for name, fn, args in analyzer_cases():
+        nxt = cycling(raw)
+        add(name, lambda fn=fn, args=args, nxt=nxt: fn(nxt(), *args))
+
+    nxt = cycling(raw)
+    add("rule_engine.nutrient_report", lambda: rules.rule_engine.nutrient_report(nxt()))
+    add("rule_engine.vitamin_analysis", lambda: rules.rule_engine.vitamin_analysis(nxt()))
+    nxt_payload = cycling(samples)
+    add("SymptomInput.validate", lambda: main.SymptomInput(**nxt_payload()).dict())
+    add("analyze_submission", lambda: main.analyze_submission(nxt()))
+    nxt_result = cycling(analyzed)
+    add("responses.full_body", lambda: responses.full_body(nxt_result()))
+    add("responses.compact_body", lambda: responses.compact_body(nxt_result()))
+    add("render_analysis_text", lambda: main.render_analysis_text(nxt_result()))
+
+    # نقطة النهاية كاملة دون طبقة HTTP، مع الذاكرة المؤقتة وبدونها
+    loop = asyncio.new_event_loop()
+    nxt_model = cycling(validated)
+
+    def submit(compact=False):
+        return loop.run_until_complete(
+            main.submit_symptoms(nxt_model(), compact=compact, accept_encoding=None)
+        )
+
+    cache = main.result_cache
+    main.result_cache = None
+    try:
+        add("submit_symptoms[uncached]", submit)
+        add("submit_symptoms[uncached,compact]", lambda: submit(compact=True))
+    finally:
+        main.result_cache = cache
+    if cache is not None:
+        add("submit_symptoms[cached]", submit)
+    loop.close()
+    return results
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=2000, help="عدد الاستدعاءات في كل تكرار")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--inputs", type=int, default=200, help="عدد الاستبيانات الاصطناعية المتناوبة")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="حفظ النتيجة كملف JSON")
+    args = parser.parse_args()
+
+    samples = list(symptom_inputs(args.inputs, args.seed))
+    results = run_benchmarks(args.number, args.repeat, samples)
+    report("analyzers", results, args.output, number=args.number, repeat=args.repeat,
+           inputs=args.inputs, seed=args.seed)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,85 @@
+"""أدوات مشتركة للقياس: المسارات، بيئة التشغيل، الإحصاءات، وصيغة النتائج JSON"""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# يرفع عند تغيير شكل ملف النتائج حتى تعرف أداة المقارنة الملفات غير المتوافقة
+RESULTS_FORMAT = 1
+
+
+def environment():
+    """وصف بيئة التشغيل المحفوظ مع كل نتيجة"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "git_commit": commit,
+    }
+
+
+def percentile(sorted_samples, fraction):
+    """النسبة المئوية بطريقة أقرب رتبة على عينات مرتبة"""
+    index = max(0, min(len(sorted_samples) - 1, round(fraction * len(sorted_samples)) - 1))
+    return sorted_samples[index]
+
+
+def latency_summary(samples, scale=1000.0):
+    """ملخص زمن الاستجابة بالمللي ثانية: المتوسط والوسيط وp95 وp99"""
+    ordered = sorted(samples)
+    return {
+        "mean_ms": round(statistics.fmean(ordered) * scale, 3),
+        "p50_ms": round(percentile(ordered, 0.50) * scale, 3),
+        "p95_ms": round(percentile(ordered, 0.95) * scale, 3),
+        "p99_ms": round(percentile(ordered, 0.99) * scale, 3),
+        "max_ms": round(ordered[-1] * scale, 3),
+    }
+
+
+def time_calls(fn, number=1000, repeat=5):
+    """زمن الاستدعاء الواحد بالميكروثانية عبر عدة تكرارات، والوسيط هو القيمة المعتمدة"""
+    fn()
+    per_call = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        per_call.append((time.perf_counter() - start) / number * 1e6)
+    return {
+        "median_us": round(statistics.median(per_call), 3),
+        "min_us": round(min(per_call), 3),
+        "stdev_us": round(statistics.stdev(per_call), 3) if repeat > 1 else 0.0,
+        "calls": number * repeat,
+    }
+
+
+def report(benchmark, results, output=None, **params):
+    """طباعة النتائج وحفظها بصيغة JSON موحدة قابلة للمقارنة بين التشغيلات"""
+    document = {
+        "format": RESULTS_FORMAT,
+        "benchmark": benchmark,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": environment(),
+        "params": params,
+        "results": results,
+    }
+    text = json.dumps(document, ensure_ascii=False, indent=2)
+    print(text)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    return document
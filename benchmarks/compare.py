@@ -0,0 +1,67 @@
+"""مقارنة ملفي نتائج JSON من نفس القياس وإظهار نسبة التغير لكل مقياس
+
+    python benchmarks/compare.py before.json after.json --threshold 1.10
+"""
+import argparse
+import json
+import sys
+
+from common import RESULTS_FORMAT
+
+# المقاييس التي تعني زيادتها تحسناً، وكل مقياس رقمي آخر ينتهي بوحدة زمن أقل أفضل
+HIGHER_IS_BETTER = {"rps", "rows_per_second", "accuracy"}
+TIME_SUFFIXES = ("_us", "_ms", "_seconds")
+
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        document = json.load(f)
+    if document.get("format") != RESULTS_FORMAT:
+        sys.exit(f"{path}: unsupported results format {document.get('format')!r}")
+    return document
+
+
+def compared_metrics(result):
+    for key, value in result.items():
+        if key.startswith("stdev") or not isinstance(value, (int, float)):
+            continue
+        if key in HIGHER_IS_BETTER or key.endswith(TIME_SUFFIXES):
+            yield key, value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=None,
+                        help="الخروج برمز خطأ إذا ساء أي مقياس بأكثر من هذه النسبة، مثل 1.10")
+    args = parser.parse_args()
+
+    before, after = load(args.before), load(args.after)
+    if before["benchmark"] != after["benchmark"]:
+        sys.exit(f"cannot compare {before['benchmark']!r} with {after['benchmark']!r}")
+
+    previous = {result["name"]: result for result in before["results"]}
+    regressions = []
+    print(f"{'name':<45} {'metric':<18} {'before':>12} {'after':>12} {'change':>8}")
+    for result in after["results"]:
+        old = previous.get(result["name"])
+        if old is None:
+            continue
+        for key, value in compared_metrics(result):
+            base = old.get(key)
+            if not base or not isinstance(base, (int, float)):
+                continue
+            ratio = value / base
+            # نسبة السوء موحدة: أكبر من 1 تعني تراجعاً أياً كان اتجاه المقياس
+            worse = 1 / ratio if key in HIGHER_IS_BETTER else ratio
+            print(f"{result['name']:<45} {key:<18} {base:>12} {value:>12} {ratio:>7.2f}x")
+            if args.threshold is not None and worse > args.threshold:
+                regressions.append(f"{result['name']} {key}: {base} -> {value}")
+
+    if regressions:
+        sys.exit("regressions:\n" + "\n".join(regressions))
+
+
+if __name__ == "__main__":
+    main()
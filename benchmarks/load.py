@@ -0,0 +1,130 @@
+"""اختبار حمل على خادم uvicorn محلي: زمن الاستجابة p50/p95/p99 والطلبات في الثانية لكل نقطة نهاية
+
+    python benchmarks/load.py --requests 2000 --concurrency 32 --output load.json
+
+يبدأ الخادم بقاعدة بيانات ومجلد نماذج مؤقتين، فيملأ /submit-symptoms/ قاعدة البيانات أولاً،
+ثم يدرب /train-model/ نموذجاً عليها، ثم يقاس /evaluate-model/ على النموذج الناتج.
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import aiohttp
+
+from common import ROOT, latency_summary, report
+from synthetic import symptom_inputs
+
+
+async def wait_until_ready(session, base_url, timeout=60.0):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            async with session.get(f"{base_url}/catalog/") as response:
+                if response.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.05)
+    raise TimeoutError(f"server did not start within {timeout}s")
+
+
+async def run_load(session, name, make_request, total, concurrency):
+    """إرسال عدد محدد من الطلبات بعدد ثابت من العملاء المتزامنين"""
+    latencies = []
+    statuses = Counter()
+    counter = iter(range(total))
+
+    async def worker():
+        for index in counter:
+            method, url, kwargs = make_request(index)
+            start = time.perf_counter()
+            try:
+                async with session.request(method, url, **kwargs) as response:
+                    await response.read()
+                    statuses[response.status] += 1
+            except aiohttp.ClientError as e:
+                statuses[type(e).__name__] += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    return dict(
+        name=name,
+        requests=total,
+        concurrency=concurrency,
+        seconds=round(elapsed, 3),
+        rps=round(total / elapsed, 1),
+        statuses={str(status): count for status, count in sorted(statuses.items(), key=str)},
+        **latency_summary(latencies),
+    )
+
+
+async def run_all(base_url, args):
+    payloads = list(symptom_inputs(min(args.requests, 1000), args.seed))
+    texts = [payload["symptoms"] or "التعب والإرهاق" for payload in payloads]
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    timeout = aiohttp.ClientTimeout(total=600)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        await wait_until_ready(session, base_url)
+        results = []
+        for compact in (False, True):
+            results.append(await run_load(
+                session, "/submit-symptoms/" + ("?compact=true" if compact else ""),
+                lambda i, compact=compact: (
+                    "POST", f"{base_url}/submit-symptoms/",
+                    {"json": payloads[i % len(payloads)], "params": {"compact": str(compact).lower()}}
+                ),
+                args.requests, args.concurrency,
+            ))
+        # تدريب متسلسل: الخادم يرفض المهام الزائدة عن حده بـ 429
+        results.append(await run_load(
+            session, "/train-model/?wait=true",
+            lambda i: ("POST", f"{base_url}/train-model/", {"params": {"wait": "true"}}),
+            args.train_requests, 1,
+        ))
+        results.append(await run_load(
+            session, "/evaluate-model/",
+            lambda i: ("POST", f"{base_url}/evaluate-model/", {"params": {"text": texts[i % len(texts)]}}),
+            args.requests, args.concurrency,
+        ))
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000, help="عدد الطلبات لكل نقطة نهاية")
+    parser.add_argument("--train-requests", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--workers", type=int, default=1, help="عدد عمليات uvicorn")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="حفظ النتيجة كملف JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = dict(os.environ)
+        env.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tmpdir, 'load.db')}")
+        env.setdefault("MODEL_DIR", tmpdir)
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port),
+             "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"],
+            cwd=ROOT, env=env
+        )
+        try:
+            results = asyncio.run(run_all(f"http://127.0.0.1:{args.port}", args))
+        finally:
+            server.terminate()
+            server.wait()
+
+    report("load", results, args.output, requests=args.requests, concurrency=args.concurrency,
+           train_requests=args.train_requests, workers=args.workers, seed=args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""قياس زمن البدء البارد: زمن استيراد main وزمن الوصول إلى أول طلب ناجح
+
+    python benchmarks/startup.py --runs 5 --max-import-seconds 1.5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from common import ROOT, report
+from synthetic import symptom_inputs
+
+# الوحدات التي يجب ألا تحملها عملية الخدمة عند الاستيراد
+HEAVY_MODULES = ["sklearn", "scipy", "pandas", "numpy", "joblib", "aiohttp"]
+
+SAMPLE_INPUT = next(symptom_inputs(1))
+
+IMPORT_PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+print(json.dumps({{"import_seconds": elapsed, "heavy_modules": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def bench_env(tmpdir):
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tmpdir, 'bench.db')}")
+    env.setdefault("MODEL_DIR", tmpdir)
+    return env
+
+
+def measure_import(env):
+    """زمن استيراد main في عملية جديدة تماماً"""
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE], cwd=ROOT, env=env,
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure_first_request(env, port, timeout=60.0):
+    """الزمن من تشغيل uvicorn حتى نجاح أول طلب إلى /submit-symptoms/"""
+    body = json.dumps(SAMPLE_INPUT).encode("utf-8")
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            request = urllib.request.Request(
+                f"http://127.0.0.1:{port}/submit-symptoms/", data=body,
+                headers={"Content-Type": "application/json"}
+            )
+            try:
+                with urllib.request.urlopen(request, timeout=5) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError(f"server did not answer within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def summarize(values):
+    return {
+        "min_seconds": round(min(values), 4),
+        "median_seconds": round(statistics.median(values), 4),
+        "max_seconds": round(max(values), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-import-seconds", type=float, default=None,
+                        help="الخروج برمز خطأ إذا تجاوز وسيط زمن الاستيراد هذا الحد")
+    parser.add_argument("--output", help="حفظ النتيجة كملف JSON")
+    args = parser.parse_args()
+
+    imports, first_requests, heavy = [], [], set()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = bench_env(tmpdir)
+        for _ in range(args.runs):
+            probe = measure_import(env)
+            imports.append(probe["import_seconds"])
+            heavy.update(probe["heavy_modules"])
+            first_requests.append(measure_first_request(env, args.port))
+
+    import_result = dict(name="import", heavy_modules=sorted(heavy), **summarize(imports))
+    report("startup", [import_result, dict(name="time_to_first_request", **summarize(first_requests))],
+           args.output, runs=args.runs)
+
+    if args.max_import_seconds is not None and import_result["median_seconds"] > args.max_import_seconds:
+        sys.exit(f"import time regression: {import_result['median_seconds']}s > {args.max_import_seconds}s")
+
+
+if __name__ == "__main__":
+    main()
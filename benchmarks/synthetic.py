@@ -0,0 +1,71 @@
+"""مولد استبيانات SymptomInput اصطناعية تغطي القيم الفئوية العربية التي تستخدمها القواعد"""
+import random
+
+GENDERS = ["ذكر", "أنثى"]
+ACTIVITY_LEVELS = ["خامل", "خفيف", "متوسط", "نشط", "نشط جداً"]
+DIET_TYPES = ["متوازن", "نباتي", "نباتي مع أسماك", "كيتو", "قليل الكربوهيدرات"]
+FREQUENCIES = ["نادراً", "أحياناً", "غالباً", "يومياً"]
+SUN_CONTEXTS = ["محدود (داخل المباني معظم الوقت)", "معتدل", "مرتفع (عمل أو نشاط خارجي)"]
+SUN_EXPOSURE_HOURS = [0, 0.2, 0.5, 1, 2, 3]
+SYMPTOMS = [
+    "التعب والإرهاق", "الدوخة", "الصداع", "شحوب الجلد", "جفاف الجلد", "تساقط الشعر",
+    "فقر الدم", "ضعف العظام", "ضعف العضلات", "ضعف العضلات أو آلامها", "تشنجات عضلية",
+    "مشاكل في الرؤية", "تشقق زوايا الفم", "بطء التئام الجروح", "أرق",
+]
+MEAL_COMPONENTS = [
+    "خضروات", "خضروات طازجة", "خضروات مطبوخة", "فواكه", "حبوب كاملة", "بقوليات", "مكسرات",
+    "أسماك", "لحوم", "منتجات ألبان", "زيوت نباتية",
+]
+COOKING_METHODS = ["مشوي", "مسلوق", "مقلي", "على البخار", "نيء"]
+PHYSICAL_ACTIVITIES = ["المشي", "الجري", "السباحة", "ركوب الدراجة", "تمارين القوة", "اليوغا"]
+SLEEP_QUALITIES = ["جيدة", "متوسطة", "سيئة"]
+STRESS_LEVELS = ["منخفض", "متوسط", "مرتفع"]
+CHRONIC_DISEASES = ["", "السكري", "ارتفاع ضغط الدم", "قصور الغدة الدرقية"]
+MEDICATIONS = ["", "ميتفورمين", "مثبطات مضخة البروتون"]
+SUPPLEMENTS = ["", "فيتامين D", "حديد", "متعدد الفيتامينات"]
+
+
+def symptom_input(rng):
+    """استبيان واحد عشوائي صالح لنموذج SymptomInput"""
+    return {
+        "age": rng.randint(12, 85),
+        "gender": rng.choice(GENDERS),
+        "weight": round(rng.uniform(40, 130), 1),
+        "height": round(rng.uniform(145, 200), 1),
+        "sun_exposure": rng.choice(SUN_EXPOSURE_HOURS),
+        "activity_level": rng.choice(ACTIVITY_LEVELS),
+        "diet_type": rng.choice(DIET_TYPES),
+        "symptoms": "، ".join(rng.sample(SYMPTOMS, rng.randint(0, 5))),
+        "chronic_diseases": rng.choice(CHRONIC_DISEASES),
+        "medications": rng.choice(MEDICATIONS),
+        "vegetables_fruits": rng.choice(FREQUENCIES),
+        "dairy_meat": rng.choice(FREQUENCIES),
+        "supplements": rng.choice(SUPPLEMENTS),
+        "meals_info": {"meals_per_day": rng.randint(1, 5), "snacks": rng.choice(FREQUENCIES)},
+        "sun_context": rng.choice(SUN_CONTEXTS),
+        "physical_activities": rng.sample(PHYSICAL_ACTIVITIES, rng.randint(0, 3)),
+        "exercise_duration": rng.choice([0, 15, 30, 45, 60, 90]),
+        "sleep_info": {"quality": rng.choice(SLEEP_QUALITIES), "hours": rng.randint(4, 10)},
+        "stress_level": rng.choice(STRESS_LEVELS),
+        "meal_components": rng.sample(MEAL_COMPONENTS, rng.randint(0, 6)),
+        "cooking_methods": rng.sample(COOKING_METHODS, rng.randint(0, 3)),
+    }
+
+
+def symptom_inputs(count, seed=0):
+    """عدد محدد من الاستبيانات بترتيب ثابت لنفس البذرة"""
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield symptom_input(rng)
+
+
+def training_rows(count, seed=0):
+    """صفوف تدريب بنفس صيغة جدول user_inputs: نص الاستبيان ونص التحليل المخزن"""
+    import main
+
+    for data in symptom_inputs(count, seed):
+        data = main.SymptomInput(**data).dict()
+        yield {
+            "user_input": main.build_user_prompt(data),
+            "gemini_output": main.render_analysis_text(main.analyze_submission(data)),
+        }
@@ -0,0 +1,65 @@
+"""قياس زمن ModelTraining.train_and_evaluate على مجموعات اصطناعية متزايدة الحجم
+
+    python benchmarks/train.py --sizes 1000,10000,100000,1000000 --output train.json
+"""
+import argparse
+import pickle
+import resource
+import time
+
+from common import report, time_calls
+from synthetic import training_rows
+
+from training import ModelTraining
+
+
+def peak_rss_mb():
+    # ru_maxrss بالكيلوبايت على لينكس
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def bench_size(size, seed):
+    start = time.perf_counter()
+    trainer = ModelTraining()
+    X, y = [], []
+    for text, target in trainer.preprocess_data(training_rows(size, seed)):
+        X.append(text)
+        y.append(target)
+    generate_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    accuracy, _ = trainer.train_and_evaluate(X, y)
+    train_seconds = time.perf_counter() - start
+
+    # زمن توقع نص واحد كما تستدعيه نقطة /evaluate-model/
+    text_vec = trainer.vectorizer.transform(X[:1])
+    predict = time_calls(lambda: trainer.model.predict_proba(text_vec), number=200)
+    return {
+        "name": f"train_and_evaluate[{size}]",
+        "rows": size,
+        "labels": len(trainer.model.labels),
+        "generate_seconds": round(generate_seconds, 3),
+        "train_seconds": round(train_seconds, 3),
+        "rows_per_second": round(size / train_seconds, 1),
+        "accuracy": round(accuracy, 4),
+        "model_bytes": len(pickle.dumps(trainer.model)),
+        "predict_us": predict["median_us"],
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000",
+                        help="أحجام المجموعات مفصولة بفواصل، مثل 1000,10000,100000,1000000")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="حفظ النتيجة كملف JSON")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    results = [bench_size(size, args.seed) for size in sizes]
+    report("train", results, args.output, sizes=sizes, seed=args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import io
+import json
+import math
+
+import numpy as np
+import pandas as pd
+
+from rules import DEFICIENT, NORMAL, SEVERE, VITAMIN_REPORT, rule_engine
+
+# الأعمدة التي تحتاجها القواعد وحساب مؤشر كتلة الجسم
+REQUIRED_COLUMNS = [
+    "weight", "height", "sun_exposure", "diet_type", "symptoms",
+    "vegetables_fruits", "dairy_meat", "sun_context", "meal_components",
+]
+
+BMI_BINS = [18.5, 25, 30]
+BMI_CATEGORIES = ["نقص في الوزن", "وزن طبيعي", "زيادة في الوزن", "سمنة"]
+
+# الفاصل لا يظهر في النصوص، ويحيط بكل مكون حتى يمكن فحص التطابق التام بالبحث النصي
+SEPARATOR = "\x00"
+
+
+class BulkInputError(ValueError):
+    pass
+
+
+def _parse_components(value):
+    """تحويل مكونات الوجبات إلى قائمة نصوص سواء جاءت كقائمة أو JSON أو نص مفصول بـ |"""
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [str(item) for item in value]
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return []
+    value = str(value).strip()
+    if value.startswith("["):
+        try:
+            items = json.loads(value)
+        except json.JSONDecodeError as e:
+            raise BulkInputError(f"invalid meal_components JSON: {e}")
+        if not isinstance(items, list):
+            raise BulkInputError("meal_components JSON must be a list")
+        return [str(item) for item in items]
+    return [item.strip() for item in value.split("|") if item.strip()]
+
+
+def _fact_column(fact, frame, components):
+    """تقييم عامل خطر واحد على جميع الصفوف كعمود منطقي"""
+    kind = fact[0]
+    if kind == "in":
+        return frame[fact[1]].isin(fact[2]).to_numpy()
+    if kind == "eq":
+        return (frame[fact[1]] == fact[2]).to_numpy()
+    if kind == "lt":
+        return (frame[fact[1]] < fact[2]).to_numpy()
+    if kind == "symptom":
+        return frame["symptoms"].str.contains(fact[1], regex=False).to_numpy()
+    if kind == "component_contains":
+        return components.str.contains(fact[1], regex=False).to_numpy()
+    if kind == "has_component":
+        hits = np.zeros(len(frame), dtype=bool)
+        for item in fact[1]:
+            hits |= components.str.contains(f"{SEPARATOR}{item}{SEPARATOR}", regex=False).to_numpy()
+        return hits
+    raise ValueError(f"unknown rule fact: {fact!r}")
+
+
+def fact_matrix(frame):
+    """مصفوفة العوامل: صف لكل استبيان وعمود لكل عامل خطر في القواعد المترجمة"""
+    components = frame["meal_components"].map(
+        lambda value: SEPARATOR + SEPARATOR.join(_parse_components(value)) + SEPARATOR
+    )
+    matrix = np.empty((len(frame), len(rule_engine.fact_index)), dtype=bool)
+    for fact, index in rule_engine.fact_index.items():
+        matrix[:, index] = _fact_column(fact, frame, components)
+    return matrix
+
+
+def _mask_indices(mask):
+    return [index for index in range(mask.bit_length()) if mask >> index & 1]
+
+
+def nutrient_statuses(matrix):
+    """تقييم جميع قواعد المغذيات على مصفوفة العوامل كعمليات أعمدة"""
+    statuses = {}
+    for code, _, key, _ in VITAMIN_REPORT:
+        rule = rule_engine.rules.get(key)
+        if rule is None:
+            statuses[code] = np.full(len(matrix), NORMAL, dtype=object)
+            continue
+        score = (
+            matrix[:, _mask_indices(rule.positive)].sum(axis=1)
+            + (~matrix[:, _mask_indices(rule.negative)]).sum(axis=1)
+        )
+        status = np.where(score >= rule.deficient_at, DEFICIENT, NORMAL).astype(object)
+        if rule.severe_at is not None:
+            status[score >= rule.severe_at] = SEVERE
+        statuses[code] = status
+    return statuses
+
+
+def analyze_frame(frame):
+    """تحليل مجموعة كاملة من الاستبيانات: مؤشر كتلة الجسم وفئته وحالة كل مغذٍ"""
+    missing = [column for column in REQUIRED_COLUMNS if column not in frame.columns]
+    if missing:
+        raise BulkInputError(f"missing columns: {', '.join(missing)}")
+    frame = frame.reset_index(drop=True)
+    frame["symptoms"] = frame["symptoms"].fillna("").astype(str)
+
+    bmi = frame["weight"].astype(float) / (frame["height"].astype(float) / 100) ** 2
+    result = pd.DataFrame({
+        "bmi": bmi.round(1),
+        # الحدود نفسها المستخدمة في /submit-symptoms/، ولا فئة لمؤشر مفقود أو غير منتهٍ
+        "bmi_category": np.where(
+            np.isfinite(bmi),
+            np.select(
+                [bmi < BMI_BINS[0], bmi < BMI_BINS[1], bmi < BMI_BINS[2]],
+                BMI_CATEGORIES[:3],
+                default=BMI_CATEGORIES[3],
+            ),
+            None,
+        ),
+    })
+    for code, status in nutrient_statuses(fact_matrix(frame)).items():
+        result[code] = status
+    return result
+
+
+def analyze_records(records):
+    """واجهة بايثون: تحليل قائمة قواميس استبيانات دفعة واحدة"""
+    return analyze_frame(pd.DataFrame.from_records(records))
+
+
+def read_upload(filename, content):
+    """قراءة ملف CSV أو Parquet مرفوع إلى DataFrame"""
+    if filename.endswith(".parquet"):
+        try:
+            return pd.read_parquet(io.BytesIO(content))
+        except ImportError as e:
+            raise BulkInputError(f"parquet support is not installed: {e}")
+    if filename.endswith(".csv"):
+        return pd.read_csv(io.BytesIO(content))
+    raise BulkInputError("unsupported file type, expected .csv or .parquet")
+
+
+def column_values(column):
+    """قيم عمود النتيجة كقائمة قابلة للترميز بـ JSON، والقيم غير المنتهية (كطول صفري) تصبح None"""
+    values = column.tolist()
+    if column.dtype.kind == "f":
+        return [value if math.isfinite(value) else None for value in values]
+    return values
+
+
+def iter_ndjson(result, chunk_size=1000):
+    """بث النتائج كسطور JSON على دفعات"""
+    for start in range(0, len(result), chunk_size):
+        chunk = result.iloc[start:start + chunk_size]
+        yield chunk.to_json(orient="records", lines=True, force_ascii=False)
@@ -0,0 +1,367 @@
+import hashlib
+import logging
+import os
+import re
+import time
+
+import sqlalchemy
+from sqlalchemy import Column, Date, DateTime, Index, Integer, String, Text, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from metrics import DB_QUERY_SECONDS
+from nutrients import NUTRIENT_CODES
+from rules import bmi_category
+
+logger = logging.getLogger(__name__)
+
+# عنوان قاعدة البيانات: SQLite محلياً، ويمكن تمرير عنوان PostgreSQL للنشر على عدة عقد
+DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./test.db")
+
+# إعدادات مجمع الاتصالات
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+
+# إعدادات SQLite لكل اتصال
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL"),
+    # القيمة السالبة تعني الحجم بالكيلوبايت
+    "cache_size": -int(os.environ.get("SQLITE_CACHE_SIZE_KB", "65536")),
+    "mmap_size": int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "busy_timeout": int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+}
+
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+# تعريف جدول البيانات
+Base = declarative_base()
+
+class UserInput(Base):
+    __tablename__ = "user_inputs"
+    # المفتاح الأساسي يكفي لقراءة التدريب بترقيم المفاتيح دون فهرس إضافي
+    id = Column(Integer, primary_key=True)
+    # النصوص الخام بلا فهارس، فلا يوجد استعلام يرشح عليها
+    user_input = Column(Text)
+    gemini_output = Column(Text)
+    # أعمدة منظمة لاستعلامات التحليل وإزالة التكرار
+    created_at = Column(DateTime)
+    age_band = Column(String(16))
+    gender = Column(String(32))
+    diet_type = Column(String(64))
+    bmi_category = Column(String(32))
+    content_hash = Column(String(64))
+    # العناصر التي ظهر فيها نقص في التحليل المخزن، بت لكل عنصر بترتيب NUTRIENT_CODES
+    deficiency_mask = Column(Integer)
+
+    __table_args__ = (
+        Index("ix_user_inputs_created_at", "created_at"),
+        Index("ix_user_inputs_diet_type_created_at", "diet_type", "created_at"),
+        Index("ix_user_inputs_content_hash", "content_hash"),
+    )
+
+
+class GeminiResponse(Base):
+    """ردود Gemini المخزنة حسب بصمة نص الطلب"""
+    __tablename__ = "gemini_responses"
+    prompt_hash = Column(String(64), primary_key=True)
+    response = Column(Text, nullable=False)
+    created_at = Column(DateTime, server_default=sqlalchemy.func.now())
+
+
+# تجميعات أسبوعية لانتشار النقص، تحدث مع كل دفعة صفوف جديدة
+# الأبعاد غير المعروفة تخزن كنص فارغ لأنها جزء من المفتاح
+analytics_rollups = sqlalchemy.Table(
+    "analytics_rollups", Base.metadata,
+    Column("week", Date, primary_key=True),
+    Column("diet_type", String(64), primary_key=True),
+    Column("gender", String(32), primary_key=True),
+    Column("bmi_category", String(32), primary_key=True),
+    Column("submissions", Integer, nullable=False),
+    # الصفوف التي أمكن استخراج حالة العناصر من تحليلها، وهي مقام نسب الانتشار
+    Column("analyzed", Integer, nullable=False),
+    *[Column(f"{code}_deficient", Integer, nullable=False) for code in NUTRIENT_CODES],
+)
+
+# جدول إصدارات المخطط المطبقة
+schema_migrations = sqlalchemy.Table(
+    "schema_migrations", Base.metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(200)),
+    Column("applied_at", DateTime, server_default=sqlalchemy.func.now()),
+)
+
+AGE_BANDS = [(18, "<18"), (30, "18-29"), (45, "30-44"), (60, "45-59")]
+
+
+def age_band(age):
+    """الفئة العمرية المخزنة بدلاً من العمر الدقيق"""
+    if age is None:
+        return None
+    for upper, band in AGE_BANDS:
+        if age < upper:
+            return band
+    return "60+"
+
+
+def content_hash(text):
+    """بصمة نص الاستبيان لاكتشاف الإرسالات المكررة"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def build_user_prompt(input_data):
+    """نص الاستبيان بنفس الصيغة المخزنة في عمود user_input"""
+    return f"""
+        قم بتحليل الحالة الصحية والغذائية التالية وقدم توصيات مفصلة:
+        العمر: {input_data['age']}
+        الجنس: {input_data['gender']}
+        الوزن: {input_data['weight']} كجم
+        الطول: {input_data['height']} سم
+        التعرض للشمس: {input_data['sun_exposure']} ساعات يومياً
+        مستوى النشاط: {input_data['activity_level']}
+        النظام الغذائي: {input_data['diet_type']}
+        الأعراض: {input_data['symptoms']}
+        الأمراض المزمنة: {input_data['chronic_diseases']}
+        الأدوية: {input_data['medications']}
+        تناول الخضروات والفواكه: {input_data['vegetables_fruits']}
+        تناول منتجات الألبان واللحوم: {input_data['dairy_meat']}
+        المكملات الغذائية: {input_data['supplements']}
+        """
+
+
+PROMPT_FIELDS = {
+    "age": re.compile(r"العمر: (\d+)"),
+    "gender": re.compile(r"الجنس: (.+)"),
+    "diet_type": re.compile(r"النظام الغذائي: (.+)"),
+    "weight": re.compile(r"الوزن: ([\d.]+)"),
+    "height": re.compile(r"الطول: ([\d.]+)"),
+}
+
+
+def structured_fields(user_input):
+    """استخراج الأعمدة المنظمة من نص الاستبيان المخزن (للصفوف القديمة)"""
+    values = {}
+    for name, pattern in PROMPT_FIELDS.items():
+        match = pattern.search(user_input or "")
+        values[name] = match.group(1).strip() if match else None
+
+    category = None
+    try:
+        weight, height = float(values["weight"]), float(values["height"])
+        if height > 0:
+            category = bmi_category(weight / ((height / 100) ** 2))
+    except (TypeError, ValueError):
+        pass
+
+    return {
+        "age_band": age_band(int(values["age"])) if values["age"] else None,
+        "gender": values["gender"],
+        "diet_type": values["diet_type"],
+        "bmi_category": category,
+        "content_hash": content_hash(user_input or ""),
+    }
+
+
+# تسميات حقول الاستبيان في قالب build_user_prompt وفي قوالب user_input الأقدم
+PROMPT_LABELS = {
+    "العمر": "age",
+    "الجنس": "gender",
+    "الوزن": "weight",
+    "الطول": "height",
+    "التعرض للشمس": "sun_exposure",
+    "ساعات التعرض للشمس يومياً": "sun_exposure",
+    "مستوى النشاط": "activity_level",
+    "النظام الغذائي": "diet_type",
+    "نوع النظام الغذائي": "diet_type",
+    "الأعراض": "symptoms",
+    "الأعراض الحالية": "symptoms",
+    "الأمراض المزمنة": "chronic_diseases",
+    "الأدوية": "medications",
+    "الأدوية المستخدمة": "medications",
+    "تناول الخضروات والفواكه": "vegetables_fruits",
+    "تناول منتجات الألبان واللحوم": "dairy_meat",
+    "المكملات الغذائية": "supplements",
+    "المكملات الحالية": "supplements",
+}
+PROMPT_LINE = re.compile(r"^[\s\-]*([^:\n]+?):[ \t]*(.*?)\s*$", re.M)
+
+
+def questionnaire_values(user_input):
+    """قيم حقول الاستبيان في نص user_input كأزواج (الحقل، القيمة)، دون نص القالب وتعليماته"""
+    return [
+        (PROMPT_LABELS[label], value)
+        for label, value in PROMPT_LINE.findall(user_input or "")
+        if label in PROMPT_LABELS
+    ]
+
+
+def is_sqlite(url):
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def async_url(url):
+    """تحويل عنوان قاعدة البيانات إلى عنوان يستخدم مشغلاً غير متزامن"""
+    url = make_url(url)
+    if url.drivername in ASYNC_DRIVERS:
+        url = url.set(drivername=ASYNC_DRIVERS[url.drivername])
+    return url
+
+
+def sync_url(url):
+    """عنوان بمشغل متزامن لعمليات التدريب المنفصلة"""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    return url.set(drivername="postgresql" if backend == "postgres" else backend)
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+def _query_started(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _query_finished(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "UNKNOWN"
+    DB_QUERY_SECONDS.labels(operation).observe(elapsed)
+
+
+def _query_failed(context):
+    stack = context.connection.info.get("query_start") if context.connection is not None else None
+    if stack:
+        stack.pop()
+
+
+def create_db_engine(url=DATABASE_URL):
+    """محرك غير متزامن واحد بمجمع اتصالات لجميع عمليات قاعدة البيانات"""
+    engine = create_async_engine(
+        async_url(url),
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_pre_ping=not is_sqlite(url),
+    )
+    if is_sqlite(url):
+        event.listen(engine.sync_engine, "connect", _set_sqlite_pragmas)
+    # زمن كل استعلام حسب نوعه لمقاييس /metrics
+    event.listen(engine.sync_engine, "before_cursor_execute", _query_started)
+    event.listen(engine.sync_engine, "after_cursor_execute", _query_finished)
+    event.listen(engine.sync_engine, "handle_error", _query_failed)
+    return engine
+
+
+def create_sync_db_engine(url=DATABASE_URL):
+    """محرك متزامن بنفس الإعدادات لعمليات التدريب التي تعمل خارج حلقة الأحداث"""
+    engine = sqlalchemy.create_engine(sync_url(url))
+    if is_sqlite(url):
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+    return engine
+
+
+class GeminiResponseCache:
+    """ذاكرة دائمة لردود Gemini في قاعدة البيانات"""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    async def get(self, key):
+        table = GeminiResponse.__table__
+        async with self.engine.connect() as conn:
+            return await conn.scalar(
+                sqlalchemy.select([table.c.response]).where(table.c.prompt_hash == key)
+            )
+
+    async def set(self, key, response):
+        try:
+            async with self.engine.begin() as conn:
+                await conn.execute(
+                    GeminiResponse.__table__.insert().values(prompt_hash=key, response=response)
+                )
+        except sqlalchemy.exc.IntegrityError:
+            # خزّنته عملية أخرى في الوقت نفسه
+            pass
+
+
+def _add_missing_columns(conn, table):
+    existing = {column["name"] for column in sqlalchemy.inspect(conn).get_columns(table.name)}
+    for column in table.columns:
+        if column.name not in existing:
+            column_type = column.type.compile(dialect=conn.dialect)
+            conn.execute(sqlalchemy.text(
+                f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+            ))
+
+
+def _migrate_structured_columns(conn):
+    """إزالة فهارس النصوص الخام وإضافة الأعمدة المنظمة وتعبئتها للصفوف الموجودة"""
+    table = UserInput.__table__
+    for name in ("ix_user_inputs_user_input", "ix_user_inputs_gemini_output", "ix_user_inputs_id"):
+        conn.execute(sqlalchemy.text(f"DROP INDEX IF EXISTS {name}"))
+
+    _add_missing_columns(conn, table)
+
+    # تعبئة الأعمدة الجديدة على دفعات
+    last_id = -1
+    while True:
+        rows = conn.execute(
+            sqlalchemy.select([table.c.id, table.c.user_input])
+            .where(table.c.id > last_id).order_by(table.c.id).limit(1000)
+        ).all()
+        if not rows:
+            break
+        conn.execute(
+            table.update().where(table.c.id == sqlalchemy.bindparam("row_id")),
+            [dict(structured_fields(row.user_input), row_id=row.id) for row in rows]
+        )
+        last_id = rows[-1].id
+
+    for index in table.indexes:
+        index.create(conn, checkfirst=True)
+
+
+def _migrate_deficiency_mask(conn):
+    """إضافة عمود النقص، وتعبئته مع جدول التجميعات تتم بمهمة /stats/backfill لا عند بدء التشغيل"""
+    _add_missing_columns(conn, UserInput.__table__)
+
+
+# الترحيلات بالترتيب: (الإصدار، الوصف، الدالة)
+MIGRATIONS = [
+    (1, "structured user_inputs columns, drop raw text indexes", _migrate_structured_columns),
+    (2, "user_inputs.deficiency_mask and analytics_rollups", _migrate_deficiency_mask),
+]
+
+
+def run_migrations(conn):
+    """إنشاء المخطط لقاعدة جديدة أو ترقية قاعدة قائمة إلى أحدث إصدار"""
+    inspector = sqlalchemy.inspect(conn)
+    fresh = not inspector.has_table(UserInput.__tablename__)
+    Base.metadata.create_all(conn)
+
+    applied = set(conn.execute(sqlalchemy.select([schema_migrations.c.version])).scalars())
+    for version, description, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        # قاعدة جديدة أُنشئت بالمخطط الحالي مباشرة، فيكفي تسجيل الترحيل
+        if not fresh:
+            logger.info(f"Applying schema migration {version}: {description}")
+            migrate(conn)
+        conn.execute(schema_migrations.insert().values(version=version, description=description))
+
+
+async def init_schema(engine):
+    """إنشاء المخطط وتطبيق الترحيلات عند بدء التشغيل بدلاً من وقت الاستيراد"""
+    async with engine.begin() as conn:
+        await conn.run_sync(run_migrations)
@@ -0,0 +1,137 @@
+import hashlib
+import re
+import time
+import zlib
+
+import numpy as np
+
+from db import questionnaire_values
+
+# توقيعات MinHash: عدد دوال التجزئة، مقسمة إلى نطاقات LSH متساوية
+NUM_PERMUTATIONS = 128
+LSH_BANDS = 32
+# أدنى تشابه Jaccard مقدر بين خصائص صفين ليعدا شبه متطابقين. في test.db تصل الاستبيانات
+# المختلفة حتى 0.8، واختلاف حقل واحد من نحو 13 خاصية يعطي 0.85، فلا يبلغه إلا تطابق الإجابات
+NEAR_DUPLICATE_THRESHOLD = 0.9
+SIGNATURE_BLOCK_ROWS = 256
+
+# القيم الرقمية تحمل وحدة القالب بعدها (كجم، سم، سنة)، والقوائم مفصولة بفواصل
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+_LIST_SEPARATOR = re.compile(r"[,،]")
+_WORD = re.compile(r"\w+")
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+_random = np.random.RandomState(1)
+_A = _random.randint(1, 2**32, NUM_PERMUTATIONS, dtype=np.uint64)
+_B = _random.randint(0, 2**32, NUM_PERMUTATIONS, dtype=np.uint64)
+
+# يتغير مع أي معامل يغير التوقيعات، فتعرف المخازن متى تعيد حسابها
+SIGNATURE_VERSION = f"minhash-{NUM_PERMUTATIONS}-fields-crc32"
+
+
+def text_hash(text):
+    """أول 64 بت من بصمة النص، وهي بداية content_hash في جدول المدخلات"""
+    return int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+
+
+def questionnaire_features(user_input):
+    """خصائص التشابه لصف: قيمة كل حقل مع اسمه، وكل عنصر من الحقول المتعددة كالأعراض
+
+    نص القالب لا يدخل فيها، فيقاس التشابه بإجابات الاستبيان وحدها مهما اختلف القالب.
+    النصوص التي لا تحمل حقولاً معروفة تمثل بكلماتها.
+    """
+    values = questionnaire_values(user_input)
+    if not values:
+        return _WORD.findall(user_input or "")
+    features = []
+    for name, value in values:
+        number = _NUMBER.match(value)
+        items = [number.group(0)] if number else [item.strip() for item in _LIST_SEPARATOR.split(value)]
+        features.extend(f"{name}={item}" for item in items)
+    return features
+
+
+def feature_hashes(features):
+    """بصمات 32 بت فريدة لخصائص الصف"""
+    return np.unique(np.fromiter((zlib.crc32(feature.encode("utf-8")) for feature in features),
+                                 dtype=np.uint64, count=len(features)))
+
+
+def minhash_signatures(feature_lists):
+    """توقيع MinHash لكل صف من قائمة خصائصه، بحساب متجه لمجموعات من الصفوف"""
+    hashed = [feature_hashes(features) for features in feature_lists]
+    signatures = np.full((len(hashed), NUM_PERMUTATIONS), _MAX_HASH, dtype=np.uint32)
+    sizes = np.fromiter((len(row) for row in hashed), dtype=np.int64, count=len(hashed))
+    filled = np.flatnonzero(sizes)
+    # مصفوفة التباديل بحجم (عدد الخصائص × NUM_PERMUTATIONS)، فتحسب لمجموعات صغيرة من الصفوف
+    for block in range(0, len(filled), SIGNATURE_BLOCK_ROWS):
+        rows = filled[block:block + SIGNATURE_BLOCK_ROWS]
+        values = np.concatenate([hashed[row] for row in rows])
+        starts = np.concatenate(([0], np.cumsum(sizes[rows])[:-1]))
+        permuted = ((values[:, None] * _A + _B) % _MERSENNE_PRIME) & _MAX_HASH
+        signatures[rows] = np.minimum.reduceat(permuted, starts, axis=0)
+    return signatures
+
+
+def _first_of_group(keys):
+    """موضع أول صف يحمل نفس المفتاح لكل صف"""
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    return first[inverse.ravel()]
+
+
+def find_duplicates(hashes, signatures, threshold=NEAR_DUPLICATE_THRESHOLD):
+    """الصفوف المكررة حرفياً أو تقريباً لصف سابق، والصفوف مرتبة بالمعرف فيبقى الأقدم
+
+    المرشحون هم الصفوف التي تتشارك نطاق LSH كاملاً مع أول صف فيه، ويعد المرشح مكرراً
+    إذا بلغ تشابهه المقدر threshold. التشابه يقدر من بقية النطاقات، لأن النطاق المشترك
+    متطابق بشرط الترشيح فيرفع التقدير. threshold بقيمة None يكتفي بالتكرار الحرفي.
+    يعيد قناعين: التكرار الحرفي والتقريبي.
+    """
+    positions = np.arange(len(hashes))
+    exact = _first_of_group(np.asarray(hashes, dtype=np.uint64)) != positions
+
+    near = np.zeros(len(hashes), dtype=bool)
+    if threshold is None:
+        return exact, near
+    # صفوف بلا خصائص تتطابق توقيعاتها الفارغة دون أن تتشابه
+    empty = (signatures == _MAX_HASH).all(axis=1)
+    rows_per_band = NUM_PERMUTATIONS // LSH_BANDS
+    for band in range(LSH_BANDS):
+        columns = slice(band * rows_per_band, (band + 1) * rows_per_band)
+        keys = np.ascontiguousarray(signatures[:, columns])
+        first = _first_of_group(keys.view(np.dtype((np.void, keys.dtype.itemsize * rows_per_band))))
+        candidates = np.flatnonzero((first != positions) & ~exact & ~near & ~empty)
+        if len(candidates):
+            others = np.ones(NUM_PERMUTATIONS, dtype=bool)
+            others[columns] = False
+            similarity = (signatures[candidates][:, others] == signatures[first[candidates]][:, others]).mean(axis=1)
+            near[candidates[similarity >= threshold]] = True
+    return exact, near
+
+
+def dedup_corpus(ids, hashes, signatures, threshold=None):
+    """معرفات الصفوف المستبعدة من التدريب مرتبة، مع ملخص حجم التكرار
+
+    التكرار الحرفي يستبعد دائماً، والتقريبي فقط عند تحديد threshold.
+    """
+    started = time.perf_counter()
+    exact, near = find_duplicates(hashes, signatures, threshold)
+    dropped = np.asarray(ids, dtype=np.int64)[exact | near]
+    rows = len(ids)
+    return np.sort(dropped), {
+        "threshold": threshold,
+        "rows": rows,
+        "exact_duplicates": int(exact.sum()),
+        "near_duplicates": int(near.sum()),
+        "kept_rows": rows - len(dropped),
+        "shrink_ratio": round(len(dropped) / rows, 4) if rows else 0.0,
+        "dedup_seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def keep_mask(ids, dropped):
+    """قناع الصفوف غير المستبعدة، وdropped مصفوفة مرتبة من dedup_corpus"""
+    if dropped is None or not len(dropped):
+        return np.ones(len(ids), dtype=bool)
+    return ~np.isin(ids, dropped)
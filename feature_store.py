@@ -0,0 +1,288 @@
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+from collections import Counter, namedtuple
+from contextlib import contextmanager
+
+import numpy as np
+import scipy.sparse as sp
+import sklearn
+from sklearn.feature_extraction.text import CountVectorizer, HashingVectorizer
+from sklearn.preprocessing import normalize
+
+from dedup import (
+    NUM_PERMUTATIONS, SIGNATURE_VERSION, keep_mask, minhash_signatures, questionnaire_features, text_hash
+)
+from nutrients import NUTRIENT_CODES, PARSER_VERSION, parse_nutrient_labels
+
+# يرفع عند تغيير صيغة ملفات الأجزاء
+STORE_FORMAT = 2
+VOCABULARY_FILE = "vocabulary.json"
+SHARD_PREFIX = "shard_"
+SHARD_SUFFIX = ".npz"
+LOCK_FILE = ".lock"
+# إعدادات المخزن بجانب أجزائه، ووجوده يميز مجلدات المخازن عن غيرها في المجلد الأب
+MANIFEST_FILE = "store.json"
+
+# إعدادات التقطيع المشتركة بين CountVectorizer وHashingVectorizer في التدريب
+TOKENIZER_PARAMS = ("analyzer", "lowercase", "ngram_range", "preprocessor", "stop_words",
+                    "strip_accents", "token_pattern", "tokenizer")
+
+# دفعة جاهزة للتدريب: معرفات الصفوف ذات الهدف ومصفوفتاها، مع عدد صفوف الدفعة كلها وآخر معرف فيها
+FeatureBatch = namedtuple("FeatureBatch", ["ids", "X", "Y", "rows", "last_id"])
+
+
+def store_config():
+    """كل ما يغير ناتج التقطيع أو استخراج الهدف، وتغيّر أي منه يبطل المخزن"""
+    params = CountVectorizer().get_params()
+    return {
+        "format": STORE_FORMAT,
+        "sklearn": sklearn.__version__,
+        "tokenizer": {name: repr(params[name]) for name in TOKENIZER_PARAMS},
+        "labels": list(NUTRIENT_CODES),
+        "parser": PARSER_VERSION,
+        "signatures": SIGNATURE_VERSION,
+    }
+
+
+def store_namespace(config):
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def alphabetical_ranks(tokens):
+    """ترتيب كل كلمة أبجدياً، وهو ترتيب أعمدة CountVectorizer بعد fit"""
+    order = np.argsort(np.asarray(tokens, dtype=object), kind="stable")
+    ranks = np.empty(len(tokens), dtype=np.int64)
+    ranks[order] = np.arange(len(tokens))
+    return ranks
+
+
+def select_columns(counts, ranks, max_features=None):
+    """أعمدة القاموس التي يبقيها CountVectorizer.fit على نفس الصفوف، بترتيبها فيه
+
+    نفس قواعد fit: الكلمات الموجودة مرتبة أبجدياً ثم الإبقاء على الأكثر تكراراً.
+    """
+    present = np.flatnonzero(counts.getnnz(axis=0))
+    order = present[np.argsort(ranks[present], kind="stable")]
+    if max_features is not None and len(order) > max_features:
+        frequencies = np.asarray(counts[:, order].sum(axis=0)).ravel()
+        keep = np.zeros(len(order), dtype=bool)
+        keep[(-frequencies).argsort()[:max_features]] = True
+        order = order[keep]
+    return order
+
+
+def build_count_vectorizer(tokens, columns, **params):
+    """CountVectorizer جاهز للتحويل بقاموس محدد دون المرور على النصوص"""
+    vectorizer = CountVectorizer(**params)
+    vectorizer.vocabulary_ = {tokens[column]: index for index, column in enumerate(columns)}
+    vectorizer.fixed_vocabulary_ = False
+    return vectorizer
+
+
+class FeatureStore:
+    """مخزن دائم لعدادات الكلمات وأهداف التدريب وتوقيعات التكرار لكل صف في user_inputs
+
+    الصفوف لا تتغير بعد إدخالها، فيُقطَّع كل صف مرة واحدة ويحفظ في أجزاء CSR متتالية
+    حسب المعرف، ويُعاد التقطيع فقط للصفوف الجديدة. الأعمدة فهرس لقاموس كلمات عام
+    يكبر بالإضافة فقط، وتُبنى منه مصفوفات CountVectorizer وHashingVectorizer كلتيهما.
+    """
+
+    def __init__(self, root, chunk_size=5000):
+        self.config = store_config()
+        self.namespace = store_namespace(self.config)
+        self.root = root
+        self.path = os.path.join(root, self.namespace)
+        self.chunk_size = chunk_size
+        os.makedirs(self.path, exist_ok=True)
+        with self._locked():
+            if not os.path.exists(os.path.join(self.path, MANIFEST_FILE)):
+                self._atomic_write(MANIFEST_FILE, lambda f: f.write(json.dumps(self.config, sort_keys=True).encode("utf-8")))
+        self._purge_other_namespaces()
+        self._analyzer = CountVectorizer().build_analyzer()
+        self.tokens = []
+        self._token_ids = {}
+
+    def _purge_other_namespaces(self):
+        # مخازن إعدادات التقطيع السابقة لم تعد صالحة، وما سواها في المجلد لا يمس
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name != self.namespace and os.path.isfile(os.path.join(path, MANIFEST_FILE)):
+                shutil.rmtree(path, ignore_errors=True)
+
+    @contextmanager
+    def _locked(self, shared=False):
+        # عمليات تدريب متزامنة قد تضيف إلى القاموس نفسه، والقراءة المشتركة تمنع إعادة
+        # كتابة الجزء الأخير والقاموس أثناءها
+        with open(os.path.join(self.path, LOCK_FILE), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _atomic_write(self, name, write):
+        path = os.path.join(self.path, name)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+
+    def _load_vocabulary(self):
+        path = os.path.join(self.path, VOCABULARY_FILE)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.tokens = json.load(f)
+        else:
+            self.tokens = []
+        self._token_ids = {token: index for index, token in enumerate(self.tokens)}
+
+    def _save_vocabulary(self):
+        self._atomic_write(VOCABULARY_FILE, lambda f: f.write(json.dumps(self.tokens, ensure_ascii=False).encode("utf-8")))
+
+    def shard_names(self):
+        return sorted(
+            name for name in os.listdir(self.path)
+            if name.startswith(SHARD_PREFIX) and name.endswith(SHARD_SUFFIX)
+        )
+
+    def _read_shard(self, name):
+        with np.load(os.path.join(self.path, name)) as shard:
+            return {key: shard[key] for key in shard.files}
+
+    def _write_shard(self, rows):
+        ids = np.fromiter((row["id"] for row in rows), dtype=np.int64, count=len(rows))
+        indptr = [0]
+        indices, data = [], []
+        labels = np.zeros((len(rows), len(NUTRIENT_CODES)), dtype=np.int8)
+        has_labels = np.zeros(len(rows), dtype=bool)
+        hashes = np.zeros(len(rows), dtype=np.uint64)
+        feature_lists = []
+        for position, row in enumerate(rows):
+            tokens = self._analyzer(row["user_input"])
+            feature_lists.append(questionnaire_features(row["user_input"]))
+            hashes[position] = text_hash(row["user_input"])
+            for token, count in Counter(tokens).items():
+                index = self._token_ids.get(token)
+                if index is None:
+                    index = self._token_ids[token] = len(self.tokens)
+                    self.tokens.append(token)
+                indices.append(index)
+                data.append(count)
+            indptr.append(len(indices))
+            target = parse_nutrient_labels(row["gemini_output"])
+            if target is not None:
+                labels[position] = target
+                has_labels[position] = True
+        # القاموس يحفظ قبل الجزء الذي يشير إلى كلماته الجديدة
+        self._save_vocabulary()
+        self._atomic_write(f"{SHARD_PREFIX}{ids[0]:012d}{SHARD_SUFFIX}", lambda f: np.savez(
+            f, ids=ids, indptr=np.asarray(indptr, dtype=np.int64),
+            indices=np.asarray(indices, dtype=np.int32), data=np.asarray(data, dtype=np.int32),
+            labels=labels, has_labels=has_labels, hashes=hashes, signatures=minhash_signatures(feature_lists)
+        ))
+
+    def sync(self, fetch):
+        """تقطيع الصفوف التي لم تدخل المخزن بعد وحفظها كأجزاء جديدة
+
+        fetch(after_id) يعيد دفعات صفوف user_inputs بعد المعرف المحدد. الجزء الأخير
+        الناقص يعاد بناؤه مع الصفوف الجديدة حتى لا تتراكم أجزاء صغيرة. يعيد عدد الصفوف المقطعة.
+        """
+        with self._locked():
+            self._load_vocabulary()
+            names = self.shard_names()
+            after_id = -1
+            if names:
+                last = self._read_shard(names[-1])
+                if len(last["ids"]) < self.chunk_size:
+                    os.remove(os.path.join(self.path, names[-1]))
+                    after_id = int(last["ids"][0]) - 1
+                else:
+                    after_id = int(last["ids"][-1])
+            new_rows = 0
+            for chunk in fetch(after_id):
+                self._write_shard(chunk)
+                new_rows += len(chunk)
+            return new_rows
+
+    def shards(self, after_id=-1):
+        """الأجزاء المحفوظة بالترتيب كمصفوفات CSR بعرض القاموس الحالي، للصفوف بعد after_id فقط
+
+        القفل المشترك يبقى حتى انتهاء المرور على الأجزاء، فينتظر sync انتهاء القراءة.
+        """
+        with self._locked(shared=True):
+            self._load_vocabulary()
+            width = len(self.tokens)
+            for name in self.shard_names():
+                shard = self._read_shard(name)
+                ids = shard["ids"]
+                if ids[-1] <= after_id:
+                    continue
+                counts = sp.csr_matrix(
+                    (shard["data"], shard["indices"], shard["indptr"]), shape=(len(ids), width)
+                )
+                keep = ids > after_id
+                if not keep.all():
+                    ids, counts = ids[keep], counts[keep]
+                    shard["labels"], shard["has_labels"] = shard["labels"][keep], shard["has_labels"][keep]
+                yield ids, counts, shard["labels"], shard["has_labels"]
+
+    def dedup_inputs(self):
+        """معرفات الصفوف ذات الهدف وبصمات نصوصها وتوقيعات MinHash المحفوظة لها، لـ dedup_corpus"""
+        ids, hashes, signatures = [], [], []
+        with self._locked(shared=True):
+            for name in self.shard_names():
+                shard = self._read_shard(name)
+                has_labels = shard["has_labels"]
+                ids.append(shard["ids"][has_labels])
+                hashes.append(shard["hashes"][has_labels])
+                signatures.append(shard["signatures"][has_labels])
+        if not ids:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint64), np.zeros((0, NUM_PERMUTATIONS), dtype=np.uint32)
+        return np.concatenate(ids), np.concatenate(hashes), np.concatenate(signatures)
+
+    def load(self, dropped=None):
+        """جميع الصفوف ذات الهدف: (المعرفات، عدادات الكلمات، الأهداف، عدد الصفوف الكلي)
+
+        dropped معرفات مستبعدة من dedup_corpus لا تدخل في النتيجة.
+        """
+        ids, counts, labels, rows = [], [], [], 0
+        for shard_ids, shard_counts, shard_labels, has_labels in self.shards():
+            rows += len(shard_ids)
+            has_labels = has_labels & keep_mask(shard_ids, dropped)
+            ids.append(shard_ids[has_labels])
+            counts.append(shard_counts[has_labels])
+            labels.append(shard_labels[has_labels])
+        if not ids:
+            return np.zeros(0, dtype=np.int64), sp.csr_matrix((0, len(self.tokens))), np.zeros((0, len(NUTRIENT_CODES)), dtype=np.int8), 0
+        return np.concatenate(ids), sp.vstack(counts, format="csr"), np.concatenate(labels), rows
+
+    def count_vectorizer(self, counts, max_features=None):
+        """CountVectorizer مكافئ لتدريبه على نفس الصفوف، وأعمدة المصفوفة المقابلة له"""
+        columns = select_columns(counts, alphabetical_ranks(self.tokens), max_features)
+        return build_count_vectorizer(self.tokens, columns, max_features=max_features), columns
+
+    def hashing_projection(self, vectorizer):
+        """مصفوفة تحويل من أعمدة القاموس إلى خانات HashingVectorizer بنفس دالة التجزئة"""
+        params = vectorizer.get_params()
+        params.update(analyzer=lambda token: [token], norm=None)
+        projection = HashingVectorizer(**params).transform(self.tokens)
+        return projection.tocsr()
+
+    def hashed_batches(self, vectorizer, after_id=-1, dropped=None):
+        """دفعات مكافئة لـ vectorizer.transform على نصوص الصفوف دون إعادة تقطيعها"""
+        projection = None
+        for ids, counts, labels, has_labels in self.shards(after_id):
+            has_labels = has_labels & keep_mask(ids, dropped)
+            if projection is None or projection.shape[0] < counts.shape[1]:
+                projection = self.hashing_projection(vectorizer)
+            if not has_labels.any():
+                # normalize لا يقبل مصفوفة فارغة، والدفعة بلا أهداف تبقى لتقدم last_id كما في text_batches
+                X = sp.csr_matrix((0, vectorizer.n_features))
+            else:
+                X = counts[has_labels] @ projection[:counts.shape[1]]
+                if vectorizer.norm is not None:
+                    X = normalize(X, norm=vectorizer.norm, copy=False)
+            yield FeatureBatch(ids[has_labels], X, labels[has_labels], len(ids), int(ids[-1]))
@@ -0,0 +1,206 @@
+import asyncio
+import hashlib
+import logging
+import random
+import time
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-pro:generateContent"
+
+# حالات الخطأ المؤقتة التي تستحق إعادة المحاولة
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class GeminiError(Exception):
+    pass
+
+
+def prompt_hash(prompt):
+    """بصمة نص الطلب، تستخدم مفتاحاً للتخزين المؤقت ولدمج الطلبات المتطابقة"""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+class TokenBucket:
+    """تحديد معدل الطلبات: عدد محدد من الطلبات في الثانية مع سعة للدفقات"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        # القفل يحافظ على ترتيب المنتظرين
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class GeminiClient:
+    """عميل Gemini بجلسة واحدة طويلة العمر ومجمع اتصالات محدود
+
+    يحد من التزامن ومعدل الطلبات، ويعيد المحاولة بتأخير عشوائي متزايد، ويدمج الطلبات
+    المتطابقة الجارية، ويخزن الردود في ذاكرة دائمة حسب بصمة الطلب.
+    """
+
+    def __init__(self, api_key, api_url=DEFAULT_API_URL, cache=None, max_connections=20,
+                 max_concurrency=8, rate_per_second=5.0, burst=10, max_retries=4,
+                 backoff_base=0.5, backoff_max=8.0, timeout=30.0):
+        self.api_key = api_key
+        self.api_url = api_url
+        self.cache = cache
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._bucket = TokenBucket(rate_per_second, burst)
+        self._inflight = {}
+        self._session = None
+        self.calls = 0
+        self.cache_hits = 0
+        self.coalesced = 0
+
+    async def start(self):
+        connector = aiohttp.TCPConnector(limit=self.max_connections, ttl_dns_cache=300)
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={"x-goog-api-key": self.api_key},
+        )
+
+    async def close(self):
+        # الطلبات المشتركة محمية من إلغاء مستدعيها فتلغى هنا قبل إغلاق الجلسة
+        inflight = list(self._inflight.values())
+        for task in inflight:
+            task.cancel()
+        await asyncio.gather(*inflight, return_exceptions=True)
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def generate(self, prompt):
+        """إرجاع رد Gemini لنص الطلب، من الذاكرة المؤقتة أو من طلب جارٍ إن وجد"""
+        key = prompt_hash(prompt)
+        if self.cache is not None:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                self.cache_hits += 1
+                return cached
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(key, prompt))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # الحماية من الإلغاء حتى لا يلغي مستدعٍ واحد الطلب المشترك
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key, prompt):
+        payload = {"contents": [{"parts": [{"text": prompt}]}]}
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                async with self._semaphore:
+                    await self._bucket.acquire()
+                    self.calls += 1
+                    async with self._session.post(self.api_url, json=payload) as response:
+                        if response.status == 200:
+                            text = self._extract_text(await response.json())
+                            if self.cache is not None:
+                                try:
+                                    await self.cache.set(key, text)
+                                except Exception as e:
+                                    # الرد صالح وإن تعذر تخزينه
+                                    logger.error(f"Gemini cache write failed: {str(e)}")
+                            return text
+                        body = await response.text()
+                        if response.status not in RETRYABLE_STATUSES:
+                            raise GeminiError(f"Gemini API error {response.status}: {body[:200]}")
+                        retry_after = response.headers.get("Retry-After")
+                        error = GeminiError(f"Gemini API error {response.status}")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = e
+
+            if attempt == self.max_retries:
+                raise GeminiError(f"Gemini request failed after {attempt + 1} attempts: {error}")
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+            if retry_after is not None and retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+            logger.warning(f"Gemini request failed ({error}), retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    def _extract_text(data):
+        try:
+            return "".join(part.get("text", "") for part in data["candidates"][0]["content"]["parts"])
+        except (KeyError, IndexError, TypeError):
+            raise GeminiError("unexpected Gemini response format")
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "cache_hits": self.cache_hits,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight),
+        }
+
+
+class BackgroundTasks:
+    """مهام خلفية بحد أقصى للجاري منها في الوقت نفسه
+
+    عند بلوغ الحد لا تنشأ المهمة ويعود spawn بـ False ليعالجها المستدعي بطريقة أخرى.
+    عند الإيقاف تنتظر المهام الجارية حتى مهلة، ثم تلغى المتبقية وتحسب متروكة.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._tasks = set()
+        self.started = 0
+        self.dropped = 0
+        self.abandoned = 0
+
+    def spawn(self, fn, *args):
+        if len(self._tasks) >= self.limit:
+            self.dropped += 1
+            logger.warning("Background Gemini tasks are at their limit, skipping Gemini analysis")
+            return False
+        task = asyncio.create_task(fn(*args))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        self.started += 1
+        return True
+
+    async def drain(self, timeout):
+        """انتظار المهام الجارية، وإرجاع عدد المهام الملغاة بعد انقضاء المهلة"""
+        if not self._tasks:
+            return 0
+        _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        if pending:
+            self.abandoned += len(pending)
+            logger.warning(f"Cancelling {len(pending)} background Gemini tasks still pending after {timeout}s")
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        return len(pending)
+
+    def stats(self):
+        return {
+            "pending": len(self._tasks),
+            "started": self.started,
+            "dropped": self.dropped,
+            "abandoned": self.abandoned,
+        }
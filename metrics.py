@@ -0,0 +1,289 @@
+import bisect
+import threading
+import time
+
+from starlette.routing import Match
+
+# حدود الأزمنة بالثواني: طلبات HTTP واستعلامات قاعدة البيانات والتدريب
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# الدوال الساخنة تستغرق ميكروثوانٍ
+FAST_BUCKETS = (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 1e-2, 0.1, 1.0)
+TRAINING_BUCKETS = (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+
+_registry = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """مقياس بأسماء تسميات ثابتة، ولكل مجموعة قيم تسميات ابن مستقل"""
+    metric_type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        for values, child in list(self._children.items()):
+            lines.extend(child.samples(self.name, self.labelnames, values))
+        return lines
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+    def samples(self, name, labelnames, values):
+        yield f"{name}{_format_labels(labelnames, values)} {_format_value(self.value)}"
+
+
+class _CounterValue(_Value):
+    def samples(self, name, labelnames, values):
+        yield f"{name}_total{_format_labels(labelnames, values)} {_format_value(self.value)}"
+
+
+class Counter(_Metric):
+    metric_type = "counter"
+
+    def _new_child(self):
+        return _CounterValue()
+
+    def inc(self, amount=1.0):
+        self._default.inc(amount)
+
+
+class Gauge(_Metric):
+    metric_type = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1.0):
+        self._default.inc(amount)
+
+    def dec(self, amount=1.0):
+        self._default.dec(amount)
+
+    def set(self, value):
+        self._default.set(value)
+
+
+class _HistogramValue:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self):
+        return _Timer(self)
+
+    def samples(self, name, labelnames, values):
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = 'le="' + _format_value(bound) + '"'
+            yield f"{name}_bucket{_format_labels(labelnames, values, le)} {cumulative}"
+        yield f"{name}_sum{_format_labels(labelnames, values)} {_format_value(total)}"
+        yield f"{name}_count{_format_labels(labelnames, values)} {cumulative}"
+
+
+class Histogram(_Metric):
+    metric_type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+
+class _Timer:
+    """قياس زمن كتلة وتسجيله في مدرج تكراري"""
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class Callback:
+    """مقياس تقرأ قيمه عند الجمع فقط، لإحصاءات تحتفظ بها المكونات نفسها"""
+
+    def __init__(self, name, documentation, fn, metric_type="gauge", labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.fn = fn
+        self.metric_type = metric_type
+        self.labelnames = tuple(labelnames)
+        _registry.append(self)
+
+    def render(self):
+        values = self.fn()
+        if values is None:
+            return []
+        if not isinstance(values, dict):
+            values = {(): values}
+        sample = f"{self.name}_total" if self.metric_type == "counter" else self.name
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        for labelvalues, value in values.items():
+            if not isinstance(labelvalues, tuple):
+                labelvalues = (labelvalues,)
+            lines.append(f"{sample}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}")
+        return lines
+
+
+def render():
+    """جميع المقاييس بصيغة Prometheus النصية"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+HTTP_REQUESTS = Counter("http_requests", "HTTP requests by route, method and status",
+                        ["route", "method", "status"])
+HTTP_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency by route",
+                         ["route", "method"])
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being served", ["route"])
+ANALYZER_SECONDS = Histogram("analyzer_duration_seconds", "Time spent in analysis steps",
+                             ["analyzer"], buckets=FAST_BUCKETS)
+MODEL_LOAD_SECONDS = Histogram("model_load_duration_seconds", "Time to load model artifacts from disk")
+MODEL_PREDICT_SECONDS = Histogram("model_predict_duration_seconds", "Time per prediction batch",
+                                  buckets=FAST_BUCKETS)
+MODEL_PREDICT_BATCH_SIZE = Histogram("model_predict_batch_size", "Texts per prediction batch",
+                                     buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 1024, 10000))
+DB_QUERY_SECONDS = Histogram("db_query_duration_seconds", "Database statement latency by operation",
+                             ["operation"])
+TRAINING_JOBS = Counter("training_jobs", "Finished training jobs by outcome", ["status"])
+TRAINING_SECONDS = Histogram("training_duration_seconds", "Total training job duration by mode",
+                             ["mode"], buckets=TRAINING_BUCKETS)
+TRAINING_PHASE_SECONDS = Histogram("training_phase_duration_seconds", "Training duration by phase",
+                                   ["phase"], buckets=TRAINING_BUCKETS)
+ADMISSION_QUEUE_SECONDS = Histogram("admission_queue_duration_seconds",
+                                    "Time admitted requests waited for a concurrency slot", ["route"])
+ADMISSION_REJECTED = Counter("admission_rejected", "Requests shed before running by route and reason",
+                             ["route", "reason"])
+WARMUP_SECONDS = Gauge("warmup_duration_seconds", "Time spent in each startup warm-up step and in total",
+                       ["step"])
+
+
+class RouteTemplates:
+    """قالب المسار المطابق للطلب، لتسميات المقاييس وحدود القبول"""
+
+    def __init__(self, routes):
+        self.routes = routes
+        # المسارات الثابتة (دون معاملات) تُحفظ بعد أول مطابقة
+        self._static = {}
+
+    def __call__(self, scope):
+        path = scope["path"]
+        template = self._static.get(path)
+        if template is not None:
+            return template
+        for route in self.routes:
+            match, _ = route.matches(scope)
+            if match != Match.NONE:
+                template = getattr(route, "path", path)
+                if template == path:
+                    self._static[path] = template
+                return template
+        return "unmatched"
+
+
+class MetricsMiddleware:
+    """تسجيل زمن كل طلب وعدد الطلبات الجارية حسب قالب المسار، كوسيط ASGI خفيف"""
+
+    def __init__(self, app, routes):
+        self.app = app
+        self._route = RouteTemplates(routes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route = self._route(scope)
+        method = scope["method"]
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_flight = HTTP_IN_FLIGHT.labels(route)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_flight.dec()
+            HTTP_LATENCY.labels(route, method).observe(time.perf_counter() - start)
+            HTTP_REQUESTS.labels(route, method, str(status)).inc()
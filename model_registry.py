@@ -0,0 +1,265 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from metrics import MODEL_LOAD_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# الصيغة القديمة: ملفان منفصلان لكل إصدار، تبقى قابلة للتحميل فقط
+MODEL_PREFIX = "model_"
+VECTORIZER_PREFIX = "vectorizer_"
+ARTIFACT_SUFFIX = ".pkl"
+
+# الصيغة الحالية: مجلد واحد لكل إصدار يحوي ملف البيانات وبيانه
+BUNDLE_PREFIX = "bundle_"
+BUNDLE_FORMAT = 1
+BUNDLE_MANIFEST = "manifest.json"
+BUNDLE_ARTIFACTS = "artifacts.joblib"
+
+
+class ArtifactError(Exception):
+    """حزمة نموذج ناقصة أو تالفة أو بصيغة غير مدعومة"""
+
+
+@dataclass(frozen=True)
+class ServingModel:
+    """زوج النموذج والمحول النشط مع رقم إصداره"""
+    version: str
+    model: object
+    vectorizer: object
+    model_file: str
+    vectorizer_file: str
+    manifest: dict = None
+    loaded_at: float = field(default_factory=time.time)
+
+
+def artifact_filenames(version):
+    """أسماء ملفات النموذج والمحول لإصدار معين بالصيغة القديمة"""
+    return (
+        f"{MODEL_PREFIX}{version}{ARTIFACT_SUFFIX}",
+        f"{VECTORIZER_PREFIX}{version}{ARTIFACT_SUFFIX}",
+    )
+
+
+def bundle_dirname(version):
+    return f"{BUNDLE_PREFIX}{version}"
+
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _fsync_dir(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def save_bundle(model_dir, version, model, vectorizer, metadata=None):
+    """كتابة النموذج والمحول كحزمة واحدة ذرية بإصدار واحد وبيان ومجموع تحقق
+
+    تُكتب الحزمة في مجلد مؤقت ثم يعاد تسميته، فلا يرى أي قارئ حزمة نصف مكتوبة.
+    الملف غير مضغوط حتى تُربط مصفوفاته بالذاكرة عند التحميل.
+    """
+    import joblib
+    final_dir = os.path.join(model_dir, bundle_dirname(version))
+    # المجلد المؤقت يبدأ بنقطة فلا يظهر ضمن الإصدارات المتوفرة
+    tmp_dir = tempfile.mkdtemp(prefix=f".{bundle_dirname(version)}.", dir=model_dir)
+    try:
+        artifacts_path = os.path.join(tmp_dir, BUNDLE_ARTIFACTS)
+        joblib.dump({"model": model, "vectorizer": vectorizer}, artifacts_path, compress=0)
+        manifest = {
+            "format": BUNDLE_FORMAT,
+            "version": version,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "model_class": type(model).__name__,
+            "vectorizer_class": type(vectorizer).__name__,
+            "files": {
+                BUNDLE_ARTIFACTS: {
+                    "sha256": file_sha256(artifacts_path),
+                    "bytes": os.path.getsize(artifacts_path),
+                }
+            },
+            "metadata": metadata or {},
+        }
+        with open(os.path.join(tmp_dir, BUNDLE_MANIFEST), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        for name in (BUNDLE_ARTIFACTS, BUNDLE_MANIFEST):
+            with open(os.path.join(tmp_dir, name), "rb") as f:
+                os.fsync(f.fileno())
+        os.rename(tmp_dir, final_dir)
+        _fsync_dir(model_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return manifest
+
+
+def read_manifest(model_dir, version):
+    path = os.path.join(model_dir, bundle_dirname(version), BUNDLE_MANIFEST)
+    try:
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ArtifactError(f"cannot read manifest for version {version}: {e}")
+    if manifest.get("format") != BUNDLE_FORMAT or manifest.get("version") != version:
+        raise ArtifactError(f"unsupported or mismatched manifest for version {version}")
+    return manifest
+
+
+def verify_bundle(model_dir, version, manifest, checksum=True):
+    """التحقق من حجم ملفات الحزمة، ومن مجموعها عند الطلب"""
+    bundle_dir = os.path.join(model_dir, bundle_dirname(version))
+    for name, expected in manifest["files"].items():
+        path = os.path.join(bundle_dir, name)
+        try:
+            size = os.path.getsize(path)
+        except OSError as e:
+            raise ArtifactError(f"missing artifact {name} for version {version}: {e}")
+        if size != expected["bytes"]:
+            raise ArtifactError(f"size mismatch for {name} in version {version}")
+        if checksum and file_sha256(path) != expected["sha256"]:
+            raise ArtifactError(f"checksum mismatch for {name} in version {version}")
+
+
+def artifacts_exist(model_dir, version):
+    """هل يوجد إصدار بالصيغة الحالية أو القديمة"""
+    if os.path.isfile(os.path.join(model_dir, bundle_dirname(version), BUNDLE_MANIFEST)):
+        return True
+    return all(os.path.exists(os.path.join(model_dir, name)) for name in artifact_filenames(version))
+
+
+def load_artifacts(model_dir, version, mmap_mode=None, verify=True):
+    """تحميل النموذج والمحول لإصدار معين
+
+    مع mmap_mode="r" تُربط المصفوفات الرقمية بالملف للقراءة فقط، فتتشارك العمليات
+    نسخة واحدة من ذاكرة الصفحات ويبقى زمن التحميل شبه ثابت مهما كبر النموذج.
+    """
+    import joblib
+    bundle_dir = os.path.join(model_dir, bundle_dirname(version))
+    if os.path.isdir(bundle_dir):
+        manifest = read_manifest(model_dir, version)
+        verify_bundle(model_dir, version, manifest, checksum=verify)
+        artifacts = joblib.load(os.path.join(bundle_dir, BUNDLE_ARTIFACTS), mmap_mode=mmap_mode)
+        name = os.path.join(bundle_dirname(version), BUNDLE_ARTIFACTS)
+        return ServingModel(version, artifacts["model"], artifacts["vectorizer"], name, name, manifest)
+    model_file, vectorizer_file = artifact_filenames(version)
+    model = joblib.load(os.path.join(model_dir, model_file))
+    vectorizer = joblib.load(os.path.join(model_dir, vectorizer_file))
+    return ServingModel(version, model, vectorizer, model_file, vectorizer_file)
+
+
+class ModelRegistry:
+    """سجل النماذج: يحتفظ بالنموذج النشط في الذاكرة ويبدله عند توفر إصدار أحدث"""
+
+    def __init__(self, model_dir=".", refresh_interval=30.0, mmap=True, verify_checksums=True):
+        self.model_dir = model_dir
+        self.refresh_interval = refresh_interval
+        # الربط بالذاكرة للقراءة فقط يكفي للتوقع، والتدريب التزايدي يحمل نسخته الخاصة
+        self.mmap_mode = "r" if mmap else None
+        self.verify_checksums = verify_checksums
+        self._active = None
+        self._last_check = 0.0
+        # عند تثبيت إصدار يدوياً لا يتم استبداله تلقائياً بإصدار أحدث
+        self._pinned = False
+        # إصدارات تالفة فشل تحميلها في الفحص الدوري، فلا يعاد تحميلها مع كل طلب
+        self._rejected = set()
+        # القفل يسلسل عمليات التحميل فقط، ولا تنتظره طلبات التوقع الجارية
+        self._load_lock = asyncio.Lock()
+
+    @property
+    def active(self):
+        return self._active
+
+    def list_versions(self):
+        """الإصدارات المتوفرة على القرص: الحزم المكتملة والأزواج القديمة من نموذج ومحول"""
+        files = set(os.listdir(self.model_dir))
+        versions = set()
+        for name in files:
+            if name.startswith(BUNDLE_PREFIX):
+                if os.path.isfile(os.path.join(self.model_dir, name, BUNDLE_MANIFEST)):
+                    versions.add(name[len(BUNDLE_PREFIX):])
+            elif name.startswith(MODEL_PREFIX) and name.endswith(ARTIFACT_SUFFIX):
+                version = name[len(MODEL_PREFIX):-len(ARTIFACT_SUFFIX)]
+                if artifact_filenames(version)[1] in files:
+                    versions.add(version)
+        return sorted(versions)
+
+    def _load(self, version):
+        # يستورد joblib وsklearn عند تحميل أول نموذج فقط، في خيط منفصل
+        with MODEL_LOAD_SECONDS.time():
+            return load_artifacts(self.model_dir, version, self.mmap_mode, self.verify_checksums)
+
+    async def promote(self, version, pin=False):
+        """تحميل إصدار محدد في خيط منفصل ثم تبديله بشكل ذري"""
+        async with self._load_lock:
+            if self._active is not None and self._active.version == version:
+                self._pinned = pin
+                return self._active
+            # حزمة تالفة ترفع خطأ هنا ويبقى الإصدار السابق وحالة التثبيت كما هما
+            serving = await asyncio.to_thread(self._load, version)
+            self._pinned = pin
+            self._rejected.discard(version)
+            # إسناد المرجع عملية ذرية، والطلبات الجارية تحتفظ بالنسخة السابقة
+            self._active = serving
+            logger.info(f"Model version {version} is now serving")
+            return serving
+
+    async def refresh(self, force=False):
+        """التحقق من وجود إصدار أحدث على القرص وترقيته عند الحاجة"""
+        now = time.monotonic()
+        if self._active is not None and (self._pinned or (
+                not force and now - self._last_check < self.refresh_interval)):
+            return self._active
+        self._last_check = now
+        versions = [version for version in await asyncio.to_thread(self.list_versions) if version not in self._rejected]
+        if not versions:
+            return self._active
+        latest = versions[-1]
+        if self._active is None or latest > self._active.version:
+            try:
+                return await self.promote(latest)
+            except ArtifactError as e:
+                # بدون نموذج نشط لا يوجد ما يخدم الطلبات فيرفع الخطأ، وإلا يستمر الإصدار الحالي
+                if self._active is None:
+                    raise
+                logger.error(f"Skipping model version {latest}, keeping {self._active.version}: {str(e)}")
+                self._rejected.add(latest)
+        return self._active
+
+    async def get(self):
+        """إرجاع النموذج النشط، مع فحص دوري لوجود إصدار جديد"""
+        serving = await self.refresh()
+        if serving is None:
+            raise LookupError("no trained model available")
+        return serving
+
+    def info(self):
+        """معلومات الإصدار الذي يخدم الطلبات حالياً"""
+        serving = self._active
+        if serving is None:
+            return {"version": None}
+        return {
+            "version": serving.version,
+            "model_file": serving.model_file,
+            "vectorizer_file": serving.vectorizer_file,
+            "checksum": serving.manifest["files"][BUNDLE_ARTIFACTS]["sha256"] if serving.manifest else None,
+            "memory_mapped": serving.manifest is not None and self.mmap_mode is not None,
+            "pinned": self._pinned,
+            "loaded_at": datetime.fromtimestamp(serving.loaded_at).strftime('%Y-%m-%d %H:%M:%S'),
+        }
+
@@ -0,0 +1,156 @@
+import itertools
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.model_selection import KFold
+
+from feature_store import select_columns
+from nutrient_model import LabelCounts, MultiLabelNB
+
+# فضاء البحث: حجم القاموس، والعد الثنائي بدل التكرار، وتنعيم Naive Bayes
+SEARCH_GRID = {
+    "max_features": [1000, 5000, 20000, None],
+    "binary": [False, True],
+    "alpha": [0.1, 0.3, 1.0],
+}
+# مقياس اختيار المرشح الأفضل من تقرير LabelCounts
+SEARCH_METRIC = "macro_f1"
+
+_SHARED_ARRAYS = ("data", "indices", "indptr", "labels", "folds", "ranks")
+
+# المصفوفة المشتركة داخل كل عملية عاملة، تحمّل مرة واحدة عند بدء العملية
+_shared = None
+
+
+def grid_candidates(grid):
+    """جميع تركيبات المعاملات بترتيب ثابت"""
+    names = sorted(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def fold_assignments(num_rows, folds, seed=42):
+    """رقم طية الاختبار لكل صف"""
+    assignment = np.empty(num_rows, dtype=np.int8)
+    for fold, (_, test_index) in enumerate(KFold(folds, shuffle=True, random_state=seed).split(np.arange(num_rows))):
+        assignment[test_index] = fold
+    return assignment
+
+
+def binarize(X):
+    X = X.copy()
+    X.data[:] = 1
+    return X
+
+
+def _share(directory, counts, labels, folds, ranks):
+    """كتابة المصفوفة مرة واحدة على القرص لتربطها العمليات العاملة بالذاكرة بدلاً من نسخها لكل مهمة"""
+    arrays = {
+        "data": counts.data, "indices": counts.indices, "indptr": counts.indptr,
+        "labels": labels, "folds": folds, "ranks": ranks,
+    }
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, f"{name}.npy"), array)
+    return counts.shape
+
+
+def _attach(directory, shape):
+    global _shared
+    arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in _SHARED_ARRAYS}
+    counts = sp.csr_matrix((arrays["data"], arrays["indices"], arrays["indptr"]), shape=shape, copy=False)
+    _shared = (counts, arrays["labels"], arrays["folds"], arrays["ranks"])
+
+
+def _evaluate(fold, max_features, binary, alphas):
+    """تقييم طية واحدة لجميع قيم التنعيم: اختيار القاموس والتحويل مشتركان بينها"""
+    counts, labels, folds, ranks = _shared
+    started = time.perf_counter()
+    test = np.asarray(folds) == fold
+    train_counts = counts[~test]
+    columns = select_columns(train_counts, ranks, max_features)
+    X_train, X_test = train_counts[:, columns], counts[test][:, columns]
+    if binary:
+        X_train, X_test = binarize(X_train), binarize(X_test)
+    y_train, y_test = np.asarray(labels[~test]), np.asarray(labels[test])
+    prepare_seconds = time.perf_counter() - started
+
+    results = []
+    for alpha in alphas:
+        started = time.perf_counter()
+        model = MultiLabelNB(alpha=alpha).fit(X_train, y_train)
+        scores = LabelCounts()
+        scores.update(y_test, model.predict(X_test))
+        report = scores.report()
+        results.append({
+            "alpha": alpha,
+            "label_accuracy": report["label_accuracy"],
+            "macro_f1": report["macro_f1"],
+            "micro_f1": report["micro_f1"],
+            "seconds": time.perf_counter() - started + prepare_seconds / len(alphas),
+        })
+    return fold, max_features, binary, results
+
+
+def _summarize(candidate, fold_results):
+    summary = dict(candidate)
+    for metric in ("label_accuracy", "macro_f1", "micro_f1"):
+        values = [result[metric] for result in fold_results]
+        summary[f"mean_{metric}"] = float(np.mean(values))
+        summary[f"std_{metric}"] = float(np.std(values))
+    summary["fit_seconds"] = round(sum(result["seconds"] for result in fold_results), 4)
+    return summary
+
+
+def cross_validate_grid(counts, labels, ranks, grid=None, folds=5, workers=None, progress=None):
+    """بحث شبكي بتقييم متقاطع k-fold، تُوزع الطيات والمرشحون على مجمع عمليات
+
+    counts عدادات الكلمات لكل صف بأعمدة القاموس الكامل، وranks ترتيبها الأبجدي.
+    يعيد المرشحين مرتبين من الأفضل حسب SEARCH_METRIC.
+    """
+    grid = grid or SEARCH_GRID
+    counts = sp.csr_matrix(counts)
+    labels = np.asarray(labels, dtype=np.int8)
+    assignment = fold_assignments(counts.shape[0], folds)
+    # كل مهمة: طية واحدة مع حجم قاموس وصيغة عد، وتُجرب قيم التنعيم داخلها
+    alphas = list(grid["alpha"])
+    tasks = [
+        (fold, max_features, binary)
+        for fold in range(folds) for max_features in grid["max_features"] for binary in grid["binary"]
+    ]
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+
+    collected = {}
+    with tempfile.TemporaryDirectory(prefix="model_selection_") as directory:
+        shape = _share(directory, counts, labels, assignment, ranks)
+        if workers <= 1:
+            _attach(directory, shape)
+            outcomes = (_evaluate(*task, alphas) for task in tasks)
+            executor = None
+        else:
+            context = multiprocessing.get_context("spawn")
+            executor = ProcessPoolExecutor(
+                max_workers=workers, mp_context=context, initializer=_attach, initargs=(directory, shape)
+            )
+            outcomes = (future.result() for future in as_completed(
+                [executor.submit(_evaluate, *task, alphas) for task in tasks]
+            ))
+        try:
+            for done, (fold, max_features, binary, results) in enumerate(outcomes, start=1):
+                for result in results:
+                    collected.setdefault((max_features, binary, result["alpha"]), []).append(result)
+                if progress is not None:
+                    progress(done / len(tasks))
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+    summaries = [
+        _summarize(candidate, collected[(candidate["max_features"], candidate["binary"], candidate["alpha"])])
+        for candidate in grid_candidates(grid)
+    ]
+    summaries.sort(key=lambda summary: summary[f"mean_{SEARCH_METRIC}"], reverse=True)
+    return summaries, workers
@@ -0,0 +1,125 @@
+import numpy as np
+
+from nutrients import NUTRIENT_CODES
+
+
+class MultiLabelNB:
+    """Naive Bayes متعدد التسميات: تصنيف ثنائي (نقص/طبيعي) لكل عنصر غذائي
+
+    يحتفظ بعدادات الكلمات في صفوف النقص لكل عنصر وبالعدد الكلي، وعدادات الطبيعي هي الفرق بينهما.
+    التوقع ضرب مصفوفة واحد للدفعة كاملة مهما كان عدد الصفوف التي تدرب عليها النموذج.
+    """
+    multilabel = True
+
+    def __init__(self, labels=NUTRIENT_CODES, alpha=1.0):
+        self.labels = tuple(labels)
+        self.alpha = alpha
+        self.n_rows_ = 0
+        self.label_count_ = None
+        self.feature_count_ = None
+        self.total_feature_count_ = None
+        self.coef_ = None
+        self.intercept_ = None
+
+    def get_params(self, deep=True):
+        return {"alpha": self.alpha}
+
+    def fit(self, X, Y):
+        self.feature_count_ = None
+        self.n_rows_ = 0
+        return self.partial_fit(X, Y)
+
+    def partial_fit(self, X, Y):
+        """إضافة دفعة إلى العدادات، Y مصفوفة (الصفوف × التسميات) من 0 و1"""
+        Y = np.asarray(Y, dtype=np.float64).reshape(X.shape[0], len(self.labels))
+        if self.feature_count_ is None:
+            self.label_count_ = np.zeros(len(self.labels))
+            self.feature_count_ = np.zeros((len(self.labels), X.shape[1]))
+            self.total_feature_count_ = np.zeros(X.shape[1])
+        self.feature_count_ += np.asarray(X.T @ Y).T
+        self.total_feature_count_ += np.asarray(X.sum(axis=0)).ravel()
+        self.label_count_ += Y.sum(axis=0)
+        self.n_rows_ += X.shape[0]
+        self._update_coefficients()
+        return self
+
+    def _update_coefficients(self):
+        deficient = self.feature_count_ + self.alpha
+        normal = (self.total_feature_count_ - self.feature_count_) + self.alpha
+        deficient_log = np.log(deficient) - np.log(deficient.sum(axis=1, keepdims=True))
+        normal_log = np.log(normal) - np.log(normal.sum(axis=1, keepdims=True))
+        # التوقع يحتاج الفرق فقط: log P(x|نقص) - log P(x|طبيعي)
+        self.coef_ = np.ascontiguousarray((deficient_log - normal_log).T)
+        # احتمالات أولية مع تنعيم لابلاس حتى لا تنعدم لعنصر لم يظهر نقصه بعد
+        self.intercept_ = (
+            np.log(self.label_count_ + 1.0) - np.log(self.n_rows_ - self.label_count_ + 1.0)
+        )
+
+    def decision_function(self, X):
+        return np.asarray(X @ self.coef_) + self.intercept_
+
+    def predict_proba(self, X):
+        """احتمال النقص لكل عنصر: مصفوفة (الصفوف × التسميات)"""
+        return 1.0 / (1.0 + np.exp(-np.clip(self.decision_function(X), -500, 500)))
+
+    def predict(self, X):
+        return (self.decision_function(X) > 0).astype(np.int8)
+
+
+def _ratio(numerator, denominator):
+    return float(numerator / denominator) if denominator else 0.0
+
+
+def _f1(precision, recall):
+    return 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+
+
+class LabelCounts:
+    """عدادات التقييم لكل عنصر غذائي، تُجمع دفعة بعد دفعة دون الاحتفاظ بالتوقعات"""
+
+    def __init__(self, labels=NUTRIENT_CODES):
+        self.labels = labels
+        self.true_positive = np.zeros(len(labels), dtype=np.int64)
+        self.false_positive = np.zeros(len(labels), dtype=np.int64)
+        self.false_negative = np.zeros(len(labels), dtype=np.int64)
+        self.correct = np.zeros(len(labels), dtype=np.int64)
+        self.exact = 0
+        self.rows = 0
+
+    def update(self, actual, predicted):
+        actual = np.asarray(actual, dtype=bool)
+        predicted = np.asarray(predicted, dtype=bool)
+        self.true_positive += (actual & predicted).sum(axis=0)
+        self.false_positive += (~actual & predicted).sum(axis=0)
+        self.false_negative += (actual & ~predicted).sum(axis=0)
+        matches = actual == predicted
+        self.correct += matches.sum(axis=0)
+        self.exact += int(matches.all(axis=1).sum())
+        self.rows += len(actual)
+
+    def accuracy(self):
+        """متوسط دقة التسميات: نسبة العناصر التي توقعت حالتها صحيحة"""
+        return _ratio(self.correct.sum(), self.rows * len(self.labels))
+
+    def report(self):
+        """ملخص التقييم لحالة النقص: لكل عنصر ومتوسطاته، ونسبة الصفوف المطابقة بالكامل"""
+        per_label = {}
+        for index, code in enumerate(self.labels):
+            tp, fp, fn = self.true_positive[index], self.false_positive[index], self.false_negative[index]
+            precision, recall = _ratio(tp, tp + fp), _ratio(tp, tp + fn)
+            per_label[code] = {
+                "precision": precision,
+                "recall": recall,
+                "f1": _f1(precision, recall),
+                "support": int(tp + fn),
+            }
+        tp, fp, fn = self.true_positive.sum(), self.false_positive.sum(), self.false_negative.sum()
+        micro_precision, micro_recall = _ratio(tp, tp + fp), _ratio(tp, tp + fn)
+        return {
+            "label_accuracy": self.accuracy(),
+            "subset_accuracy": _ratio(self.exact, self.rows),
+            "micro_f1": _f1(micro_precision, micro_recall),
+            "macro_f1": float(np.mean([scores["f1"] for scores in per_label.values()])),
+            "support": self.rows,
+            "per_nutrient": per_label,
+        }
@@ -0,0 +1,142 @@
+import hashlib
+import re
+
+from rules import DEFICIENT, NORMAL, VITAMIN_REPORT
+
+# ترتيب التسميات في النموذج متعدد التسميات هو ترتيب جدول التقرير
+NUTRIENT_CODES = tuple(code for code, _, _, _ in VITAMIN_REPORT)
+NUTRIENT_NAMES = tuple(name for _, name, _, _ in VITAMIN_REPORT)
+SECTION_TITLE = "**تحليل الفيتامينات والمعادن**"
+
+NEGATIONS = ("لا يوجد نقص", "لا توجد علامات نقص", "لا يعاني من نقص", "لا نقص", "بدون نقص")
+# عبارات تعني النقص دون كلمة "نقص": "التعرض للشمس غير كافٍ لفيتامين D"
+SHORTFALLS = ("غير كاف", "لا يكون كافي", "لا يكفي", "لا تكفي")
+
+# أسماء كل عنصر كما ترد في ردود Gemini: الحرف اللاتيني والعربي للفيتامين، والاسم الكيميائي،
+# واسم المعدن دون "ال". تكتب كتعبيرات منتظمة بترتيب NUTRIENT_CODES
+_VITAMIN = "فيتامين\\s*"
+NUTRIENT_ALIASES = {
+    "vitamin_d": (_VITAMIN + "(?:D[23]?|د)", "كالسيفيرول"),
+    "vitamin_a": (_VITAMIN + "(?:A|أ|ا|إ)", "ريتينول"),
+    "vitamin_e": (_VITAMIN + "(?:E|هـ|ه)", "توكوفيرول"),
+    "vitamin_k": (_VITAMIN + "(?:K|ك)",),
+    "vitamin_c": (_VITAMIN + "(?:C|ج|سي)", "حمض الأسكوربيك", "أسكوربيك"),
+    "b1": (_VITAMIN + "ب\\s?1", "B1", "ثيامين"),
+    "b2": (_VITAMIN + "ب\\s?2", "B2", "ريبوفلافين"),
+    "b3": (_VITAMIN + "ب\\s?3", "B3", "نياسين"),
+    "b6": (_VITAMIN + "ب\\s?6", "B6", "بيريدوكسين"),
+    "b12": (_VITAMIN + "ب\\s?12", "B12", "كوبالامين"),
+    "folate": ("حمض الفوليك", "فوليك", "فولات", _VITAMIN + "ب\\s?9", "B9"),
+    "iron": ("حديد",),
+    "calcium": ("كالسيوم",),
+    "magnesium": ("مغنيسيوم", "مغنيزيوم", "ماغنسيوم"),
+    "zinc": ("زنك",),
+    "selenium": ("سيلينيوم", "سلينيوم"),
+    "copper": ("نحاس",),
+    "manganese": ("منغنيز", "منجنيز"),
+    "potassium": ("بوتاسيوم",),
+    "iodine": ("يود",),
+}
+
+# بداية كلمة، مع حروف الجر والعطف والتعريف الملتصقة بالاسم: "بالحديد"، "لفيتامين"، "وفيتامين"
+_PREFIX = "(?<![\\w])(?:[وف]?[بلك]?(?:ال|ل)?)"
+# نهاية الاسم: لا حرف ولا رقم بعده، فلا يطابق "B1" بداية "B12" ولا "يود" بداية "يودي"
+_SUFFIX = "(?![\\w])"
+# حدود العبارة داخل السطر، والنقطة العشرية ليست منها
+_CLAUSE_SEPARATOR = re.compile(r"[،؛;]|\.(?!\d)")
+
+
+def _name_pattern(code):
+    alternatives = sorted(NUTRIENT_ALIASES[code], key=len, reverse=True)
+    return _PREFIX + "(?:" + "|".join(alternatives) + ")" + _SUFFIX
+
+
+_NUTRIENT_PATTERNS = [(index, re.compile(_name_pattern(code))) for index, code in enumerate(NUTRIENT_CODES)]
+
+# يتغير مع أسماء العناصر وعبارات النفي، فتعرف المخازن المشتقة متى تعيد الاستخراج
+PARSER_VERSION = hashlib.sha256(
+    repr((NUTRIENT_NAMES, NEGATIONS, SHORTFALLS, [pattern.pattern for _, pattern in _NUTRIENT_PATTERNS])).encode("utf-8")
+).hexdigest()[:16]
+
+
+def line_status(text):
+    """حالة العنصر من العبارة التي ذكر فيها: 1 للنقص و0 للطبيعي وNone إذا لم تُذكر"""
+    if any(phrase in text for phrase in NEGATIONS):
+        return 0
+    if "نقص" in text or any(phrase in text for phrase in SHORTFALLS):
+        return 1
+    if NORMAL in text:
+        return 0
+    return None
+
+
+def parse_nutrient_labels(text):
+    """تحويل نص التحليل (المحلي أو رد Gemini) إلى حالة نقص/طبيعي لكل عنصر غذائي
+
+    يبحث عن جميع العناصر في كل عبارة من كل سطر، وحالة العنصر من كلمات العبارة قبل
+    اسمه أو بعده ("نقص الحديد"، "الحديد: طبيعي"). النقص في أي عبارة يغلب، والعناصر غير
+    المذكورة بحالة تعد طبيعية. يعيد None إذا لم يُذكر أي عنصر بحالة، فلا يستخدم الصف في التدريب.
+    """
+    labels = [0] * len(NUTRIENT_CODES)
+    found = False
+    for line in text.splitlines():
+        for clause in _CLAUSE_SEPARATOR.split(line):
+            status = None
+            for index, pattern in _NUTRIENT_PATTERNS:
+                if pattern.search(clause) is None:
+                    continue
+                if status is None:
+                    status = line_status(clause)
+                    if status is None:
+                        break
+                labels[index] = max(labels[index], status)
+                found = True
+    return labels if found else None
+
+
+def deficiency_mask(labels):
+    """ترميز حالات النقص كعدد صحيح، بت لكل عنصر بترتيب NUTRIENT_CODES، وNone إذا لم تعرف"""
+    if labels is None:
+        return None
+    return sum(1 << index for index, deficient in enumerate(labels) if deficient)
+
+
+def merge_deficiency_masks(known, parsed):
+    """دمج قناع محفوظ مع قناع مستخرج من نص، فلا يفقد القناع المعروف نقصاً ولا يصبح None
+
+    الاستخراج من نص حر قد يفوته عنصر أو لا يجد أي حالة، فيضاف ما وجده إلى المعروف.
+    """
+    if parsed is None:
+        return known
+    if known is None:
+        return parsed
+    return known | parsed
+
+
+def render_nutrient_section(statuses):
+    """قسم الفيتامينات والمعادن بالصيغة المخزنة في عمود gemini_output"""
+    lines = "\n".join(f"* **{name}:** {status}" for name, status in zip(NUTRIENT_NAMES, statuses))
+    return f"{SECTION_TITLE}\n{lines}"
+
+
+def nutrient_prediction(probabilities, threshold=0.5):
+    """نتيجة التوقع لصف واحد من احتمالات النقص
+
+    الثقة هي احتمال التركيبة المتوقعة كاملة باعتبار التسميات مستقلة.
+    """
+    nutrients = []
+    confidence = 1.0
+    for code, probability in zip(NUTRIENT_CODES, probabilities):
+        probability = float(probability)
+        deficient = probability >= threshold
+        confidence *= probability if deficient else 1.0 - probability
+        nutrients.append({
+            "code": code,
+            "status": DEFICIENT if deficient else NORMAL,
+            "probability": round(probability, 4),
+        })
+    return {
+        "prediction": render_nutrient_section([item["status"] for item in nutrients]),
+        "confidence": confidence,
+        "nutrients": nutrients,
+    }
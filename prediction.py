@@ -0,0 +1,94 @@
+import asyncio
+import logging
+
+from metrics import MODEL_PREDICT_BATCH_SIZE, MODEL_PREDICT_SECONDS
+from nutrients import nutrient_prediction
+
+logger = logging.getLogger(__name__)
+
+
+def predict_batch(serving, texts):
+    """توقع مجموعة نصوص باستدعاء واحد للمحول والنموذج"""
+    MODEL_PREDICT_BATCH_SIZE.observe(len(texts))
+    with MODEL_PREDICT_SECONDS.time():
+        text_vec = serving.vectorizer.transform(texts)
+        proba = serving.model.predict_proba(text_vec)
+    if getattr(serving.model, "multilabel", False):
+        return [nutrient_prediction(row) for row in proba]
+    # النماذج القديمة: فئة نصية واحدة لكل صف
+    best = proba.argmax(axis=1)
+    classes = serving.model.classes_
+    return [
+        {"prediction": classes[col], "confidence": float(proba[row, col])}
+        for row, col in enumerate(best)
+    ]
+
+
+class MicroBatcher:
+    """تجميع طلبات التوقع المتزامنة لبضعة أجزاء من الثانية وتنفيذها كدفعة واحدة"""
+
+    def __init__(self, registry, max_batch_size=64, max_wait_ms=5.0):
+        self.registry = registry
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = None
+        self._task = None
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        # إلغاء الطلبات التي لم تُعالج بعد
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.cancel()
+
+    async def submit(self, text):
+        """إضافة نص إلى الدفعة الحالية وانتظار نتيجته"""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        # انتظار وصول طلبات أخرى فقط إذا لم يكن في الطابور ما يكفي لدفعة كاملة
+        if self._queue.qsize() < self.max_batch_size - 1:
+            await asyncio.sleep(self.max_wait)
+        while len(batch) < self.max_batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            texts = [text for text, _ in batch]
+            try:
+                serving = await self.registry.get()
+                results = await asyncio.to_thread(predict_batch, serving, texts)
+            except asyncio.CancelledError:
+                for _, future in batch:
+                    future.cancel()
+                raise
+            except Exception as e:
+                logger.error(f"Micro-batch error: {str(e)}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result((serving, result))
@@ -0,0 +1,37 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def sample_stacks(thread_ids=None, duration=10.0, interval=0.005):
+    """أخذ عينات دورية من مكدسات الخيوط وعدّ تكرار كل مكدس
+
+    يعمل في خيط منفصل فلا يوقف الخيوط المقيسة، وتكلفته محصورة في مدة القياس.
+    thread_ids=None يعني جميع الخيوط عدا خيط القياس نفسه.
+    """
+    own_id = threading.get_ident()
+    stacks = Counter()
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id or (thread_ids is not None and thread_id not in thread_ids):
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            stacks[";".join(reversed(labels))] += 1
+        time.sleep(interval)
+    return stacks
+
+
+def folded(stacks):
+    """المكدسات بالصيغة المطوية التي تقرؤها أدوات flamegraph.pl وspeedscope"""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
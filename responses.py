@@ -0,0 +1,206 @@
+import gzip
+import hashlib
+import json
+
+from fastapi import Response
+
+from rules import DEFICIENT, NORMAL, SEVERE, VITAMIN_REPORT, recommendation_variants
+
+# orjson اختياري لترميز أسرع، وbrotli اختياري لضغط أفضل من gzip
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def dumps(value):
+    """ترميز JSON مضغوط بـ UTF-8 بنفس صيغة استجابات FastAPI"""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+# قالب التحليل العام: الحقول بأسماء حقول SymptomInput، إضافة إلى bmi وbmi_category وsleep_quality
+ANALYSIS_TEMPLATE = """
+        ### التحليل العام للحالة الصحية
+        - مؤشر كتلة الجسم: {bmi:.1f} ({bmi_category})
+        - العمر: {age} سنة
+        - الجنس: {gender}
+        
+        ### تحليل نمط الحياة
+        - مستوى النشاط البدني: {activity_level}
+        - التعرض للشمس: {sun_exposure} ساعات يومياً
+        - جودة النوم: {sleep_quality}
+        - مستوى التوتر: {stress_level}
+        
+        ### تحليل النظام الغذائي
+        - نوع النظام: {diet_type}
+        - تناول الخضروات والفواكه: {vegetables_fruits}
+        - تناول البروتينات: {dairy_meat}
+        """
+
+# التوصيات العامة الثابتة في كل استجابة
+GENERAL_RECOMMENDATIONS = """
+        ### التوصيات العامة
+        1. تنظيم الوجبات الغذائية وتنويع مصادر الغذاء
+        2. تناول 5 حصص من الخضروات والفواكه يومياً
+        3. شرب 8-10 أكواب من الماء يومياً
+        4. ممارسة الرياضة لمدة 30 دقيقة على الأقل يومياً
+        5. الحصول على قسط كافٍ من النوم (7-9 ساعات)
+        6. تقليل مستويات التوتر من خلال ممارسة تمارين الاسترخاء
+        7. تناول وجبات متوازنة تشمل جميع العناصر الغذائية
+        8. المحافظة على وزن صحي ومؤشر كتلة جسم مثالي
+        """
+
+STATUS_CODES = {NORMAL: "normal", DEFICIENT: "deficient", SEVERE: "severe"}
+BMI_CATEGORY_CODES = {
+    "نقص في الوزن": "underweight",
+    "وزن طبيعي": "normal",
+    "زيادة في الوزن": "overweight",
+    "سمنة": "obese",
+}
+
+
+def render_analysis(input_data, bmi, bmi_category):
+    return ANALYSIS_TEMPLATE.format(
+        bmi=bmi, bmi_category=bmi_category, sleep_quality=input_data["sleep_info"]["quality"], **input_data
+    )
+
+
+def _build_catalog():
+    catalog = {
+        "statuses": {code: label for label, code in STATUS_CODES.items()},
+        "bmi_categories": {code: label for label, code in BMI_CATEGORY_CODES.items()},
+        "nutrients": [
+            {"code": code, "name": name, "recommendations": list(recommendation_variants(spec))}
+            for code, name, _, spec in VITAMIN_REPORT
+        ],
+        "analysis_template": ANALYSIS_TEMPLATE,
+        "recommendations": GENERAL_RECOMMENDATIONS,
+    }
+    version = hashlib.sha256(dumps(catalog)).hexdigest()[:16]
+    return version, dumps(dict(catalog, version=version))
+
+
+# كتالوج النصوص الثابتة يجلبه العميل مرة واحدة، وإصداره بصمة محتواه
+CATALOG_VERSION, CATALOG_BODY = _build_catalog()
+CATALOG_ETAG = f'"{CATALOG_VERSION}"'
+
+# أجزاء JSON مرمّزة مسبقاً لكل مغذٍ ولكل (حالة، رقم توصية) ممكنين
+_FULL_FRAGMENTS = [
+    {
+        (status, variant): dumps({"name": name, "status": status, "recommendations": text})
+        for status in STATUS_CODES
+        for variant, text in enumerate(recommendation_variants(spec))
+    }
+    for _, name, _, spec in VITAMIN_REPORT
+]
+_COMPACT_FRAGMENTS = [
+    {
+        (status, variant): dumps(code) + b":" + dumps([STATUS_CODES[status], variant])
+        for status in STATUS_CODES
+        for variant in range(len(recommendation_variants(spec)))
+    }
+    for code, _, _, spec in VITAMIN_REPORT
+]
+_RECOMMENDATIONS_JSON = dumps(GENERAL_RECOMMENDATIONS)
+_COMPACT_PREFIX = b'{"status":"success","catalog_version":' + dumps(CATALOG_VERSION) + b',"bmi":'
+
+
+def full_body(result):
+    """الاستجابة الكاملة: النص الوحيد المرمّز لكل طلب هو التحليل العام"""
+    vitamins = b",".join(
+        fragments[tuple(item)] for fragments, item in zip(_FULL_FRAGMENTS, result["nutrients"])
+    )
+    return b"".join([
+        b'{"status":"success","analysis":', dumps(result["analysis"]),
+        b',"vitamin_analysis":[', vitamins,
+        b'],"recommendations":', _RECOMMENDATIONS_JSON, b"}",
+    ])
+
+
+def compact_body(result):
+    """الاستجابة المختصرة: رموز الحالات والقيم المحسوبة فقط، والنصوص في الكتالوج"""
+    nutrients = b",".join(
+        fragments[tuple(item)] for fragments, item in zip(_COMPACT_FRAGMENTS, result["nutrients"])
+    )
+    return b"".join([
+        _COMPACT_PREFIX, dumps(result["bmi"]),
+        b',"bmi_category":', dumps(BMI_CATEGORY_CODES[result["bmi_category"]]),
+        b',"nutrients":{', nutrients, b"}}",
+    ])
+
+
+def negotiate_encoding(accept_encoding):
+    """اختيار الضغط من ترويسة Accept-Encoding: brotli إن توفر ثم gzip"""
+    accepted = set()
+    for token in (accept_encoding or "").split(","):
+        name, _, params = token.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(name.strip().lower())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=4)
+    return gzip.compress(body, compresslevel=5, mtime=0)
+
+
+_catalog_encoded = {None: CATALOG_BODY}
+
+
+def etag_matches(if_none_match, etag):
+    """مقارنة If-None-Match الضعيفة: البادئة W/ تتجاهل، و* تطابق أي نسخة موجودة"""
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+def catalog_response(accept_encoding=None, max_age=86400):
+    """الكتالوج بصيغه المضغوطة المحفوظة بعد أول طلب، مع ETag ومدة تخزين طويلة"""
+    encoding = negotiate_encoding(accept_encoding)
+    body = _catalog_encoded.get(encoding)
+    if body is None:
+        body = _catalog_encoded[encoding] = compress(CATALOG_BODY, encoding)
+    headers = {
+        "ETag": CATALOG_ETAG,
+        "Cache-Control": f"public, max-age={max_age}",
+        "Vary": "Accept-Encoding",
+    }
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def json_response(body, accept_encoding=None, min_size=1024, headers=None):
+    """استجابة JSON من بايتات جاهزة، مضغوطة إذا قبلها العميل وكان حجمها يستحق"""
+    headers = dict(headers or {})
+    encoding = negotiate_encoding(accept_encoding) if len(body) >= min_size else None
+    if encoding is not None:
+        body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+    headers["Vary"] = "Accept-Encoding"
+    return Response(content=body, media_type="application/json", headers=headers)
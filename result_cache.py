@@ -0,0 +1,161 @@
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+def canonical_key(payload, namespace=""):
+    """بصمة المدخلات بعد توحيدها: ترتيب المفاتيح ثابت فلا يتغير المفتاح بتغير ترتيب الحقول"""
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(f"{namespace}\x00{encoded}".encode("utf-8")).hexdigest()
+
+
+class SqliteCacheBackend:
+    """مخزن مشترك في ملف SQLite تتشارك فيه عدة عمليات عاملة النتائج المحسوبة
+
+    استدعاءات sqlite3 متزامنة، فتنفذ في خيط واحد مخصص خارج حلقة الأحداث ويتسلسل فيه
+    استخدام الاتصال. الإنشاء والإغلاق متزامنان أيضاً ويستدعيان عبر asyncio.to_thread.
+    """
+
+    def __init__(self, path, namespace):
+        self.namespace = namespace
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="result-cache")
+        self._conn = sqlite3.connect(path, timeout=0.05, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS result_cache ("
+            "key TEXT PRIMARY KEY, namespace TEXT NOT NULL, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+        )
+        # حذف النتائج المحسوبة بإصدار سابق من القواعد أو المنتهية صلاحيتها
+        self._conn.execute(
+            "DELETE FROM result_cache WHERE namespace != ? OR expires_at < ?", (namespace, time.time())
+        )
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _get(self, key):
+        row = self._conn.execute(
+            "SELECT value, expires_at FROM result_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return row[0], row[1]
+
+    def _set(self, key, value, expires_at):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO result_cache (key, namespace, value, expires_at) VALUES (?, ?, ?, ?)",
+            (key, self.namespace, value, expires_at)
+        )
+
+    async def get(self, key):
+        return await self._run(self._get, key)
+
+    async def set(self, key, value, expires_at):
+        await self._run(self._set, key, value, expires_at)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self._conn.close()
+
+
+class ResultCache:
+    """ذاكرة مؤقتة للنتائج بالبصمة: إخلاء الأقدم استخداماً، مدة صلاحية، وحد أقصى للذاكرة
+
+    النتائج تعاد دون نسخ فلا يجوز تعديلها، ويقاس حجمها بطول ترميزها كـ JSON.
+    """
+
+    def __init__(self, namespace, max_entries=10000, max_bytes=64 * 1024 * 1024, ttl=3600.0,
+                 backend=None):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.backend = backend
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.backend_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.backend_errors = 0
+
+    def key(self, payload):
+        return canonical_key(payload, self.namespace)
+
+    async def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            result, _, expires_at = entry
+            if expires_at >= time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return result
+            self._remove(key)
+
+        if self.backend is not None:
+            try:
+                found = await self.backend.get(key)
+            except sqlite3.Error as e:
+                found = None
+                self.backend_errors += 1
+                logger.warning(f"Result cache backend error: {str(e)}")
+            if found is not None:
+                value, expires_at = found
+                result = json.loads(value)
+                self._store(key, result, len(value), time.monotonic() + (expires_at - time.time()))
+                self.backend_hits += 1
+                return result
+
+        self.misses += 1
+        return None
+
+    async def set(self, key, result):
+        value = json.dumps(result, ensure_ascii=False).encode("utf-8")
+        self._store(key, result, len(value), time.monotonic() + self.ttl)
+        if self.backend is not None:
+            try:
+                await self.backend.set(key, value, time.time() + self.ttl)
+            except sqlite3.Error as e:
+                self.backend_errors += 1
+                logger.warning(f"Result cache backend error: {str(e)}")
+
+    def _store(self, key, result, size, expires_at):
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (result, size, expires_at)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.backend_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "backend_hits": self.backend_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits + self.backend_hits) / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "backend_errors": self.backend_errors,
+        }
@@ -0,0 +1,366 @@
+import hashlib
+from collections import namedtuple
+
+# حالات النتيجة
+NORMAL = "طبيعي"
+DEFICIENT = "نقص"
+SEVERE = "نقص شديد"
+
+LOW_INTAKE = ("نادراً", "أحياناً")
+VEGETARIAN_DIETS = ("نباتي", "نباتي مع أسماك")
+
+
+def bmi_category(bmi):
+    """فئة مؤشر كتلة الجسم بنفس حدود /submit-symptoms/"""
+    return (
+        "نقص في الوزن" if bmi < 18.5
+        else "وزن طبيعي" if bmi < 25
+        else "زيادة في الوزن" if bmi < 30
+        else "سمنة"
+    )
+
+
+# عوامل الخطر الأساسية، كل عامل يُقيَّم مرة واحدة فقط لكل طلب
+def low_intake(field):
+    return ("in", field, LOW_INTAKE)
+
+
+def diet_is(value):
+    return ("eq", "diet_type", value)
+
+
+def symptom(needle):
+    return ("symptom", needle)
+
+
+def lacks_component(needle):
+    """لا يحتوي أي مكون من مكونات الوجبات على النص المحدد"""
+    return ("not", ("component_contains", needle))
+
+
+def lacks_components(*items):
+    """لا يوجد أي من المكونات المحددة في قائمة مكونات الوجبات"""
+    return ("not", ("has_component", items))
+
+
+# جدول القواعد: (المحلل، النوع) -> (عوامل الخطر، حد النقص، حد النقص الشديد)
+RISK_RULES = {
+    # analyze_nutrient_status: عامل واحد يكفي للنقص
+    ("nutrient", "vitamin_e"): ([low_intake("vegetables_fruits"), lacks_component("زيوت نباتية")], 1, None),
+    ("nutrient", "vitamin_k"): ([low_intake("vegetables_fruits"), lacks_component("خضروات طازجة")], 1, None),
+    ("nutrient", "vitamin_c"): ([low_intake("vegetables_fruits"), lacks_components("فواكه", "خضروات طازجة")], 1, None),
+    ("nutrient", "folate"): ([low_intake("vegetables_fruits"), lacks_component("خضروات")], 1, None),
+    ("nutrient", "potassium"): ([low_intake("vegetables_fruits"), symptom("ضعف العضلات")], 1, None),
+    ("nutrient", "manganese"): ([lacks_components("حبوب كاملة", "مكسرات"), low_intake("vegetables_fruits")], 1, None),
+    ("nutrient", "copper"): ([diet_is("نباتي"), lacks_component("مكسرات")], 1, None),
+    ("nutrient", "zinc"): ([symptom("بطء التئام الجروح"), low_intake("dairy_meat")], 1, None),
+    ("nutrient", "selenium"): ([diet_is("نباتي"), lacks_component("أسماك")], 1, None),
+    ("nutrient", "iodine"): ([low_intake("dairy_meat"), lacks_component("أسماك")], 1, None),
+
+    # analyze_b_vitamins_status
+    ("b_vitamin", "b1"): ([diet_is("نباتي"), lacks_components("حبوب كاملة", "بقوليات"), symptom("التعب والإرهاق")], 2, None),
+    ("b_vitamin", "b2"): ([low_intake("dairy_meat"), symptom("تشقق زوايا الفم")], 2, None),
+    ("b_vitamin", "b3"): ([diet_is("نباتي"), symptom("الصداع")], 2, None),
+    ("b_vitamin", "b6"): ([low_intake("vegetables_fruits"), symptom("تشنجات عضلية")], 2, None),
+
+    # analyze_mineral_status
+    ("mineral", "magnesium"): ([symptom("ضعف العضلات"), symptom("تشنجات عضلية"), low_intake("vegetables_fruits")], 2, None),
+    ("mineral", "zinc"): ([symptom("بطء التئام الجروح"), low_intake("dairy_meat"), symptom("تساقط الشعر")], 2, None),
+    ("mineral", "selenium"): ([diet_is("نباتي"), lacks_component("أسماك")], 2, None),
+    ("mineral", "copper"): ([symptom("فقر الدم"), symptom("ضعف العظام")], 2, None),
+
+    # المحللات الفردية ذات درجتي النقص
+    ("vitamin_d", None): ([
+        ("lt", "sun_exposure", 0.5),
+        low_intake("dairy_meat"),
+        ("eq", "sun_context", "محدود (داخل المباني معظم الوقت)"),
+        symptom("ضعف العضلات أو آلامها"),
+    ], 2, 3),
+    ("vitamin_a", None): ([
+        low_intake("vegetables_fruits"),
+        symptom("مشاكل في الرؤية"),
+        symptom("جفاف الجلد"),
+        lacks_components("خضروات طازجة", "فواكه"),
+    ], 2, 3),
+    ("b12", None): ([
+        ("in", "diet_type", VEGETARIAN_DIETS),
+        low_intake("dairy_meat"),
+        symptom("التعب والإرهاق"),
+        symptom("الدوخة"),
+    ], 2, 3),
+    ("iron", None): ([
+        diet_is("نباتي"),
+        symptom("شحوب الجلد"),
+        symptom("التعب والإرهاق"),
+        low_intake("dairy_meat"),
+    ], 2, 3),
+    ("calcium", None): ([
+        low_intake("dairy_meat"),
+        diet_is("نباتي"),
+        symptom("ضعف العضلات أو آلامها"),
+        lacks_component("منتجات ألبان"),
+    ], 2, 3),
+}
+
+B12_RECOMMENDATIONS = """
+        - تناول مكملات B12 بانتظام (1000 ميكروغرام يومياً)
+        - إضافة الأطعمة المدعمة بفيتامين B12
+        - متابعة مستويات B12 في الدم بشكل دوري
+        """
+IRON_RECOMMENDATIONS = """
+        - تناول اللحوم الحمراء 2-3 مرات أسبوعياً
+        - دمج مصادر فيتامين C مع الأطعمة الغنية بالحديد
+        - تجنب شرب الشاي والقهوة مع الوجبات
+        - استشارة الطبيب لتقييم الحاجة للمكملات
+        """
+CALCIUM_RECOMMENDATIONS = """
+        - زيادة تناول منتجات الألبان قليلة الدسم
+        - تناول الخضروات الورقية الداكنة
+        - إضافة السردين والسلمون مع العظام
+        - النظر في تناول مكملات الكالسيوم مع فيتامين D
+        """
+
+# التوصيات المشروطة: (نوع الشرط، الشرط، التوصية عند تحققه، التوصية البديلة)
+CONDITIONAL_RECOMMENDATIONS = {
+    "b12": ("fact", ("in", "diet_type", VEGETARIAN_DIETS), B12_RECOMMENDATIONS,
+            "الحفاظ على تناول اللحوم والأسماك والبيض بانتظام"),
+    "iron": ("deficient", ("iron", None), IRON_RECOMMENDATIONS,
+             "الحفاظ على النظام الغذائي المتوازن الحالي"),
+    "calcium": ("deficient", ("calcium", None), CALCIUM_RECOMMENDATIONS,
+                "الاستمرار في تناول المصادر الجيدة للكالسيوم في النظام الغذائي الحالي"),
+}
+
+# جدول التقرير بالترتيب المعروض للمستخدم: (الرمز، الاسم، القاعدة، التوصيات)
+VITAMIN_REPORT = [
+    ("vitamin_d", "فيتامين D (كالسيفيرول)", ("vitamin_d", None),
+     "التعرض للشمس 15-20 دقيقة يومياً، تناول الأسماك الدهنية، صفار البيض، زيت كبد السمك"),
+    ("vitamin_a", "فيتامين A (ريتينول)", ("vitamin_a", None),
+     "تناول الجزر، البطاطا الحلوة، السبانخ، المشمش، الكبد"),
+    ("vitamin_e", "فيتامين E (توكوفيرول)", ("nutrient", "vitamin_e"),
+     "تناول المكسرات، البذور، الأفوكادو، زيت الزيتون، السبانخ"),
+    ("vitamin_k", "فيتامين K", ("nutrient", "vitamin_k"),
+     "تناول الخضروات الورقية الخضراء، البروكلي، الملفوف"),
+    ("vitamin_c", "فيتامين C (حمض الأسكوربيك)", ("nutrient", "vitamin_c"),
+     "تناول الحمضيات، الفلفل، الطماطم، البروكلي، الفراولة"),
+    ("b1", "فيتامين B1 (ثيامين)", ("b_vitamin", "b1"),
+     "تناول الحبوب الكاملة، البقوليات، المكسرات، اللحوم"),
+    ("b2", "فيتامين B2 (ريبوفلافين)", ("b_vitamin", "b2"),
+     "تناول منتجات الألبان، البيض، اللحوم، الخضروات الورقية"),
+    ("b3", "فيتامين B3 (نياسين)", ("b_vitamin", "b3"),
+     "تناول اللحوم، الأسماك، البذور، الفول السوداني"),
+    ("b6", "فيتامين B6 (بيريدوكسين)", ("b_vitamin", "b6"),
+     "تناول الموز، البطاطا، الدجاج، الأسماك، الحمص"),
+    ("b12", "فيتامين B12 (كوبالامين)", ("b12", None), CONDITIONAL_RECOMMENDATIONS["b12"]),
+    ("folate", "حمض الفوليك", ("nutrient", "folate"),
+     "تناول الخضروات الورقية، البقوليات، الحبوب المدعمة"),
+    ("iron", "الحديد", ("iron", None), CONDITIONAL_RECOMMENDATIONS["iron"]),
+    ("calcium", "الكالسيوم", ("calcium", None), CONDITIONAL_RECOMMENDATIONS["calcium"]),
+    ("magnesium", "المغنيسيوم", ("mineral", "magnesium"),
+     "تناول المكسرات، البذور، البقوليات، الخضروات الورقية الداكنة"),
+    ("zinc", "الزنك", ("mineral", "zinc"),
+     "تناول المحار، اللحوم، البذور، المكسرات"),
+    ("selenium", "السيلينيوم", ("mineral", "selenium"),
+     "تناول المكسرات البرازيلية، الأسماك، البيض، الحبوب الكاملة"),
+    ("copper", "النحاس", ("mineral", "copper"),
+     "تناول الكبد، المحار، المكسرات، البذور"),
+    # محلل المعادن لا يعرّف عوامل خطر للمنغنيز والبوتاسيوم واليود، فنتيجتها طبيعي دائماً
+    ("manganese", "المنغنيز", ("mineral", "manganese"),
+     "تناول المكسرات، الحبوب الكاملة، البقوليات، الشاي"),
+    ("potassium", "البوتاسيوم", ("mineral", "potassium"),
+     "تناول الموز، البطاطا، الخضروات الورقية، الحمضيات"),
+    ("iodine", "اليود", ("mineral", "iodine"),
+     "استخدام الملح المدعم باليود، تناول الأعشاب البحرية، الأسماك"),
+]
+
+def recommendation_variants(spec):
+    """نصوص التوصية الممكنة لمغذٍ: نص ثابت واحد، أو (التوصية عند تحقق الشرط، البديلة)"""
+    if isinstance(spec, str):
+        return (spec,)
+    return spec[2], spec[3]
+
+
+CompiledRule = namedtuple("CompiledRule", ["positive", "negative", "deficient_at", "severe_at"])
+
+
+class RequestFacts(namedtuple("RequestFacts", ["data", "symptoms", "components", "component_set"])):
+    """مدخلات الطلب بعد تجهيزها مرة واحدة لتقييم جميع العوامل"""
+
+    @classmethod
+    def from_data(cls, data):
+        # العناصر غير النصية (أرقام أو قواميس من JSON) تقارن بنصها، فلا ترفع TypeError
+        components = [str(item) for item in data['meal_components']]
+        # الفاصل لا يظهر في النصوص، فالبحث في النص المدمج يكافئ البحث في كل مكون على حدة
+        return cls(data, data['symptoms'], "\x00".join(components), frozenset(components))
+
+
+def _fact_predicate(fact):
+    kind = fact[0]
+    if kind == "in":
+        _, field, values = fact
+        return lambda f: f.data[field] in values
+    if kind == "eq":
+        _, field, value = fact
+        return lambda f: f.data[field] == value
+    if kind == "lt":
+        _, field, value = fact
+        return lambda f: f.data[field] < value
+    if kind == "symptom":
+        needle = fact[1]
+        return lambda f: needle in f.symptoms
+    if kind == "component_contains":
+        needle = fact[1]
+        return lambda f: needle in f.components
+    if kind == "has_component":
+        items = fact[1]
+        return lambda f: not f.component_set.isdisjoint(items)
+    raise ValueError(f"unknown rule fact: {fact!r}")
+
+
+class RuleEngine:
+    """محرك قواعد مترجم: كل عامل خطر يصبح بتاً واحداً، وكل قاعدة قناعين للعوامل"""
+
+    def __init__(self, rules, recommendations=()):
+        self.fact_index = {}
+        self.predicates = []
+        self.rules = {}
+        for key, (factors, deficient_at, severe_at) in rules.items():
+            positive = negative = 0
+            for factor in factors:
+                if factor[0] == "not":
+                    negative |= self._bit(factor[1])
+                else:
+                    positive |= self._bit(factor)
+            if positive.bit_count() + negative.bit_count() != len(factors):
+                raise ValueError(f"duplicate risk factor in rule {key!r}")
+            self.rules[key] = CompiledRule(positive, negative, deficient_at, severe_at)
+        for condition in recommendations:
+            if condition[0] == "fact":
+                self._bit(condition[1])
+
+    def _bit(self, fact):
+        if fact not in self.fact_index:
+            self.fact_index[fact] = len(self.predicates)
+            self.predicates.append(_fact_predicate(fact))
+        return 1 << self.fact_index[fact]
+
+    def facts(self, data):
+        """تقييم جميع عوامل الخطر مرة واحدة وإرجاعها كقناع بتات"""
+        request = RequestFacts.from_data(data)
+        bits = 0
+        for index, predicate in enumerate(self.predicates):
+            if predicate(request):
+                bits |= 1 << index
+        return bits
+
+    def has_fact(self, bits, fact):
+        return bool(bits >> self.fact_index[fact] & 1)
+
+    def status(self, bits, key):
+        rule = self.rules.get(key)
+        if rule is None:
+            return NORMAL
+        score = (bits & rule.positive).bit_count() + (rule.negative & ~bits).bit_count()
+        if rule.severe_at is not None and score >= rule.severe_at:
+            return SEVERE
+        return DEFICIENT if score >= rule.deficient_at else NORMAL
+
+    def variant(self, bits, spec):
+        """رقم نص التوصية المختار من recommendation_variants: 0 للثابتة أو عند تحقق الشرط، و1 للبديلة"""
+        if isinstance(spec, str):
+            return 0
+        kind, condition, _, _ = spec
+        if kind == "fact":
+            matched = self.has_fact(bits, condition)
+        else:
+            matched = self.status(bits, condition) in (DEFICIENT, SEVERE)
+        return 0 if matched else 1
+
+    def recommendation(self, bits, spec):
+        return recommendation_variants(spec)[self.variant(bits, spec)]
+
+    def evaluate(self, data):
+        """تقييم جميع المغذيات في تمريرة واحدة: الرمز -> الحالة"""
+        bits = self.facts(data)
+        return {code: self.status(bits, key) for code, _, key, _ in VITAMIN_REPORT}
+
+    def nutrient_report(self, data):
+        """الحالة ورقم نص التوصية لكل مغذٍ بترتيب التقرير، دون بناء النصوص"""
+        bits = self.facts(data)
+        return [
+            (self.status(bits, key), self.variant(bits, recommendations))
+            for _, _, key, recommendations in VITAMIN_REPORT
+        ]
+
+    def vitamin_analysis(self, data):
+        """بناء قائمة تحليل الفيتامينات والمعادن كما تعرض في الاستجابة"""
+        bits = self.facts(data)
+        return [
+            {
+                "name": name,
+                "status": self.status(bits, key),
+                "recommendations": self.recommendation(bits, recommendations)
+            }
+            for _, name, key, recommendations in VITAMIN_REPORT
+        ]
+
+
+# يتم ترجمة القواعد مرة واحدة عند تحميل الوحدة
+rule_engine = RuleEngine(RISK_RULES, CONDITIONAL_RECOMMENDATIONS.values())
+
+# بصمة جداول القواعد والتوصيات: تتغير مع أي تعديل عليها فتبطل النتائج المخزنة مؤقتاً
+RULESET_VERSION = hashlib.sha256(
+    repr((NORMAL, DEFICIENT, SEVERE, RISK_RULES, CONDITIONAL_RECOMMENDATIONS, VITAMIN_REPORT)).encode("utf-8")
+).hexdigest()[:16]
+
+
+# واجهات المحللات السابقة مبنية على المحرك المترجم
+def analyze_nutrient_status(data, nutrient_type):
+    """تحليل حالة المغذيات"""
+    return rule_engine.status(rule_engine.facts(data), ("nutrient", nutrient_type))
+
+
+def analyze_vitamin_d_status(data):
+    """تحليل حالة فيتامين D"""
+    return rule_engine.status(rule_engine.facts(data), ("vitamin_d", None))
+
+
+def analyze_vitamin_a_status(data):
+    """تحليل حالة فيتامين A"""
+    return rule_engine.status(rule_engine.facts(data), ("vitamin_a", None))
+
+
+def analyze_b_vitamins_status(data, vitamin_type):
+    """تحليل حالة فيتامينات B"""
+    return rule_engine.status(rule_engine.facts(data), ("b_vitamin", vitamin_type))
+
+
+def analyze_b12_status(data):
+    """تحليل حالة فيتامين B12"""
+    return rule_engine.status(rule_engine.facts(data), ("b12", None))
+
+
+def analyze_iron_status(data):
+    """تحليل حالة الحديد"""
+    return rule_engine.status(rule_engine.facts(data), ("iron", None))
+
+
+def analyze_calcium_status(data):
+    """تحليل حالة الكالسيوم"""
+    return rule_engine.status(rule_engine.facts(data), ("calcium", None))
+
+
+def analyze_mineral_status(data, mineral_type):
+    """تحليل حالة المعادن"""
+    return rule_engine.status(rule_engine.facts(data), ("mineral", mineral_type))
+
+
+def get_b12_recommendations(data):
+    return rule_engine.recommendation(rule_engine.facts(data), CONDITIONAL_RECOMMENDATIONS["b12"])
+
+
+def get_iron_recommendations(data):
+    return rule_engine.recommendation(rule_engine.facts(data), CONDITIONAL_RECOMMENDATIONS["iron"])
+
+
+def get_calcium_recommendations(data):
+    return rule_engine.recommendation(rule_engine.facts(data), CONDITIONAL_RECOMMENDATIONS["calcium"])
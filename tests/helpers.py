@@ -0,0 +1,38 @@
+import asyncio
+import os
+import sqlite3
+
+import httpx
+
+TEST_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test.db")
+
+
+def load_rows():
+    """صفوف user_inputs في test.db مرتبة بالمعرف"""
+    with sqlite3.connect(TEST_DB) as conn:
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute("SELECT id, user_input, gemini_output FROM user_inputs ORDER BY id").fetchall()
+    return [dict(row) for row in rows]
+
+
+def chunked(rows, size):
+    return [rows[start:start + size] for start in range(0, len(rows), size)]
+
+
+def request(method, path, **kwargs):
+    """طلب إلى التطبيق دون تشغيل خادم"""
+    import main
+
+    async def send():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.request(method, path, **kwargs)
+    return asyncio.run(send())
+
+
+def get(path, **kwargs):
+    return request("GET", path, **kwargs)
+
+
+def post(path, **kwargs):
+    return request("POST", path, **kwargs)
@@ -0,0 +1,93 @@
+import asyncio
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from admission import AdmissionMiddleware, Rejected, RouteLimiter, parse_limits, request_timeout
+
+
+def test_queue_full_is_rejected_and_slots_pass_in_order():
+    async def scenario():
+        limiter = RouteLimiter(concurrency=1, queue_size=1)
+        await limiter.acquire()
+        waiting = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.queued == 1
+        with pytest.raises(Rejected) as rejected:
+            await limiter.acquire()
+        assert rejected.value.reason == "queue_full"
+        assert rejected.value.retry_after >= 1
+
+        # المكان ينتقل مباشرة إلى المنتظر دون أن يقل عدد المنفذين
+        limiter.release(0.5)
+        await waiting
+        assert limiter.stats() == {"active": 1, "queued": 0, "service_seconds": 0.5}
+        limiter.release()
+        assert limiter.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_deadline_rejects_before_queueing_and_timeout_after():
+    async def scenario():
+        limiter = RouteLimiter(concurrency=1, queue_size=10)
+        await limiter.acquire()
+        limiter.service_seconds = 2.0
+        # الانتظار المتوقع مع زمن التنفيذ يتجاوز المهلة فيرفض فوراً
+        with pytest.raises(Rejected) as rejected:
+            await limiter.acquire(timeout=1.0)
+        assert rejected.value.reason == "deadline"
+        assert limiter.queued == 0
+
+        # بلا تقدير لزمن التنفيذ يدخل الطابور وينتهي بانقضاء المهلة
+        limiter.service_seconds = None
+        with pytest.raises(Rejected) as rejected:
+            await limiter.acquire(timeout=0.01)
+        assert rejected.value.reason == "timeout"
+        assert limiter.queued == 0
+
+    asyncio.run(scenario())
+
+
+def test_parse_limits_and_request_timeout():
+    limits = parse_limits("/a/=2:8, /b/=1")
+    assert {route: (limiter.concurrency, limiter.queue_size) for route, limiter in limits.items()} == {
+        "/a/": (2, 8), "/b/": (1, 0),
+    }
+    assert request_timeout({"headers": [(b"x-request-timeout-ms", b"250")]}) == 0.25
+    assert request_timeout({"headers": [(b"x-request-timeout-ms", b"soon")]}, default=3) == 3
+    assert request_timeout({"headers": []}) is None
+
+
+def test_middleware_returns_503_with_retry_after():
+    async def scenario():
+        release = asyncio.Event()
+
+        async def slow(request):
+            await release.wait()
+            return PlainTextResponse("done")
+
+        async def fast(request):
+            return PlainTextResponse("ok")
+
+        routes = [Route("/slow", slow), Route("/fast", fast)]
+        app = AdmissionMiddleware(Starlette(routes=routes), routes, {"/slow": RouteLimiter(1, 0)})
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = asyncio.create_task(client.get("/slow"))
+            await asyncio.sleep(0.05)
+            shed = await client.get("/slow")
+            # المسارات غير المحدودة لا تنتظر خلف المسار المشغول
+            unlimited = await client.get("/fast")
+            release.set()
+            return await first, shed, unlimited
+
+    first, shed, unlimited = asyncio.run(scenario())
+    assert first.status_code == 200
+    assert shed.status_code == 503
+    assert shed.headers["retry-after"] == "1"
+    assert shed.json()["reason"] == "queue_full"
+    assert unlimited.text == "ok"
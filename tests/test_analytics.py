@@ -0,0 +1,59 @@
+from datetime import datetime
+
+import sqlalchemy
+
+from analytics import backfill_rollups
+from db import UserInput, analytics_rollups, create_sync_db_engine, run_migrations
+from nutrients import NUTRIENT_CODES
+
+# مقتطف من رد Gemini مخزن في test.db
+GEMINI_OUTPUT = """**حالة التغذية**
+
+* **نقص في الفيتامين ب 12:** للنباتيين خطر متزايد للإصابة بنقص فيتامين ب 12.
+* **نقص الحديد:** يمكن أن يؤدي اتباع نظام غذائي نباتي إلى نقص الحديد.
+* **نقص فيتامين د:** يتعرض النباتيون لخطر متزايد للإصابة بنقص فيتامين د.
+"""
+
+
+def bit(code):
+    return 1 << NUTRIENT_CODES.index(code)
+
+
+def test_backfill_keeps_known_masks(tmp_path):
+    url = f"sqlite:///{tmp_path / 'analytics.db'}"
+    engine = create_sync_db_engine(url)
+    created_at = datetime(2024, 1, 3)
+    rows = [
+        # رد Gemini دون قناع بعد
+        (GEMINI_OUTPUT, None),
+        # قناع التحليل المحلي يذكر الزنك أيضاً، ولا يفقده بالاستخراج من النص
+        (GEMINI_OUTPUT, bit("zinc")),
+        # نص بلا حالة لأي عنصر لا يمحو القناع المعروف
+        ("**التوصيات:** تناول الأطعمة الغنية بالحديد.", bit("calcium")),
+    ]
+    with engine.begin() as conn:
+        run_migrations(conn)
+        conn.execute(UserInput.__table__.insert(), [
+            {"gemini_output": text, "deficiency_mask": mask, "created_at": created_at, "diet_type": "نباتي"}
+            for text, mask in rows
+        ])
+    engine.dispose()
+
+    result = backfill_rollups("job", url, chunk_size=2)
+    assert result["masks_updated"] == 2
+
+    gemini = bit("vitamin_d") | bit("b12") | bit("iron")
+    engine = create_sync_db_engine(url)
+    with engine.connect() as conn:
+        masks = conn.execute(
+            sqlalchemy.select([UserInput.__table__.c.deficiency_mask]).order_by(UserInput.__table__.c.id)
+        ).scalars().all()
+        rollup = conn.execute(sqlalchemy.select([analytics_rollups])).mappings().one()
+    engine.dispose()
+
+    assert masks == [gemini, gemini | bit("zinc"), bit("calcium")]
+    assert rollup["submissions"] == 3
+    assert rollup["analyzed"] == 3
+    assert rollup["iron_deficient"] == 2
+    assert rollup["zinc_deficient"] == 1
+    assert rollup["calcium_deficient"] == 1
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from batch_scoring import CHECKPOINT_SUFFIX, ScoringError, score_file
+from model_registry import save_bundle
+from tests.helpers import chunked, load_rows
+from training import ModelTraining, text_batches
+
+
+@pytest.fixture(scope="module")
+def scoring_files(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("scoring")
+    rows = load_rows()
+    trainer = ModelTraining()
+    trainer.train_streaming(lambda vectorizer: text_batches(chunked(rows, 10), vectorizer))
+    save_bundle(str(directory), "20240101_000000", trainer.model, trainer.vectorizer)
+
+    input_path = directory / "questionnaires.jsonl"
+    input_path.write_text(
+        "".join(json.dumps({"id": row["id"], "user_input": row["user_input"]}, ensure_ascii=False) + "\n"
+                for row in rows),
+        encoding="utf-8",
+    )
+    return directory, str(input_path), len(rows)
+
+
+def score(directory, input_path, output_path, **kwargs):
+    return score_file(input_path, str(output_path), model_dir=str(directory), chunk_size=5, **kwargs)
+
+
+def test_resume_truncates_unrecorded_lines_and_continues(scoring_files, tmp_path):
+    directory, input_path, num_rows = scoring_files
+    reference = tmp_path / "reference.jsonl"
+    summary = score(directory, input_path, reference, workers=1)
+    assert summary["rows"] == num_rows
+    expected = reference.read_bytes()
+
+    # انقطاع بعد تسجيل دفعتين، مع سطر نصف مكتوب من الدفعة الثالثة
+    output = tmp_path / "interrupted.jsonl"
+    lines = expected.splitlines(keepends=True)
+    recorded = b"".join(lines[:10])
+    output.write_bytes(recorded + lines[10][:7])
+    checkpoint = json.loads((tmp_path / f"reference.jsonl{CHECKPOINT_SUFFIX}").read_text())
+    checkpoint.update(chunks=2, rows=10, output_bytes=len(recorded))
+    (tmp_path / f"interrupted.jsonl{CHECKPOINT_SUFFIX}").write_text(json.dumps(checkpoint))
+
+    summary = score(directory, input_path, output, workers=1)
+    assert summary["resumed_from"] == 10
+    assert summary["rows"] == num_rows
+    assert output.read_bytes() == expected
+
+
+def test_pooled_scoring_matches_serial(scoring_files, tmp_path):
+    directory, input_path, _ = scoring_files
+    serial, pooled = tmp_path / "serial.jsonl", tmp_path / "pooled.jsonl"
+    score(directory, input_path, serial, workers=1)
+    assert score(directory, input_path, pooled, workers=2)["workers"] == 2
+    assert pooled.read_bytes() == serial.read_bytes()
+
+
+def test_checkpoint_from_another_run_is_refused(scoring_files, tmp_path):
+    directory, input_path, num_rows = scoring_files
+    output = tmp_path / "predictions.jsonl"
+    score(directory, input_path, output, workers=1)
+    with pytest.raises(ScoringError, match="--restart"):
+        score_file(input_path, str(output), model_dir=str(directory), chunk_size=7, workers=1)
+    summary = score_file(input_path, str(output), model_dir=str(directory), chunk_size=7, workers=1, restart=True)
+    assert summary["resumed_from"] == 0
+    assert len(output.read_text(encoding="utf-8").splitlines()) == num_rows
@@ -0,0 +1,42 @@
+import pandas as pd
+import pytest
+
+import bulk_analysis
+from tests.helpers import post
+from warmup import SAMPLE_SUBMISSION
+
+
+def upload_csv(frame):
+    return post("/submit-symptoms/bulk/upload/",
+                files={"file": ("records.csv", frame.to_csv(index=False).encode("utf-8"), "text/csv")})
+
+
+def sample_frame(**overrides):
+    record = {**SAMPLE_SUBMISSION, "meal_components": '["بقوليات", "خضروات"]', **overrides}
+    return pd.DataFrame([{column: record[column] for column in bulk_analysis.REQUIRED_COLUMNS}])
+
+
+@pytest.mark.parametrize("components", ['["بقوليات", "خضروات"', '["بقوليات"] خضروات'])
+def test_invalid_components_json_is_rejected(components):
+    with pytest.raises(bulk_analysis.BulkInputError):
+        bulk_analysis.analyze_frame(sample_frame(meal_components=components))
+    assert upload_csv(sample_frame(meal_components=components)).status_code == 400
+
+
+def test_non_string_components_are_coerced():
+    frame = sample_frame()
+    frame["meal_components"] = [[1, "بقوليات", None]]
+    assert len(bulk_analysis.analyze_frame(frame)) == 1
+
+
+def test_zero_height_bmi_is_null_in_columns_output():
+    response = upload_csv(sample_frame(height=0))
+    assert response.status_code == 200
+    assert response.json()["columns"]["bmi"] == [None]
+    assert response.json()["columns"]["bmi_category"] == [None]
+
+
+def test_missing_weight_has_no_bmi_category():
+    frame = pd.concat([sample_frame(weight=None), sample_frame(weight=120.0, height=170.0)], ignore_index=True)
+    result = bulk_analysis.analyze_frame(frame)
+    assert result["bmi_category"].tolist() == [None, bulk_analysis.BMI_CATEGORIES[3]]
@@ -0,0 +1,77 @@
+import asyncio
+import shutil
+
+import sqlalchemy
+
+from db import (
+    MIGRATIONS, GeminiResponseCache, UserInput, async_url, build_user_prompt, create_db_engine,
+    create_sync_db_engine, init_schema, run_migrations, schema_migrations, structured_fields, sync_url,
+)
+from tests.helpers import TEST_DB
+from warmup import SAMPLE_SUBMISSION
+
+
+def test_urls_map_to_async_and_sync_drivers():
+    assert async_url("sqlite:///./test.db").drivername == "sqlite+aiosqlite"
+    assert async_url("postgresql://user@host/app").drivername == "postgresql+asyncpg"
+    assert async_url("postgres://user@host/app").drivername == "postgresql+asyncpg"
+    assert sync_url("postgres://user@host/app").drivername == "postgresql"
+    assert sync_url("postgresql+asyncpg://user@host/app").drivername == "postgresql"
+    assert sync_url("sqlite+aiosqlite:///./test.db").drivername == "sqlite"
+
+
+def test_pooled_engine_applies_pragmas_and_shares_schema(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'app.db'}")
+
+    async def scenario():
+        try:
+            await init_schema(engine)
+            async with engine.connect() as conn:
+                journal_mode = await conn.scalar(sqlalchemy.text("PRAGMA journal_mode"))
+                busy_timeout = await conn.scalar(sqlalchemy.text("PRAGMA busy_timeout"))
+
+            cache = GeminiResponseCache(engine)
+            assert await cache.get("key") is None
+            await cache.set("key", "first")
+            # الإدراج المتزامن للمفتاح نفسه لا يرفع خطأ ويبقي الرد الأول
+            await cache.set("key", "second")
+            return journal_mode, busy_timeout, await cache.get("key")
+        finally:
+            await engine.dispose()
+
+    journal_mode, busy_timeout, response = asyncio.run(scenario())
+    assert journal_mode == "wal"
+    assert busy_timeout > 0
+    assert response == "first"
+
+
+def test_structured_fields_from_stored_prompt():
+    fields = structured_fields(build_user_prompt(SAMPLE_SUBMISSION))
+    assert fields["age_band"] == "30-44"
+    assert fields["gender"] == SAMPLE_SUBMISSION["gender"]
+    assert fields["diet_type"] == SAMPLE_SUBMISSION["diet_type"]
+    assert fields["bmi_category"] is not None
+    assert len(fields["content_hash"]) == 64
+    assert structured_fields(None)["age_band"] is None
+
+
+def test_migration_upgrades_original_schema(tmp_path):
+    # test.db بالمخطط الأصلي: النصوص الخام فقط مع فهارسها
+    path = tmp_path / "legacy.db"
+    shutil.copy(TEST_DB, path)
+    engine = create_sync_db_engine(f"sqlite:///{path}")
+    table = UserInput.__table__
+    try:
+        for _ in range(2):
+            with engine.begin() as conn:
+                run_migrations(conn)
+        with engine.connect() as conn:
+            indexes = {index["name"] for index in sqlalchemy.inspect(conn).get_indexes(table.name)}
+            rows = conn.execute(sqlalchemy.select([table.c.user_input, table.c.content_hash])).all()
+            versions = conn.execute(sqlalchemy.select([schema_migrations.c.version])).scalars().all()
+    finally:
+        engine.dispose()
+
+    assert indexes == {index.name for index in table.indexes}
+    assert rows and all(content_hash == structured_fields(text)["content_hash"] for text, content_hash in rows)
+    assert sorted(versions) == [version for version, _, _ in MIGRATIONS]
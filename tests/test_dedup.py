@@ -0,0 +1,63 @@
+import itertools
+import sqlite3
+
+import numpy as np
+
+from db import build_user_prompt
+from dedup import dedup_corpus, minhash_signatures, questionnaire_features, text_hash
+from nutrients import parse_nutrient_labels
+from tests.helpers import TEST_DB
+from warmup import SAMPLE_SUBMISSION
+
+
+def jaccard(a, b):
+    a, b = set(a), set(b)
+    return len(a & b) / len(a | b)
+
+
+def corpus(texts):
+    ids = np.arange(len(texts), dtype=np.int64)
+    hashes = np.array([text_hash(text) for text in texts], dtype=np.uint64)
+    return ids, hashes, minhash_signatures([questionnaire_features(text) for text in texts])
+
+
+def test_features_ignore_template_text():
+    features = questionnaire_features(build_user_prompt(SAMPLE_SUBMISSION))
+    assert "age=34" in features
+    assert "weight=62.0" in features
+    assert "symptoms=تساقط الشعر" in features
+    assert not any("قم بتحليل" in feature for feature in features)
+
+    # نفس الإجابات في قالب آخر
+    other_template = "\n".join(
+        f"   - {line.strip()}" for line in build_user_prompt(SAMPLE_SUBMISSION).splitlines()[2:]
+    )
+    assert jaccard(features, questionnaire_features("يرجى تحليل الحالة:\n" + other_template)) == 1.0
+
+
+def test_exact_duplicates_only_by_default():
+    text = build_user_prompt(SAMPLE_SUBMISSION)
+    edited = build_user_prompt(dict(SAMPLE_SUBMISSION, symptoms="شحوب الجلد، تساقط الشعر، التعب والإرهاق"))
+    dropped, report = dedup_corpus(*corpus([text, edited, text]))
+    assert dropped.tolist() == [2]
+    assert report["near_duplicates"] == 0
+
+    dropped, report = dedup_corpus(*corpus([text, edited, text]), threshold=0.9)
+    assert dropped.tolist() == [1, 2]
+    assert report["near_duplicates"] == 1
+
+
+def test_distinct_questionnaires_in_test_db_are_kept():
+    with sqlite3.connect(TEST_DB) as conn:
+        rows = conn.execute("SELECT user_input, gemini_output FROM user_inputs ORDER BY id").fetchall()
+    texts = [text for text, output in rows if parse_nutrient_labels(output) is not None]
+    # بعض الاستبيانات أرسلت مرتين بالنص نفسه
+    distinct = list(dict.fromkeys(texts))
+    features = [questionnaire_features(text) for text in distinct]
+    assert max(jaccard(a, b) for a, b in itertools.combinations(features, 2)) < 0.9
+
+    # الصف 19 يشابه الصف 12 بنسبة 0.86 بخصائص قليلة، فيقع تقديره قرب 0.9
+    dropped, report = dedup_corpus(*corpus(texts), threshold=0.95)
+    assert report["exact_duplicates"] == len(texts) - len(distinct)
+    assert report["near_duplicates"] == 0
+    assert report["kept_rows"] == len(distinct)
@@ -0,0 +1,78 @@
+import os
+import threading
+
+from feature_store import MANIFEST_FILE, FeatureStore
+from nutrients import parse_nutrient_labels
+from tests.helpers import chunked, load_rows
+from training import ModelTraining
+
+
+def fetcher(rows, chunk_size):
+    def fetch(after_id):
+        return chunked([row for row in rows if row["id"] > after_id], chunk_size)
+    return fetch
+
+
+def test_purge_removes_only_marked_stores(tmp_path):
+    unrelated = tmp_path / ("x" * 16)
+    unrelated.mkdir()
+    (unrelated / "keep.txt").write_text("data")
+    stale = tmp_path / ("0" * 16)
+    stale.mkdir()
+    (stale / MANIFEST_FILE).write_text("{}")
+
+    store = FeatureStore(str(tmp_path))
+    assert os.path.isfile(os.path.join(store.path, MANIFEST_FILE))
+    assert (unrelated / "keep.txt").exists()
+    assert not stale.exists()
+
+
+def test_sync_waits_for_readers(tmp_path):
+    rows = load_rows()
+    reader = FeatureStore(str(tmp_path), chunk_size=10)
+    reader.sync(fetcher(rows[:25], 10))
+    writer = FeatureStore(str(tmp_path), chunk_size=10)
+
+    shards = reader.shards()
+    first_ids = next(shards)[0]
+    synced = threading.Thread(target=writer.sync, args=(fetcher(rows, 10),))
+    synced.start()
+    synced.join(0.3)
+    # الجزء الأخير الناقص لا يعاد بناؤه أثناء القراءة
+    assert synced.is_alive()
+    read = [first_ids] + [ids for ids, _, _, _ in shards]
+    synced.join(5)
+    assert not synced.is_alive()
+
+    assert sum(len(ids) for ids in read) == 25
+    assert sum(len(ids) for ids, _, _, _ in reader.shards()) == len(rows)
+
+
+def test_hashed_batches_skip_unlabelled_shards(tmp_path):
+    rows = load_rows()
+    labelled = [row for row in rows if parse_nutrient_labels(row["gemini_output"]) is not None]
+    # آخر صفوف test.db بلا أهداف، فتقع في أجزاء كاملة بلا صفوف للتدريب
+    assert parse_nutrient_labels(rows[-1]["gemini_output"]) is None
+    store = FeatureStore(str(tmp_path), chunk_size=3)
+    store.sync(fetcher(rows, 3))
+
+    trainer = ModelTraining()
+    trainer.train_streaming(store.hashed_batches)
+    assert trainer.training_history[-1]["num_samples"] == len(labelled)
+    assert trainer.last_seen_id == rows[-1]["id"]
+
+
+def test_incremental_with_only_unlabelled_new_rows(tmp_path):
+    rows = load_rows()
+    old_rows = rows[:-1]
+    store = FeatureStore(str(tmp_path), chunk_size=10)
+    store.sync(fetcher(old_rows, 10))
+    first = ModelTraining()
+    first.train_streaming(store.hashed_batches)
+
+    store.sync(fetcher(rows, 10))
+    trainer = ModelTraining()
+    trainer.train_incremental(first.model, first.vectorizer,
+                              lambda vectorizer: store.hashed_batches(vectorizer, after_id=old_rows[-1]["id"]))
+    assert trainer.training_history[-1]["num_samples"] == 0
+    assert trainer.last_seen_id == rows[-1]["id"]
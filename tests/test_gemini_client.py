@@ -0,0 +1,128 @@
+import asyncio
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from gemini_client import BackgroundTasks, GeminiClient
+
+
+class MemoryCache:
+    def __init__(self, fail_writes=False):
+        self.values = {}
+        self.fail_writes = fail_writes
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def set(self, key, response):
+        if self.fail_writes:
+            raise RuntimeError("cache unavailable")
+        self.values[key] = response
+
+
+class StubGemini:
+    """خادم محلي بصيغة Gemini: يرد بالحالات المحددة بالترتيب ثم 200 دائماً"""
+
+    def __init__(self, statuses=(), delay=0.0):
+        self.statuses = list(statuses)
+        self.delay = delay
+        self.requests = []
+
+    async def handle(self, request):
+        payload = await request.json()
+        prompt = payload["contents"][0]["parts"][0]["text"]
+        self.requests.append(prompt)
+        await asyncio.sleep(self.delay)
+        if self.statuses:
+            status = self.statuses.pop(0)
+            return web.json_response({"error": "busy"}, status=status, headers={"Retry-After": "0"})
+        return web.json_response({"candidates": [{"content": {"parts": [{"text": f"رد: {prompt}"}]}}]})
+
+
+def run_with_client(stub, test, **options):
+    async def main():
+        app = web.Application()
+        app.router.add_post("/generate", stub.handle)
+        server = TestServer(app)
+        await server.start_server()
+        client = GeminiClient("key", api_url=str(server.make_url("/generate")),
+                              backoff_base=0.01, backoff_max=0.02, **options)
+        await client.start()
+        try:
+            return await test(client)
+        finally:
+            await client.close()
+            await server.close()
+
+    return asyncio.run(main())
+
+
+def test_retries_after_429():
+    stub = StubGemini(statuses=[429, 503])
+
+    async def test(client):
+        assert await client.generate("سؤال") == "رد: سؤال"
+        assert client.calls == 3
+
+    run_with_client(stub, test)
+    assert len(stub.requests) == 3
+
+
+def test_concurrent_identical_prompts_are_coalesced():
+    stub = StubGemini(delay=0.1)
+
+    async def test(client):
+        results = await asyncio.gather(*(client.generate("سؤال") for _ in range(5)), client.generate("آخر"))
+        assert results == ["رد: سؤال"] * 5 + ["رد: آخر"]
+        assert client.coalesced == 4
+
+    run_with_client(stub, test)
+    assert sorted(stub.requests) == sorted(["سؤال", "آخر"])
+
+
+def test_cache_hit_skips_the_api():
+    stub = StubGemini()
+    cache = MemoryCache()
+
+    async def test(client):
+        assert await client.generate("سؤال") == "رد: سؤال"
+        assert await client.generate("سؤال") == "رد: سؤال"
+        assert client.stats()["cache_hits"] == 1
+
+    run_with_client(stub, test, cache=cache)
+    assert len(stub.requests) == 1
+    assert list(cache.values.values()) == ["رد: سؤال"]
+
+
+def test_cache_write_failure_still_returns_the_response():
+    stub = StubGemini()
+
+    async def test(client):
+        assert await client.generate("سؤال") == "رد: سؤال"
+
+    run_with_client(stub, test, cache=MemoryCache(fail_writes=True))
+    assert len(stub.requests) == 1
+
+
+def test_background_tasks_are_bounded_and_abandoned_after_drain_timeout():
+    saved = []
+
+    async def persist(row):
+        try:
+            await asyncio.sleep(row["delay"])
+        except asyncio.CancelledError:
+            saved.append(("cancelled", row["id"]))
+            raise
+        saved.append(("done", row["id"]))
+
+    async def main():
+        tasks = BackgroundTasks(limit=2)
+        assert tasks.spawn(persist, {"id": 1, "delay": 0})
+        assert tasks.spawn(persist, {"id": 2, "delay": 10})
+        assert not tasks.spawn(persist, {"id": 3, "delay": 0})
+        assert await tasks.drain(0.05) == 1
+        return tasks.stats()
+
+    stats = asyncio.run(main())
+    assert stats == {"pending": 0, "started": 2, "dropped": 1, "abandoned": 1}
+    assert sorted(saved) == [("cancelled", 2), ("done", 1)]
@@ -0,0 +1,55 @@
+from starlette.routing import Route
+
+from metrics import Callback, Counter, Histogram, RouteTemplates, render
+from tests.helpers import get
+
+
+def samples(text, name):
+    return [line for line in text.splitlines() if line.startswith(name)]
+
+
+def test_counter_and_histogram_render_prometheus_text():
+    counter = Counter("test_events", "Events by kind", ["kind"])
+    counter.labels('quote"d').inc()
+    counter.labels('quote"d').inc(2)
+    histogram = Histogram("test_latency_seconds", "Latency", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value)
+
+    text = render()
+    assert "# TYPE test_events counter" in text
+    assert samples(text, "test_events_total") == ['test_events_total{kind="quote\\"d"} 3.0']
+    assert samples(text, "test_latency_seconds_bucket") == [
+        'test_latency_seconds_bucket{le="0.1"} 1',
+        'test_latency_seconds_bucket{le="1.0"} 2',
+        'test_latency_seconds_bucket{le="+Inf"} 3',
+    ]
+    assert samples(text, "test_latency_seconds_count") == ["test_latency_seconds_count 3"]
+
+
+def test_callback_is_read_at_render_time():
+    state = {"depth": None}
+    Callback("test_queue_depth", "Queued items by queue", lambda: state["depth"], labelnames=["queue"])
+    # None يعني أن المكون غير مفعل فلا يظهر المقياس
+    assert "test_queue_depth" not in render()
+    state["depth"] = {"writes": 4}
+    assert samples(render(), "test_queue_depth") == ['test_queue_depth{queue="writes"} 4']
+
+
+def test_route_templates_use_path_parameters():
+    routes = [Route("/jobs/{job_id}", lambda request: None), Route("/health", lambda request: None)]
+    template = RouteTemplates(routes)
+    assert template({"type": "http", "path": "/jobs/abc", "method": "GET"}) == "/jobs/{job_id}"
+    assert template({"type": "http", "path": "/health", "method": "GET"}) == "/health"
+    assert template({"type": "http", "path": "/missing", "method": "GET"}) == "unmatched"
+
+
+def test_metrics_endpoint_labels_requests_by_template():
+    get("/train-model/jobs/unknown-job")
+    response = get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert any(
+        'route="/train-model/jobs/{job_id}"' in line and 'method="GET"' in line
+        for line in samples(response.text, "http_requests_total")
+    )
@@ -0,0 +1,123 @@
+import asyncio
+import os
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import LogisticRegression
+
+from model_registry import (
+    BUNDLE_ARTIFACTS, BUNDLE_MANIFEST, ArtifactError, ModelRegistry, artifact_filenames, bundle_dirname,
+    load_artifacts, save_bundle,
+)
+
+
+def corrupt(model_dir, version):
+    path = os.path.join(model_dir, bundle_dirname(version), BUNDLE_ARTIFACTS)
+    with open(path, "r+b") as f:
+        f.seek(-1, os.SEEK_END)
+        last = f.read(1)
+        f.seek(-1, os.SEEK_END)
+        f.write(bytes([last[0] ^ 0xFF]))
+
+
+def test_refresh_keeps_serving_when_newest_bundle_is_corrupt(tmp_path):
+    model_dir = str(tmp_path)
+    save_bundle(model_dir, "20240101_000000", {"weights": [1.0]}, {"vocabulary": ["a"]})
+    registry = ModelRegistry(model_dir, refresh_interval=0)
+
+    async def scenario():
+        assert (await registry.get()).version == "20240101_000000"
+
+        save_bundle(model_dir, "20240102_000000", {"weights": [2.0]}, {"vocabulary": ["b"]})
+        corrupt(model_dir, "20240102_000000")
+        # الإصدار التالف يتجاهل في كل فحص لاحق ويستمر الإصدار السابق
+        for _ in range(2):
+            assert (await registry.get()).version == "20240101_000000"
+        assert registry._rejected == {"20240102_000000"}
+
+        save_bundle(model_dir, "20240103_000000", {"weights": [3.0]}, {"vocabulary": ["c"]})
+        assert (await registry.refresh(force=True)).version == "20240103_000000"
+
+    asyncio.run(scenario())
+
+
+def test_refresh_without_active_model_raises_on_corrupt_bundle(tmp_path):
+    model_dir = str(tmp_path)
+    save_bundle(model_dir, "20240101_000000", {"weights": [1.0]}, {"vocabulary": ["a"]})
+    corrupt(model_dir, "20240101_000000")
+    registry = ModelRegistry(model_dir)
+
+    with pytest.raises(ArtifactError):
+        asyncio.run(registry.get())
+
+
+def trained_pair():
+    vectorizer = HashingVectorizer(n_features=2 ** 8)
+    texts = ["تعب وإرهاق", "تساقط الشعر", "آلام العظام", "شحوب الجلد"]
+    model = LogisticRegression().fit(vectorizer.transform(texts), [0, 1, 0, 1])
+    return model, vectorizer, texts
+
+
+def test_bundle_round_trip_is_memory_mapped(tmp_path):
+    model_dir = str(tmp_path)
+    model, vectorizer, texts = trained_pair()
+    manifest = save_bundle(model_dir, "20240101_000000", model, vectorizer, {"num_samples": 4})
+
+    serving = load_artifacts(model_dir, "20240101_000000", mmap_mode="r")
+    assert serving.manifest == manifest
+    assert serving.manifest["metadata"] == {"num_samples": 4}
+    assert isinstance(serving.model.coef_, np.memmap)
+    np.testing.assert_array_equal(
+        serving.model.predict_proba(serving.vectorizer.transform(texts)),
+        model.predict_proba(vectorizer.transform(texts)),
+    )
+    # لا يبقى مجلد مؤقت بعد الكتابة الذرية
+    assert os.listdir(model_dir) == [bundle_dirname("20240101_000000")]
+
+
+def test_corrupt_bundles_raise_artifact_error(tmp_path):
+    model_dir = str(tmp_path)
+    model, vectorizer, _ = trained_pair()
+    save_bundle(model_dir, "checksum", model, vectorizer)
+    corrupt(model_dir, "checksum")
+    # تغيير المحتوى بالحجم نفسه لا يكتشف إلا بالمجموع
+    with pytest.raises(ArtifactError, match="checksum"):
+        load_artifacts(model_dir, "checksum")
+
+    save_bundle(model_dir, "truncated", model, vectorizer)
+    with open(os.path.join(model_dir, bundle_dirname("truncated"), BUNDLE_ARTIFACTS), "r+b") as f:
+        f.truncate(10)
+    with pytest.raises(ArtifactError, match="size"):
+        load_artifacts(model_dir, "truncated", verify=False)
+
+    save_bundle(model_dir, "renamed", model, vectorizer)
+    os.rename(os.path.join(model_dir, bundle_dirname("renamed")), os.path.join(model_dir, bundle_dirname("other")))
+    with pytest.raises(ArtifactError, match="mismatched manifest"):
+        load_artifacts(model_dir, "other")
+
+    save_bundle(model_dir, "broken", model, vectorizer)
+    with open(os.path.join(model_dir, bundle_dirname("broken"), BUNDLE_MANIFEST), "w") as f:
+        f.write("{")
+    with pytest.raises(ArtifactError, match="cannot read manifest"):
+        load_artifacts(model_dir, "broken")
+
+
+def test_legacy_pairs_are_listed_and_loaded(tmp_path):
+    model_dir = str(tmp_path)
+    model, vectorizer, _ = trained_pair()
+    model_file, vectorizer_file = artifact_filenames("20230101_000000")
+    joblib.dump(model, os.path.join(model_dir, model_file))
+    joblib.dump(vectorizer, os.path.join(model_dir, vectorizer_file))
+    save_bundle(model_dir, "20240101_000000", model, vectorizer)
+    # حزمة لم تكتمل كتابتها ونموذج بلا محول لا يعدان إصدارات
+    os.mkdir(os.path.join(model_dir, bundle_dirname("20250101_000000")))
+    joblib.dump(model, os.path.join(model_dir, artifact_filenames("20220101_000000")[0]))
+
+    registry = ModelRegistry(model_dir)
+    assert registry.list_versions() == ["20230101_000000", "20240101_000000"]
+    legacy = load_artifacts(model_dir, "20230101_000000")
+    assert legacy.manifest is None
+    assert legacy.model_file == model_file
+    assert registry.info() == {"version": None}
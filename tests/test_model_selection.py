@@ -0,0 +1,55 @@
+from feature_store import FeatureStore, alphabetical_ranks
+from model_selection import cross_validate_grid, grid_candidates
+from nutrients import NUTRIENT_CODES
+from tests.helpers import chunked, load_rows
+from training import ModelTraining
+from training_jobs import append_training_history, read_training_history
+
+GRID = {"max_features": [50, None], "binary": [False, True], "alpha": [0.3, 1.0]}
+
+
+def store_counts(tmp_path):
+    rows = load_rows()
+    store = FeatureStore(str(tmp_path), chunk_size=10)
+    store.sync(lambda after_id: chunked([row for row in rows if row["id"] > after_id], 10))
+    _, counts, labels, _ = store.load()
+    return counts, labels, store.tokens
+
+
+def without_timings(candidates):
+    return [{name: value for name, value in candidate.items() if name != "fit_seconds"} for candidate in candidates]
+
+
+def test_serial_and_pooled_search_agree(tmp_path):
+    counts, labels, tokens = store_counts(tmp_path)
+    ranks = alphabetical_ranks(tokens)
+    serial, serial_workers = cross_validate_grid(counts, labels, ranks, GRID, folds=3, workers=1)
+    pooled, pooled_workers = cross_validate_grid(counts, labels, ranks, GRID, folds=3, workers=2)
+
+    assert (serial_workers, pooled_workers) == (1, 2)
+    assert len(serial) == len(grid_candidates(GRID)) == 8
+    assert without_timings(serial) == without_timings(pooled)
+    scores = [candidate["mean_macro_f1"] for candidate in serial]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_search_refits_best_candidate_on_all_rows(tmp_path):
+    counts, labels, tokens = store_counts(tmp_path)
+    trainer = ModelTraining()
+    accuracy, report = trainer.train_search(counts, labels, tokens, folds=3, workers=1, grid=GRID)
+
+    best = report["best"]
+    assert report["candidates"][0] == best
+    assert accuracy == best["mean_label_accuracy"]
+    assert trainer.training_history[-1]["num_samples"] == counts.shape[0]
+    assert trainer.vectorizer.binary == best["binary"]
+    predictions = trainer.model.predict(trainer.vectorizer.transform(["تعب وإرهاق وتساقط الشعر"]))
+    assert predictions.shape == (1, len(NUTRIENT_CODES))
+
+
+def test_training_history_is_newest_first(tmp_path):
+    for index in range(3):
+        append_training_history(str(tmp_path), {"job_id": str(index), "mode": "search"})
+    history = read_training_history(str(tmp_path), limit=2)
+    assert [record["job_id"] for record in history] == ["2", "1"]
+    assert all("finished_at" in record for record in history)
@@ -0,0 +1,77 @@
+from nutrients import NUTRIENT_CODES, deficiency_mask, parse_nutrient_labels, render_nutrient_section
+from rules import DEFICIENT, NORMAL, SEVERE
+from tests.helpers import load_rows
+
+# مقتطفات من ردود Gemini المخزنة في test.db
+GEMINI_HEADINGS = """**حالة التغذية**
+
+* **نقص في الفيتامين ب 12:** للنباتيين خطر متزايد للإصابة بنقص فيتامين ب 12.
+* **نقص الحديد:** يمكن أن يؤدي اتباع نظام غذائي نباتي إلى نقص الحديد.
+* **نقص فيتامين د:** يتعرض النباتيون لخطر متزايد للإصابة بنقص فيتامين د.
+"""
+
+GEMINI_LATIN = """* **تحليل مستوى فيتامين D:**
+    * التعرض للشمس منخفض (0.08 ساعات يومياً)، مما يزيد من خطر نقص فيتامين D.
+* **تحليل فيتامينات B المحتمل نقصها:**
+    * تناول اللحوم ومنتجات الألبان بشكل غير منتظم قد يؤدي إلى نقص فيتامين B12.
+    * تساقط الشعر قد يكون أحد أعراض نقص الحديد.
+* **الأطعمة الغنية بالفيتامينات المطلوبة:**
+    * فيتامين D3: 1000-2000 وحدة دولية يومياً
+"""
+
+GEMINI_AT_RISK = """**تحليل مستوى فيتامين D:**
+* التعرض للشمس لمدة 1.0 ساعة يوميًا قد لا يكون كافيًا للحصول على مستويات كافية من فيتامين D، خاصةً في أشهر الشتاء.
+* قد يكون النباتيون أيضًا معرضين لخطر نقص فيتامين B9 (حمض الفوليك)، والذي يوجد في المنتجات الحيوانية.
+* قد يكون النباتيون أيضًا معرضين لخطر نقص الكالسيوم، حيث يوجد الكالسيوم بشكل رئيسي في منتجات الألبان.
+"""
+
+
+def deficient_codes(labels):
+    return {code for code, deficient in zip(NUTRIENT_CODES, labels) if deficient}
+
+
+def test_status_before_name_with_arabic_letters():
+    assert deficient_codes(parse_nutrient_labels(GEMINI_HEADINGS)) == {"vitamin_d", "b12", "iron"}
+
+
+def test_latin_names_and_every_nutrient_in_line():
+    assert deficient_codes(parse_nutrient_labels(GEMINI_LATIN)) == {"vitamin_d", "b12", "iron"}
+    labels = parse_nutrient_labels("* يعاني المريض من نقص الحديد وفيتامين ب 12 والزنك.")
+    assert deficient_codes(labels) == {"iron", "b12", "zinc"}
+
+
+def test_risk_and_shortfall_count_as_deficient():
+    labels = parse_nutrient_labels(GEMINI_AT_RISK)
+    assert deficient_codes(labels) == {"vitamin_d", "folate", "calcium"}
+
+
+def test_names_inside_other_words_are_ignored():
+    # "تحديد" ليست الحديد و"B1" ليست بداية "B12"
+    assert parse_nutrient_labels("لا يمكن تحديد نقص الفيتامينات بناءً على الأعراض.") is None
+    assert deficient_codes(parse_nutrient_labels("خطر نقص B12")) == {"b12"}
+
+
+def test_negation_and_normal():
+    labels = parse_nutrient_labels("* لا يوجد نقص في الحديد.\n* فيتامين د: طبيعي")
+    assert labels == [0] * len(NUTRIENT_CODES)
+    # النقص في أي عبارة يغلب الطبيعي في غيرها
+    labels = parse_nutrient_labels("* فيتامين د: طبيعي\n* خطر نقص فيتامين D")
+    assert deficient_codes(labels) == {"vitamin_d"}
+
+
+def test_no_status_returns_none():
+    assert parse_nutrient_labels("* تناول الأطعمة الغنية بالحديد وفيتامين C.") is None
+
+
+def test_render_round_trip():
+    statuses = [(NORMAL, DEFICIENT, SEVERE)[index % 3] for index in range(len(NUTRIENT_CODES))]
+    labels = parse_nutrient_labels(render_nutrient_section(statuses))
+    assert labels == [int(status != NORMAL) for status in statuses]
+    assert deficiency_mask(labels) == sum(1 << index for index, status in enumerate(statuses) if status != NORMAL)
+
+
+def test_most_stored_outputs_parse():
+    parsed = [parse_nutrient_labels(row["gemini_output"]) for row in load_rows()]
+    assert sum(labels is not None for labels in parsed) >= 35
+    assert deficient_codes(parsed[0]) == {"vitamin_d", "b12", "iron"}
+    assert {"vitamin_d", "b12", "folate", "iron", "calcium"} <= deficient_codes(parsed[33])
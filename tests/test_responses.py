@@ -0,0 +1,31 @@
+import asyncio
+
+import httpx
+import pytest
+
+import main
+from responses import CATALOG_ETAG, etag_matches
+
+
+def get_catalog(if_none_match):
+    async def send():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get("/catalog/", headers={"If-None-Match": if_none_match})
+    return asyncio.run(send())
+
+
+@pytest.mark.parametrize("header", [CATALOG_ETAG, f"W/{CATALOG_ETAG}", f'"old", W/{CATALOG_ETAG}', "*"])
+def test_matching_validators_return_304(header):
+    assert etag_matches(header, CATALOG_ETAG)
+    response = get_catalog(header)
+    assert response.status_code == 304
+    assert response.headers["etag"] == CATALOG_ETAG
+
+
+@pytest.mark.parametrize("header", ['"old"', 'W/"old", "other"', CATALOG_ETAG.strip('"')])
+def test_other_validators_return_the_catalog(header):
+    assert not etag_matches(header, CATALOG_ETAG)
+    response = get_catalog(header)
+    assert response.status_code == 200
+    assert response.json()["version"] == CATALOG_ETAG.strip('"')
@@ -0,0 +1,33 @@
+import asyncio
+import threading
+
+from result_cache import ResultCache, SqliteCacheBackend
+
+
+def test_backend_shares_results_off_the_event_loop(tmp_path):
+    path = str(tmp_path / "cache.db")
+    threads = set()
+
+    async def main():
+        loop_thread = threading.current_thread()
+        writer = ResultCache("v1", backend=await asyncio.to_thread(SqliteCacheBackend, path, "v1"))
+        reader = ResultCache("v1", backend=await asyncio.to_thread(SqliteCacheBackend, path, "v1"))
+        original_get = reader.backend._get
+
+        def recording_get(key):
+            threads.add(threading.current_thread())
+            return original_get(key)
+
+        reader.backend._get = recording_get
+        key = writer.key({"age": 30})
+        await writer.set(key, {"bmi": 22.5})
+        assert await reader.get(key) == {"bmi": 22.5}
+        assert await reader.get(key) == {"bmi": 22.5}
+        for cache in (writer, reader):
+            await asyncio.to_thread(cache.backend.close)
+        return loop_thread, reader.stats()
+
+    loop_thread, stats = asyncio.run(main())
+    assert threads and loop_thread not in threads
+    assert (stats["backend_hits"], stats["hits"], stats["misses"]) == (1, 1, 0)
+    assert stats["entries"] == 1
@@ -0,0 +1,17 @@
+from rules import RequestFacts, rule_engine
+from tests.helpers import post
+from warmup import SAMPLE_SUBMISSION
+
+
+def test_non_string_components_are_coerced():
+    data = dict(SAMPLE_SUBMISSION, meal_components=[1, {"name": "بقوليات"}, ["خضروات"], "بقوليات"])
+    facts = RequestFacts.from_data(data)
+    assert "بقوليات" in facts.component_set
+    assert "1" in facts.component_set
+    as_text = dict(data, meal_components=[str(item) for item in data["meal_components"]])
+    assert rule_engine.facts(data) == rule_engine.facts(as_text)
+
+
+def test_submit_accepts_non_string_components():
+    response = post("/submit-symptoms/", json=dict(SAMPLE_SUBMISSION, meal_components=[1, {"name": "بقوليات"}]))
+    assert response.status_code == 200
@@ -0,0 +1,28 @@
+from nutrients import parse_nutrient_labels
+from tests.helpers import chunked, load_rows
+from training import ModelTraining, text_batches
+
+
+def test_streaming_counts_only_labelled_rows():
+    rows = load_rows()
+    labelled = sum(parse_nutrient_labels(row["gemini_output"]) is not None for row in rows)
+    assert labelled < len(rows)
+
+    trainer = ModelTraining()
+    trainer.train_streaming(lambda vectorizer: text_batches(chunked(rows, 10), vectorizer))
+    assert trainer.training_history[-1]["num_samples"] == labelled
+
+
+def test_incremental_counts_only_labelled_new_rows():
+    rows = load_rows()
+    old_rows, new_rows = rows[:20], rows[20:]
+    new_labelled = sum(parse_nutrient_labels(row["gemini_output"]) is not None for row in new_rows)
+
+    first = ModelTraining()
+    first.train_streaming(lambda vectorizer: text_batches(chunked(old_rows, 10), vectorizer))
+
+    trainer = ModelTraining()
+    trainer.train_incremental(first.model, first.vectorizer,
+                              lambda vectorizer: text_batches(chunked(new_rows, 10), vectorizer))
+    assert trainer.training_history[-1]["num_samples"] == new_labelled
+    assert trainer.last_seen_id == rows[-1]["id"]
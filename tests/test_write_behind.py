@@ -0,0 +1,68 @@
+import asyncio
+
+from write_behind import WriteBehindWriter
+
+
+def test_rows_are_flushed_in_batches_and_drained_on_stop():
+    batches = []
+
+    async def flush(batch):
+        batches.append(list(batch))
+
+    async def scenario():
+        writer = WriteBehindWriter(flush, batch_size=3, flush_interval=0.01)
+        await writer.start()
+        for row in range(7):
+            assert await writer.submit(row)
+        await writer.stop()
+        return writer.stats()
+
+    stats = asyncio.run(scenario())
+    assert [row for batch in batches for row in batch] == list(range(7))
+    assert all(len(batch) <= 3 for batch in batches)
+    assert stats == {"queued": 0, "written": 7, "failed": 0, "dropped": 0, "batches": len(batches)}
+
+
+def test_failed_flush_is_counted_and_writer_continues():
+    written = []
+
+    async def flush(batch):
+        if "bad" in batch:
+            raise RuntimeError("disk full")
+        written.extend(batch)
+
+    async def scenario():
+        writer = WriteBehindWriter(flush, batch_size=1, flush_interval=0)
+        await writer.start()
+        for row in ("a", "bad", "b"):
+            await writer.submit(row)
+        await writer.stop()
+        return writer.stats()
+
+    stats = asyncio.run(scenario())
+    assert written == ["a", "b"]
+    assert stats["written"] == 2
+    assert stats["failed"] == 1
+
+
+def test_full_queue_drops_after_enqueue_timeout():
+    async def scenario():
+        unblock = asyncio.Event()
+
+        async def flush(batch):
+            await unblock.wait()
+
+        writer = WriteBehindWriter(flush, batch_size=1, flush_interval=0, max_queue=1, enqueue_timeout=0.05)
+        await writer.start()
+        # الصف الأول عند الكاتب المتوقف والثاني يملأ الطابور
+        assert await writer.submit(1)
+        await asyncio.sleep(0.01)
+        assert await writer.submit(2)
+        assert not await writer.submit(3)
+        unblock.set()
+        await writer.stop()
+        return writer.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["dropped"] == 1
+    assert stats["written"] == 2
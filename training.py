@@ -0,0 +1,523 @@
+import json
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+import scipy.sparse as sp
+import sqlalchemy
+from sklearn.model_selection import train_test_split
+from sklearn.feature_extraction.text import CountVectorizer, HashingVectorizer
+
+from db import create_sync_db_engine
+from dedup import NUM_PERMUTATIONS, dedup_corpus, keep_mask, minhash_signatures, questionnaire_features, text_hash
+from feature_store import (
+    FeatureBatch, FeatureStore, alphabetical_ranks, build_count_vectorizer, select_columns
+)
+from model_selection import SEARCH_METRIC, binarize, cross_validate_grid
+from model_registry import BUNDLE_ARTIFACTS, artifacts_exist, bundle_dirname, load_artifacts, save_bundle
+from nutrient_model import LabelCounts, MultiLabelNB
+from nutrients import NUTRIENT_CODES, parse_nutrient_labels
+from training_jobs import append_training_history
+
+# قراءة الجدول بترقيم المفاتيح: كل دفعة تبدأ بعد آخر معرف في الدفعة السابقة
+TRAINING_ROWS_QUERY = sqlalchemy.text(
+    "SELECT id, user_input, gemini_output FROM user_inputs "
+    "WHERE id > :last_id ORDER BY id LIMIT :limit"
+)
+
+
+# حالة آخر تدريب قابل للاستكمال (النسخة وآخر معرف تم التدريب عليه)
+TRAINING_STATE_FILE = "training_state.json"
+
+# صيغة هدف التدريب: حالة نقص/طبيعي لكل عنصر غذائي، والنماذج بصيغة أخرى لا تُستكمل
+TARGET_ENCODING = "nutrient_status"
+
+# حجم قاموس CountVectorizer في التدريب الكامل
+MAX_FEATURES = 5000
+
+# المراحل التي يتناسب زمنها مع عدد صفوف التدريب، لتقدير الزمن الموفر بإزالة التكرار
+TRAINING_PHASES = ("preprocess", "vectorize", "search", "fit", "evaluate")
+
+
+def iter_training_chunks(database_url, chunk_size=5000, after_id=-1):
+    """قراءة بيانات التدريب على دفعات محدودة الحجم بدلاً من تحميلها كاملة"""
+    engine = create_sync_db_engine(database_url)
+    try:
+        last_id = after_id
+        while True:
+            with engine.connect() as conn:
+                rows = conn.execute(
+                    TRAINING_ROWS_QUERY, {"last_id": last_id, "limit": chunk_size}
+                ).mappings().all()
+            if not rows:
+                break
+            yield rows
+            last_id = rows[-1]["id"]
+    finally:
+        engine.dispose()
+
+
+def load_training_state(model_dir):
+    """قراءة نقطة الاستئناف للتدريب التدريجي إن وجدت"""
+    path = os.path.join(model_dir, TRAINING_STATE_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_training_state(model_dir, state):
+    """حفظ نقطة الاستئناف بشكل ذري"""
+    path = os.path.join(model_dir, TRAINING_STATE_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def is_test_row(row_id, test_fraction=0.2):
+    """تقسيم ثابت للبيانات حسب المعرف، لا يحتاج إلى تحميل الجدول كاملاً"""
+    return (row_id * 2654435761) % 2**32 < test_fraction * 2**32
+
+
+def test_mask(ids, test_fraction=0.2):
+    """is_test_row لمصفوفة معرفات، والضرب بلا إشارة يلتف بمضاعف 2**32 فلا يغير الباقي"""
+    hashed = (np.asarray(ids, dtype=np.uint64) * np.uint64(2654435761)) % np.uint64(2**32)
+    return hashed < test_fraction * 2**32
+
+
+def kept_rows(chunk, dropped):
+    """صفوف الدفعة غير المستبعدة بإزالة التكرار"""
+    if dropped is None:
+        return chunk
+    keep = keep_mask(np.fromiter((item["id"] for item in chunk), dtype=np.int64, count=len(chunk)), dropped)
+    return [item for item, kept in zip(chunk, keep) if kept]
+
+
+def text_dedup_inputs(chunks, near=True):
+    """مدخلات dedup_corpus من نصوص الصفوف مباشرة، عند عدم استخدام مخزن الخصائص
+
+    نفس الخصائص والتوقيعات المحفوظة في المخزن، لكنها تحسب من جديد في كل تدريب، ولا تحسب
+    التوقيعات أصلاً إذا اقتصرت الإزالة على التكرار الحرفي.
+    """
+    ids, hashes, signatures = [], [], []
+    for chunk in chunks:
+        rows = [item for item in chunk if parse_nutrient_labels(item["gemini_output"]) is not None]
+        ids.extend(item["id"] for item in rows)
+        hashes.extend(text_hash(item["user_input"]) for item in rows)
+        if near:
+            signatures.append(minhash_signatures([questionnaire_features(item["user_input"]) for item in rows]))
+        else:
+            signatures.append(np.zeros((len(rows), NUM_PERMUTATIONS), dtype=np.uint32))
+    return (
+        np.asarray(ids, dtype=np.int64), np.asarray(hashes, dtype=np.uint64),
+        np.concatenate(signatures) if signatures else np.zeros((0, NUM_PERMUTATIONS), dtype=np.uint32)
+    )
+
+
+def text_batches(chunks, vectorizer, dropped=None):
+    """دفعات التدريب من نصوص الصفوف مباشرة، عند عدم استخدام مخزن الخصائص"""
+    for chunk in chunks:
+        ids, texts, targets = [], [], []
+        for item in kept_rows(chunk, dropped):
+            labels = parse_nutrient_labels(item["gemini_output"])
+            if labels is not None:
+                ids.append(item["id"])
+                texts.append(item["user_input"])
+                targets.append(labels)
+        # HashingVectorizer لا يقبل قائمة فارغة، والدفعة بلا أهداف تبقى لتقدم last_id
+        X = vectorizer.transform(texts) if texts else sp.csr_matrix((0, vectorizer.n_features))
+        yield FeatureBatch(
+            np.asarray(ids, dtype=np.int64), X,
+            np.asarray(targets, dtype=np.int8).reshape(len(ids), len(NUTRIENT_CODES)),
+            len(chunk), chunk[-1]["id"]
+        )
+
+
+class ModelTraining:
+    def __init__(self, progress_callback=None):
+        self.model = None
+        self.vectorizer = None
+        self.training_history = []
+        self.progress_callback = progress_callback
+        # أعلى معرف صف تم التدريب عليه، يستخدم كنقطة استئناف للتدريب التدريجي
+        self.last_seen_id = None
+        # مدة كل مرحلة بالثواني، وزمن قراءة الدفعات من قاعدة البيانات يحتسب في مرحلة fetch وحدها
+        self.phase_seconds = {}
+        self._phase = None
+        self._phase_started = None
+        self._phase_fetch = 0.0
+
+    def report_progress(self, phase, fraction):
+        """إبلاغ المستدعي بالمرحلة الحالية ونسبة الإنجاز، وبدء قياس زمن المرحلة"""
+        self._close_phase()
+        if phase != "done":
+            self._phase = phase
+            self._phase_started = time.perf_counter()
+        if self.progress_callback is not None:
+            self.progress_callback(phase, fraction)
+
+    def _add_phase_time(self, phase, seconds):
+        self.phase_seconds[phase] = self.phase_seconds.get(phase, 0.0) + seconds
+
+    def _close_phase(self):
+        if self._phase is not None:
+            elapsed = time.perf_counter() - self._phase_started - self._phase_fetch
+            self._add_phase_time(self._phase, elapsed)
+        self._phase = None
+        self._phase_fetch = 0.0
+
+    def timed_fetch(self, chunks):
+        """تمرير دفعات الصفوف مع احتساب زمن قراءتها"""
+        iterator = iter(chunks)
+        while True:
+            start = time.perf_counter()
+            chunk = next(iterator, None)
+            elapsed = time.perf_counter() - start
+            self._add_phase_time("fetch", elapsed)
+            self._phase_fetch += elapsed
+            if chunk is None:
+                return
+            yield chunk
+
+    def preprocess_data(self, data):
+        """معالجة البيانات صفاً صفاً وإرجاع أزواج (المدخل، حالة كل عنصر غذائي) كمولد
+
+        الصفوف التي لا يذكر تحليلها أي عنصر معروف تُتجاهل.
+        """
+        for item in data:
+            labels = parse_nutrient_labels(item["gemini_output"])
+            if labels is not None:
+                yield item["user_input"], labels
+
+    def train_and_evaluate(self, X, y):
+        """تدريب النموذج وتقييمه، y قائمة بحالات العناصر لكل صف"""
+        # تقسيم البيانات
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+        # تحويل النصوص
+        self.report_progress("vectorize", 0.3)
+        self.vectorizer = CountVectorizer(max_features=MAX_FEATURES)
+        X_train_vec = self.vectorizer.fit_transform(X_train)
+        X_test_vec = self.vectorizer.transform(X_test)
+        return self._fit_and_evaluate(X_train_vec, X_test_vec, y_train, y_test, len(X))
+
+    def train_and_evaluate_store(self, store, dropped=None):
+        """مثل train_and_evaluate لكن من عدادات الكلمات المحفوظة في المخزن دون إعادة تقطيع النصوص
+
+        نفس تقسيم البيانات ونفس اختيار القاموس، فالنموذج الناتج مطابق.
+        """
+        _, counts, labels, _ = store.load(dropped)
+        train_index, test_index = train_test_split(
+            np.arange(counts.shape[0]), test_size=0.2, random_state=42
+        )
+
+        self.report_progress("vectorize", 0.3)
+        train_counts = counts[train_index]
+        self.vectorizer, columns = store.count_vectorizer(train_counts, max_features=MAX_FEATURES)
+        X_train_vec = train_counts[:, columns]
+        X_test_vec = counts[test_index][:, columns]
+        return self._fit_and_evaluate(
+            X_train_vec, X_test_vec, labels[train_index], labels[test_index], counts.shape[0]
+        )
+
+    def _fit_and_evaluate(self, X_train_vec, X_test_vec, y_train, y_test, num_samples):
+        # تدريب النموذج
+        self.report_progress("fit", 0.5)
+        self.model = MultiLabelNB()
+        self.model.fit(X_train_vec, y_train)
+
+        # تقييم النموذج
+        self.report_progress("evaluate", 0.7)
+        counts = LabelCounts()
+        counts.update(y_test, self.model.predict(X_test_vec))
+        accuracy = counts.accuracy()
+
+        # حفظ نتائج التدريب
+        training_result = {
+            'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'accuracy': accuracy,
+            'num_samples': num_samples,
+            'model_params': self.model.get_params()
+        }
+        self.training_history.append(training_result)
+
+        return accuracy, counts.report()
+
+    def train_search(self, counts, labels, tokens, folds=5, workers=None, grid=None):
+        """اختيار معاملات المحول والتنعيم بتقييم متقاطع على جميع الأنوية، ثم تدريب الأفضل على جميع الصفوف
+
+        counts عدادات الكلمات بأعمدة القاموس الكامل tokens، فلا يعاد تقطيع النصوص لأي مرشح.
+        """
+        self.report_progress("search", 0.1)
+        started = time.perf_counter()
+        ranks = alphabetical_ranks(tokens)
+        candidates, workers = cross_validate_grid(
+            counts, labels, ranks, grid, folds, workers,
+            progress=lambda fraction: self.report_progress("search", 0.1 + 0.7 * fraction)
+        )
+        search_seconds = time.perf_counter() - started
+        best = candidates[0]
+
+        # تدريب المرشح الأفضل على جميع الصفوف
+        self.report_progress("fit", 0.8)
+        columns = select_columns(counts, ranks, best["max_features"])
+        self.vectorizer = build_count_vectorizer(
+            tokens, columns, max_features=best["max_features"], binary=best["binary"]
+        )
+        X = counts[:, columns]
+        if best["binary"]:
+            X = binarize(X)
+        self.model = MultiLabelNB(alpha=best["alpha"]).fit(X, labels)
+        accuracy = best["mean_label_accuracy"]
+
+        # حفظ نتائج التدريب
+        training_result = {
+            'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'accuracy': accuracy,
+            'num_samples': counts.shape[0],
+            'model_params': {**self.model.get_params(), "max_features": best["max_features"],
+                             "binary": best["binary"]}
+        }
+        self.training_history.append(training_result)
+
+        return accuracy, {
+            "metric": SEARCH_METRIC,
+            "folds": folds,
+            "workers": workers,
+            "search_seconds": round(search_seconds, 3),
+            "best": best,
+            "candidates": candidates,
+        }
+
+    def train_streaming(self, batches, n_features=2**14, test_fraction=0.2):
+        """تدريب على دفعات متتالية بذاكرة محدودة مهما كان حجم الجدول
+
+        batches(vectorizer) تعيد مكرراً جديداً من FeatureBatch في كل مرة لأن التدريب يمر على
+        البيانات مرتين. التسميات ثابتة مسبقاً فلا حاجة إلى مرور لجمع الفئات.
+        """
+        # محول نصوص بلا حالة، لا يحتاج إلى بناء مفردات من البيانات كاملة
+        self.vectorizer = HashingVectorizer(n_features=n_features, alternate_sign=False)
+
+        # المرور الأول: التدريب التدريجي على صفوف التدريب فقط
+        self.report_progress("fit", 0.3)
+        self.model = MultiLabelNB()
+        num_samples = 0
+        for batch in batches(self.vectorizer):
+            train = ~test_mask(batch.ids, test_fraction)
+            if train.any():
+                self.model.partial_fit(batch.X[train], batch.Y[train])
+            # الصفوف ذات الهدف فقط، كما يحسبها التدريب الكامل
+            num_samples += len(batch.ids)
+            self.last_seen_id = batch.last_id
+
+        # المرور الثاني: التقييم على صفوف الاختبار
+        self.report_progress("evaluate", 0.7)
+        counts = LabelCounts()
+        for batch in batches(self.vectorizer):
+            self._score(batch, test_mask(batch.ids, test_fraction), counts)
+
+        return self._finish_streaming(num_samples, counts)
+
+    def train_incremental(self, model, vectorizer, batches, test_fraction=0.2):
+        """استكمال تدريب نموذج سابق على الصفوف الجديدة فقط باستخدام partial_fit
+
+        يتم التقييم تتابعياً: صفوف الاختبار في كل دفعة تُقيَّم بعد تدريب تلك الدفعة.
+        """
+        self.model = model
+        self.vectorizer = vectorizer
+
+        self.report_progress("fit", 0.3)
+        num_samples = 0
+        counts = LabelCounts()
+        for batch in batches(self.vectorizer):
+            test = test_mask(batch.ids, test_fraction)
+            if not test.all():
+                self.model.partial_fit(batch.X[~test], batch.Y[~test])
+            self._score(batch, test, counts)
+            num_samples += len(batch.ids)
+            self.last_seen_id = batch.last_id
+
+        return self._finish_streaming(num_samples, counts)
+
+    def _score(self, batch, mask, counts):
+        if mask.any():
+            counts.update(batch.Y[mask], self.model.predict(batch.X[mask]))
+
+    def _finish_streaming(self, num_samples, counts):
+        accuracy = counts.accuracy()
+
+        # حفظ نتائج التدريب
+        training_result = {
+            'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'accuracy': accuracy,
+            'num_samples': num_samples,
+            'model_params': self.model.get_params()
+        }
+        self.training_history.append(training_result)
+
+        return accuracy, counts.report()
+
+
+def run_training_job(job_id, database_url, model_dir, mode="batch", chunk_size=5000,
+                     feature_dir=None, search=None, dedup=None, progress=None):
+    """تنفيذ التدريب الكامل داخل عملية منفصلة وحفظ الملفات الناتجة
+
+    search إعدادات نمط البحث عن المعاملات: {"folds": ..., "workers": ...}.
+    dedup إعدادات إزالة التكرار قبل التقسيم والتدريب: {"threshold": ...}، وNone لتعطيلها.
+    threshold بقيمة None يستبعد التكرار الحرفي فقط.
+    """
+    started = time.perf_counter()
+
+    def report(phase, fraction):
+        if progress is not None:
+            progress[job_id] = {"phase": phase, "progress": fraction}
+
+    # تهيئة نموذج التدريب
+    trainer = ModelTraining(progress_callback=report)
+
+    state = load_training_state(model_dir) if mode == "incremental" else None
+    if mode == "incremental" and (state is None or state.get("target") != TARGET_ENCODING
+                                  or not artifacts_exist(model_dir, state["model_version"])):
+        # لا توجد نقطة استئناف صالحة: إعادة بناء كاملة على دفعات
+        mode = "streaming"
+
+    def fetch(after_id):
+        return trainer.timed_fetch(iter_training_chunks(database_url, chunk_size, after_id=after_id))
+
+    # تقطيع الصفوف الجديدة فقط، والصفوف السابقة تقرأ من المخزن كما هي
+    store = None
+    feature_store = None
+    if feature_dir is not None:
+        trainer.report_progress("featurize", 0.05)
+        store = FeatureStore(feature_dir, chunk_size)
+        feature_store = {"namespace": store.namespace, "new_rows": store.sync(fetch)}
+
+    # الصفوف المكررة لصف أقدم تستبعد من جميع الأنماط قبل تقسيم التدريب والاختبار
+    dropped = None
+    dedup_report = None
+    if dedup is not None:
+        trainer.report_progress("dedup", 0.08)
+        near = dedup.get("threshold") is not None
+        inputs = store.dedup_inputs() if store is not None else text_dedup_inputs(fetch(-1), near)
+        dropped, dedup_report = dedup_corpus(*inputs, **dedup)
+
+    def batches(vectorizer):
+        after_id = state["last_id"] if mode == "incremental" else -1
+        if store is not None:
+            return store.hashed_batches(vectorizer, after_id, dropped)
+        return text_batches(fetch(after_id), vectorizer, dropped)
+
+    def timings():
+        return {
+            "duration_seconds": round(time.perf_counter() - started, 3),
+            "phase_seconds": {phase: round(seconds, 3) for phase, seconds in trainer.phase_seconds.items()}
+        }
+
+    def finish(result):
+        if dedup_report is not None and dedup_report["kept_rows"]:
+            # زمن التدريب يتناسب خطياً مع عدد الصفوف، فيقدر الزمن الذي كانت ستأخذه الصفوف المستبعدة
+            dropped_rows = dedup_report["rows"] - dedup_report["kept_rows"]
+            training_seconds = sum(trainer.phase_seconds.get(phase, 0.0) for phase in TRAINING_PHASES)
+            dedup_report["estimated_seconds_saved"] = round(
+                training_seconds * dropped_rows / dedup_report["kept_rows"], 3
+            )
+        result["dedup"] = dedup_report
+        # سجل دائم بجانب النماذج، فلا يضيع مع انتهاء العملية المنفذة
+        append_training_history(model_dir, {"job_id": job_id, **result})
+        return result
+
+    new_samples = None
+    if mode == "incremental":
+        trainer.report_progress("load", 0.05)
+        # نسخة قابلة للتعديل دون ربط بالذاكرة لأن partial_fit يعدل المصفوفات
+        previous = load_artifacts(model_dir, state["model_version"])
+        accuracy, report_text = trainer.train_incremental(previous.model, previous.vectorizer, batches)
+        new_samples = trainer.training_history[-1]["num_samples"]
+        num_samples = state["num_samples"] + new_samples
+        if new_samples == 0:
+            # لا توجد صفوف جديدة منذ آخر نقطة استئناف، النموذج الحالي كما هو
+            trainer.report_progress("done", 1.0)
+            return finish({
+                "status": "success",
+                "accuracy": None,
+                "num_samples": num_samples,
+                "new_samples": 0,
+                "training_mode": mode,
+                "model_version": state["model_version"],
+                "model_file": previous.model_file,
+                "classification_report": None,
+                "latest_training": trainer.training_history[-1],
+                "feature_store": feature_store,
+                **timings()
+            })
+    elif mode == "streaming":
+        accuracy, report_text = trainer.train_streaming(batches)
+        num_samples = trainer.training_history[-1]["num_samples"]
+    elif mode == "search":
+        if store is not None:
+            _, counts, labels, _ = store.load(dropped)
+            tokens = store.tokens
+        else:
+            trainer.report_progress("preprocess", 0.05)
+            pairs = [pair for chunk in fetch(-1) for pair in trainer.preprocess_data(kept_rows(chunk, dropped))]
+            tokenizer = CountVectorizer()
+            counts = tokenizer.fit_transform([text for text, _ in pairs])
+            tokens = list(tokenizer.get_feature_names_out())
+            labels = np.asarray([target for _, target in pairs], dtype=np.int8)
+            del pairs
+        accuracy, report_text = trainer.train_search(counts, labels, tokens, **(search or {}))
+        num_samples = trainer.training_history[-1]["num_samples"]
+    elif store is not None:
+        accuracy, report_text = trainer.train_and_evaluate_store(store, dropped)
+        num_samples = trainer.training_history[-1]["num_samples"]
+    else:
+        # معالجة البيانات
+        trainer.report_progress("preprocess", 0.1)
+        pairs = [pair for chunk in fetch(-1) for pair in trainer.preprocess_data(kept_rows(chunk, dropped))]
+        inputs = [text for text, _ in pairs]
+        outputs = [target for _, target in pairs]
+        del pairs
+        num_samples = len(inputs)
+
+        # تدريب وتقييم النموذج
+        accuracy, report_text = trainer.train_and_evaluate(inputs, outputs)
+
+    # حفظ النموذج والمحول في حزمة واحدة بنفس رقم الإصدار
+    trainer.report_progress("dump", 0.9)
+    # الأجزاء الدقيقة من الثانية تمنع تصادم إصدارات المهام المتزامنة
+    version = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+    manifest = save_bundle(model_dir, version, trainer.model, trainer.vectorizer, {
+        "training_mode": mode,
+        "accuracy": float(accuracy),
+        "num_samples": num_samples,
+        "target": TARGET_ENCODING,
+        "labels": len(trainer.model.labels),
+    })
+
+    # النماذج المبنية بمحول التجزئة قابلة للاستكمال لاحقاً على الصفوف الجديدة فقط
+    if mode in ("streaming", "incremental") and trainer.last_seen_id is not None:
+        save_training_state(model_dir, {
+            "model_version": version,
+            "target": TARGET_ENCODING,
+            "last_id": trainer.last_seen_id,
+            "num_samples": num_samples
+        })
+    trainer.report_progress("done", 1.0)
+
+    # تحضير التقرير
+    return finish({
+        "status": "success",
+        "accuracy": float(accuracy),
+        "num_samples": num_samples,
+        "new_samples": new_samples,
+        "training_mode": mode,
+        "model_version": version,
+        "model_file": os.path.join(bundle_dirname(version), BUNDLE_ARTIFACTS),
+        "checksum": manifest["files"][BUNDLE_ARTIFACTS]["sha256"],
+        "classification_report": report_text,
+        "latest_training": trainer.training_history[-1],
+        "feature_store": feature_store,
+        **timings()
+    })
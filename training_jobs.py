@@ -0,0 +1,183 @@
+import asyncio
+import importlib
+import json
+import logging
+import multiprocessing
+import os
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from metrics import TRAINING_JOBS
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+# سجل دائم لنتائج مهام التدريب وأزمنتها، سطر JSON لكل مهمة
+TRAINING_HISTORY_FILE = "training_history.jsonl"
+
+
+class TooManyJobsError(Exception):
+    pass
+
+
+@dataclass
+class TrainingJob:
+    """حالة مهمة تدريب واحدة"""
+    id: str
+    status: str = QUEUED
+    created_at: float = field(default_factory=time.time)
+    finished_at: float = None
+    result: dict = None
+    error: str = None
+
+    def to_dict(self, progress=None):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "progress": progress,
+            "created_at": _format_time(self.created_at),
+            "finished_at": _format_time(self.finished_at),
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+def _format_time(ts):
+    if ts is None:
+        return None
+    return datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def append_training_history(model_dir, record):
+    """إضافة نتيجة مهمة تدريب منتهية إلى السجل الدائم بجانب النماذج"""
+    record = {"finished_at": _format_time(time.time()), **record}
+    # سطر واحد بكتابة واحدة في وضع الإلحاق، فلا تتداخل أسطر المهام المتزامنة
+    with open(os.path.join(model_dir, TRAINING_HISTORY_FILE), "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def read_training_history(model_dir, limit=20):
+    """آخر سجلات التدريب، الأحدث أولاً"""
+    path = os.path.join(model_dir, TRAINING_HISTORY_FILE)
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        lines = deque(f, maxlen=limit)
+    return [json.loads(line) for line in reversed(lines)]
+
+
+def _run_target(target, *args):
+    """تنفيذ دالة محددة بالاسم "الوحدة:الدالة" داخل العملية المنفذة، فلا تستورد عملية الخدمة وحدتها"""
+    module_name, _, name = target.partition(":")
+    return getattr(importlib.import_module(module_name), name)(*args)
+
+
+class TrainingJobManager:
+    """تشغيل مهام التدريب في مجمع عمليات منفصل عن حلقة الأحداث وتتبع حالتها"""
+
+    def __init__(self, max_workers=1, max_active_jobs=2, history_size=100):
+        self.max_workers = max_workers
+        self.max_active_jobs = max_active_jobs
+        self.history_size = history_size
+        self.jobs = OrderedDict()
+        self._executor = None
+        self._mp_manager = None
+        self._progress = None
+        self._tasks = {}
+
+    def _ensure_executor(self):
+        # إنشاء المجمع عند أول مهمة فقط حتى لا تتحمل عمليات الخدمة تكلفته
+        if self._executor is None:
+            context = multiprocessing.get_context("spawn")
+            self._mp_manager = context.Manager()
+            self._progress = self._mp_manager.dict()
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+        return self._executor
+
+    def active_jobs(self):
+        return [job for job in self.jobs.values() if job.status in (QUEUED, RUNNING)]
+
+    def submit(self, fn, *args, on_success=None):
+        """إرسال مهمة تدريب وإرجاعها فوراً دون انتظار انتهائها
+
+        fn دالة أو اسمها بالصيغة "الوحدة:الدالة" ليتم استيرادها في العملية المنفذة فقط.
+        """
+        if len(self.active_jobs()) >= self.max_active_jobs:
+            raise TooManyJobsError(f"{self.max_active_jobs} training jobs already active")
+        executor = self._ensure_executor()
+
+        job = TrainingJob(id=uuid.uuid4().hex)
+        self.jobs[job.id] = job
+        self._trim_history()
+
+        if isinstance(fn, str):
+            future = executor.submit(_run_target, fn, job.id, *args, self._progress)
+        else:
+            future = executor.submit(fn, job.id, *args, self._progress)
+        task = asyncio.create_task(self._watch(job, future, on_success))
+        self._tasks[job.id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.id, None))
+        return job
+
+    async def _watch(self, job, future, on_success):
+        try:
+            job.result = await asyncio.wrap_future(future)
+            if on_success is not None:
+                await on_success(job.result)
+            job.status = SUCCEEDED
+        except Exception as e:
+            logger.error(f"Training job {job.id} failed: {str(e)}")
+            job.status = FAILED
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            TRAINING_JOBS.labels(job.status).inc()
+
+    async def wait(self, job_id):
+        """انتظار انتهاء مهمة محددة"""
+        task = self._tasks.get(job_id)
+        if task is not None:
+            await asyncio.shield(task)
+        return self.jobs[job_id]
+
+    def progress(self, job_id):
+        if self._progress is None:
+            return None
+        return self._progress.get(job_id)
+
+    def status(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        progress = self.progress(job_id)
+        data = job.to_dict(progress)
+        # المهمة تعتبر قيد التنفيذ بمجرد أن تبلغ العملية المنفذة عن أول مرحلة
+        if job.status == QUEUED and progress is not None:
+            data["status"] = RUNNING
+        return data
+
+    def _trim_history(self):
+        # الاحتفاظ بعدد محدود من المهام المنتهية في الذاكرة
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in (SUCCEEDED, FAILED)]
+        for job_id in finished[:max(0, len(self.jobs) - self.history_size)]:
+            del self.jobs[job_id]
+            if self._progress is not None:
+                self._progress.pop(job_id, None)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._mp_manager is not None:
+            self._mp_manager.shutdown()
+            self._mp_manager = None
+            self._progress = None
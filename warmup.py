@@ -0,0 +1,93 @@
+import asyncio
+import logging
+import time
+
+from metrics import WARMUP_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# استبيان اصطناعي يمر بجميع مسارات التحليل أثناء التهيئة ولا يحفظ
+SAMPLE_SUBMISSION = {
+    "age": 34,
+    "gender": "أنثى",
+    "weight": 62.0,
+    "height": 165.0,
+    "sun_exposure": 0.5,
+    "activity_level": "متوسط",
+    "diet_type": "نباتي",
+    "symptoms": "التعب والإرهاق، تساقط الشعر، شحوب الجلد",
+    "chronic_diseases": "",
+    "medications": "",
+    "vegetables_fruits": "يومياً",
+    "dairy_meat": "نادراً",
+    "supplements": "",
+    "meals_info": {"meals_per_day": 3, "snacks": "أحياناً"},
+    "sun_context": "محدود (داخل المباني معظم الوقت)",
+    "physical_activities": ["المشي"],
+    "exercise_duration": 30,
+    "sleep_info": {"quality": "متوسطة", "hours": 7},
+    "stress_level": "متوسط",
+    "meal_components": ["بقوليات", "خضروات"],
+    "cooking_methods": ["مسلوق"],
+}
+
+
+class Warmup:
+    """خطوات تهيئة العامل قبل إعلان جاهزيته في /ready
+
+    تعمل الخطوات في الخلفية بعد بدء الخدمة فيجيب /health فوراً. فشل خطوة يسجل ولا يمنع
+    الجاهزية، لأن التهيئة تزيل بطء الطلبات الأولى فقط والخدمة تعمل بدونها.
+    """
+
+    def __init__(self, steps, enabled=True):
+        self.steps = steps
+        self.enabled = enabled
+        self.ready = False
+        self.step = None
+        self.step_seconds = {}
+        self.errors = {}
+        self.duration_seconds = None
+        self._task = None
+
+    async def run(self):
+        started = time.perf_counter()
+        for name, step in self.steps:
+            self.step = name
+            step_started = time.perf_counter()
+            try:
+                await step()
+            except Exception as e:
+                logger.error(f"Warm-up step {name} failed: {str(e)}")
+                self.errors[name] = str(e)
+            self.step_seconds[name] = round(time.perf_counter() - step_started, 4)
+            WARMUP_SECONDS.labels(name).set(self.step_seconds[name])
+        self.step = None
+        self.duration_seconds = round(time.perf_counter() - started, 4)
+        WARMUP_SECONDS.labels("total").set(self.duration_seconds)
+        self.ready = True
+        logger.info(f"Warm-up finished in {self.duration_seconds}s: {self.step_seconds}")
+
+    def start(self):
+        if not self.enabled:
+            self.ready = True
+            return
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """إيقاف الجاهزية عند الإغلاق، وإلغاء التهيئة إن لم تنته"""
+        self.ready = False
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def status(self):
+        return {
+            "ready": self.ready,
+            "step": self.step,
+            "duration_seconds": self.duration_seconds,
+            "step_seconds": self.step_seconds,
+            "errors": self.errors,
+        }
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# علامة الإيقاف توضع في نهاية الطابور حتى تُكتب جميع الصفوف التي سبقتها
+_STOP = object()
+
+
+class WriteBehindWriter:
+    """طابور كتابة مؤجلة: يجمع الصفوف ويكتبها دفعات في معاملة واحدة
+
+    يتم التفريغ عند بلوغ حجم الدفعة أو انقضاء فترة التفريغ، والطابور محدود الحجم
+    فينتظر المنتجون عند امتلائه (ضغط عكسي) حتى مهلة محددة.
+    """
+
+    def __init__(self, flush, batch_size=200, flush_interval=0.2, max_queue=10000,
+                 enqueue_timeout=1.0):
+        self.flush = flush
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.enqueue_timeout = enqueue_timeout
+        self._queue = None
+        self._task = None
+        self.written = 0
+        self.failed = 0
+        self.dropped = 0
+        self.batches = 0
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run())
+
+    async def submit(self, row):
+        """إضافة صف إلى الطابور، مع الانتظار عند امتلائه"""
+        try:
+            await asyncio.wait_for(self._queue.put(row), self.enqueue_timeout)
+            return True
+        except asyncio.TimeoutError:
+            self.dropped += 1
+            logger.warning("Write-behind queue is full, dropping row")
+            return False
+
+    async def _collect(self):
+        """تجميع دفعة حتى بلوغ حجمها أو انقضاء فترة التفريغ، مع إشارة الإيقاف"""
+        item = await self._queue.get()
+        if item is _STOP:
+            return [], True
+        batch = [item]
+        # انتظار وصول المزيد فقط إذا لم يكن في الطابور ما يكفي لدفعة كاملة
+        if self._queue.qsize() < self.batch_size - 1:
+            await asyncio.sleep(self.flush_interval)
+        while len(batch) < self.batch_size and not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _write(self, batch):
+        try:
+            await self.flush(batch)
+            self.written += len(batch)
+            self.batches += 1
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error(f"Write-behind flush error: {str(e)}")
+
+    async def _run(self):
+        while True:
+            batch, stopping = await self._collect()
+            if batch:
+                await self._write(batch)
+            if stopping:
+                return
+
+    async def stop(self):
+        """تفريغ جميع الصفوف المتبقية ثم إيقاف الكاتب"""
+        if self._task is None:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "written": self.written,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "batches": self.batches,
+        }